@@ -0,0 +1,202 @@
+﻿#-------------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation 
+# All rights reserved. 
+# 
+# Distributed under the terms of the MIT License
+#-------------------------------------------------------------------------
+'''
+Canned service responses, shaped like the ones in tests/test_recommendations.py, 
+tests/test_anomalydetection.py and tests/test_batching.py but scaled up to realistic sizes, and a transport which serves them.
+'''
+from datetime import datetime, timedelta
+import json
+import random
+import uuid
+
+FEED_HEADER = '''<?xml version="1.0" encoding="UTF-8"?>
+<feed xmlns="http://www.w3.org/2005/Atom" xmlns:base="https://api.datamarket.azure.com/Data.ashx/amla/recommendations/v2/{0}" xmlns:d="http://schemas.microsoft.com/ado/2007/08/dataservices" xmlns:m="http://schemas.microsoft.com/ado/2007/08/dataservices/metadata">
+   <title type="text" />
+   <subtitle type="text">{0}</subtitle>
+   <id>https://api.datamarket.azure.com/Data.ashx/amla/recommendations/v2/{0}?apiVersion='1.0'</id>
+   <rights type="text" />
+   <updated>2015-05-18T23:52:27Z</updated>
+   <link rel="self" href="https://api.datamarket.azure.com/Data.ashx/amla/recommendations/v2/{0}?apiVersion='1.0'" />
+'''
+
+FEED_ENTRY = '''   <entry>
+      <id>https://api.datamarket.azure.com/Data.ashx/amla/recommendations/v2/{0}?apiVersion='1.0'&amp;$skip={1}&amp;$top=1</id>
+      <title type="text">{0}Entity</title>
+      <updated>2015-05-18T23:52:27Z</updated>
+      <link rel="self" href="https://api.datamarket.azure.com/Data.ashx/amla/recommendations/v2/{0}?apiVersion='1.0'&amp;$skip={1}&amp;$top=1" />
+      <content type="application/xml">
+         <m:properties>
+{2}
+         </m:properties>
+      </content>
+   </entry>
+'''
+
+ANOMALY_HEADER = 'Time,Data,TSpike,ZSpike,Martingale values,Alert indicator,Martingale values(2),Alert indicator(2),'
+ANOMALY_DATE_FORMAT = '%m/%d/%Y %H:%M:%S %p'
+
+def _feed(name, entries):
+    body = [FEED_HEADER.format(name)]
+    for i, properties in enumerate(entries):
+        lines = '\n'.join('            <d:{0} m:type="{1}">{2}</d:{0}>'.format(key, edm, value) for key, edm, value in properties)
+        body.append(FEED_ENTRY.format(name, i, lines))
+    body.append('</feed>')
+    return ''.join(body).encode('utf-8')
+
+def recommendation_feed(count, seed=0):
+    '''
+    An ItemRecommend response with count items.
+    '''
+    rand = random.Random(seed)
+    return _feed('ItemRecommend', [(
+        ('Id', 'Edm.String', str(uuid.UUID(int=rand.getrandbits(128))).upper()),
+        ('Name', 'Edm.String', 'Item number {}'.format(i)),
+        ('Rating', 'Edm.Double', repr(rand.random())),
+        ('Reasoning', 'Edm.String', 'People who like this item also like another item'),
+    ) for i in range(count)])
+
+def build_status_feed(count):
+    '''
+    A GetModelBuildsStatus response listing count builds, newest (and still building) first.
+    '''
+    return _feed('GetModelBuildsStatus', [(
+        ('UserName', 'Edm.String', '637aba67-ebef-4d24-840c-d857661b0b92@dm.com'),
+        ('ModelName', 'Edm.String', 'benchmark'),
+        ('ModelId', 'Edm.String', 'd5c7273b-2228-4cf4-99b1-9966e28b143a'),
+        ('IsDeployed', 'Edm.String', 'false'),
+        ('BuildId', 'Edm.String', str(1514886 - i)),
+        ('BuildType', 'Edm.String', 'Recommendation'),
+        ('Status', 'Edm.String', 'Building' if i == 0 else 'Success'),
+        ('Progress', 'Edm.String', '0'),
+        ('StartTime', 'Edm.String', '5/18/2015 10:25:33 PM'),
+        ('EndTime', 'Edm.String', '5/18/2015 10:26:56 PM'),
+        ('ExecutionTime', 'Edm.String', '00:01:22'),
+        ('IsExecutionStarted', 'Edm.String', 'false'),
+    ) for i in range(count)])
+
+def import_report_feed(line_count):
+    '''
+    An ImportUsageFile response.
+    '''
+    return _feed('ImportUsageFile', [(
+        ('LineCount', 'Edm.String', str(line_count)),
+        ('ErrorCount', 'Edm.String', '0'),
+        ('FileId', 'Edm.String', '2f009450-1d18-40d7-b9f1-c1ca3b6fc7c6'),
+    )])
+
+def anomaly_points(count, seed=0):
+    '''
+    count (datetime, float) points, five minutes apart.
+    '''
+    rand = random.Random(seed)
+    start = datetime(2014, 9, 21, 11, 5, 0)
+    return [(start + timedelta(minutes=5 * i), round(rand.uniform(0, 10), 2)) for i in range(count)]
+
+def anomaly_table(count, seed=0):
+    '''
+    The table score_raw returns for count points.
+    '''
+    rand = random.Random(seed)
+    rows = [ANOMALY_HEADER]
+    for date, value in anomaly_points(count, seed):
+        rows.append('{},{},{},{},{},{},{},{},'.format(
+            date.strftime(ANOMALY_DATE_FORMAT), value, 
+            rand.randint(0, 1), rand.randint(0, 1), 
+            repr(rand.uniform(-2, 2)), rand.randint(0, 1), 
+            repr(rand.uniform(-2, 2)), rand.randint(0, 1)))
+    return ';'.join(rows) + ';'
+
+def anomaly_score_response(count, seed=0):
+    '''
+    A Score response for count points.
+    '''
+    return json.dumps({
+        'odata.metadata': 'https://api.datamarket.azure.com/data.ashx/aml_labs/anomalydetection/v1/$metadata#Microsoft.CloudML.ScoreResult',
+        'table': '"' + anomaly_table(count, seed) + '"',
+    }).encode('utf-8')
+
+def text_documents(count, seed=0):
+    '''
+    count review-like documents of 20 to 60 words.
+    '''
+    rand = random.Random(seed)
+    words = ['great', 'product', 'terrible', 'service', 'would', 'buy', 'again', 'never', 'shipping', 'fast', 'café', 'déjà vu']
+    return [' '.join(rand.choice(words) for j in range(rand.randint(20, 60))) for i in range(count)]
+
+def key_phrases_batch_response(documents):
+    '''
+    A KeyPhrasesBatch response for documents.
+    '''
+    return json.dumps({
+        'odata.metadata': 'https://api.datamarket.azure.com/data.ashx/amla/text-analytics/v1/$metadata#Microsoft.CloudML.KeyPhrasesBatchResult',
+        'KeyPhrasesBatch': [{ 'KeyPhrases' : sorted(set(text.split())), 'Id' : str(i) } for i, text in enumerate(documents)],
+        'Errors': [],
+    }, ensure_ascii=False).encode('utf-8')
+
+def write_usage_file(path, size, seed=0):
+    '''
+    Writes a usage file of about size bytes to path.
+
+    Returns:
+        int: the number of lines written.
+    '''
+    rand = random.Random(seed)
+    items = [str(uuid.UUID(int=rand.getrandbits(128))) for i in range(1000)]
+    lines = 0
+    written = 0
+    with open(path, 'w', encoding='utf-8') as usage:
+        while written < size:
+            line = 'user{},{},2015/05/18T10:{:02}:00,Purchase\n'.format(rand.randrange(100000), rand.choice(items), rand.randrange(60))
+            usage.write(line)
+            written += len(line)
+            lines += 1
+    return lines
+
+class CannedResponse:
+    def __init__(self, content, status_code=200, reason='OK'):
+        self.status_code = status_code
+        self.reason = reason
+        self.content = content
+
+    @property
+    def text(self):
+        return self.content.decode('utf-8')
+
+    def json(self):
+        return json.loads(self.content.decode('utf-8'))
+
+class CannedTransport:
+    '''
+    Serves canned bodies by url prefix instead of going to the network. Request bodies which
+    are streams are read to the end, as a real upload would.
+    '''
+    def __init__(self, responses):
+        self.responses = responses
+
+    def request(self, method, url, data=None, **kwargs):
+        if data is not None and not isinstance(data, (str, bytes)):
+            for chunk in data:
+                pass
+        for prefix, body in self.responses.items():
+            if url.startswith(prefix):
+                return CannedResponse(body)
+        return CannedResponse(b'', 404, 'Not Found')
+
+    def get(self, url, **kwargs):
+        return self.request('GET', url, **kwargs)
+
+    def post(self, url, data=None, **kwargs):
+        return self.request('POST', url, data, **kwargs)
+
+    def put(self, url, data=None, **kwargs):
+        return self.request('PUT', url, data, **kwargs)
+
+    def warm_up(self, *urls):
+        pass
+
+    def close(self):
+        pass
@@ -0,0 +1,223 @@
+﻿#-------------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation 
+# All rights reserved. 
+# 
+# Distributed under the terms of the MIT License
+#-------------------------------------------------------------------------
+'''
+Offline micro-benchmarks of the library's own CPU cost: building requests and parsing responses,
+served by a canned transport.  From the repository root:
+
+    python -m benchmarks.run --save-baseline  # record a baseline on this machine
+    python -m benchmarks.run                  # compare with benchmarks/baseline.json
+    python -m benchmarks.run --filter anomaly
+
+Exits with status 1 if a benchmark's throughput or peak memory regressed by more than the tolerance.
+Timings depend on the machine and Python, so the baseline is not committed: record one locally
+before changing the code.  It notes the machine and Python it was recorded on.
+'''
+from cortanaanalytics.anomalydetection import AnomalyDetection, Uris as AnomalyUris
+from cortanaanalytics.recommendations import Recommendations, Uris
+from cortanaanalytics.textanalytics import TextAnalytics, Uris as TextAnalyticsUris
+from cortanaanalytics.codec import JsonCodec
+from . import payloads
+from collections import namedtuple
+import argparse
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baseline.json')
+
+EMAIL = 'email@outlook.com'
+KEY = '1abCdEFGh/ijKlmN/opq234r56st/UvWXYZabCD7EF8='
+MODEL_ID = 'd5c7273b-2228-4cf4-99b1-9966e28b143a'
+
+Result = namedtuple('Result', ['name', 'rounds', 'ops_per_sec', 'p50', 'p99', 'peak_bytes'])
+
+BENCHMARKS = []
+
+def benchmark(name):
+    '''
+    Registers a function which takes a temporary directory and returns the callable to time.
+    '''
+    def register(setup):
+        BENCHMARKS.append((name, setup))
+        return setup
+    return register
+
+@benchmark('anomaly.format_data[10000]')
+def format_data(temp_dir):
+    ad = AnomalyDetection(KEY, payloads.CannedTransport({}))
+    data = payloads.anomaly_points(10000)
+    def run():
+        ad._format_data(data)
+        ad._format_params(3, 3)
+    return run
+
+@benchmark('anomaly.make_named_tuples[10000]')
+def make_named_tuples(temp_dir):
+    ad = AnomalyDetection(KEY, payloads.CannedTransport({}))
+    table = payloads.anomaly_table(10000)
+    return lambda: ad._make_named_tuples(table)
+
+@benchmark('anomaly.score[10000]')
+def score(temp_dir):
+    ad = AnomalyDetection(KEY, payloads.CannedTransport({AnomalyUris.score: payloads.anomaly_score_response(10000)}))
+    data = payloads.anomaly_points(10000)
+    return lambda: ad.score(data)
+
+@benchmark('recommendations.get_recommendation[100]')
+def get_recommendation(temp_dir):
+    rs = Recommendations(EMAIL, KEY, payloads.CannedTransport({Uris.root_uri: payloads.recommendation_feed(100)}))
+    item_ids = ['2406e770-769c-4189-89de-1c9283f93a96', '552a1940-21e4-4399-82bb-594b46d7ed54']
+    return lambda: rs.get_recommendation(MODEL_ID, item_ids, 100)
+
+@benchmark('recommendations.get_build_status[200]')
+def get_build_status(temp_dir):
+    rs = Recommendations(EMAIL, KEY, payloads.CannedTransport({Uris.root_uri: payloads.build_status_feed(200)}))
+    # the oldest build is the last entry
+    return lambda: rs.get_build_status(MODEL_ID, '1514687')
+
+@benchmark('recommendations.import_file[20MB]')
+def import_file(temp_dir):
+    usage_path = os.path.join(temp_dir, 'usage.txt')
+    lines = payloads.write_usage_file(usage_path, 20 * 1024 * 1024)
+    rs = Recommendations(EMAIL, KEY, payloads.CannedTransport({Uris.root_uri: payloads.import_report_feed(lines)}))
+    return lambda: rs.import_file(MODEL_ID, usage_path, Uris.import_usage)
+
+def _key_phrases_batch(codec=None):
+    documents = payloads.text_documents(1000)
+    transport = payloads.CannedTransport({TextAnalyticsUris.root: payloads.key_phrases_batch_response(documents)})
+    ta = TextAnalytics(KEY, transport, coalesce=False, codec=codec)
+    return lambda: ta.get_key_phrases_batch(documents)
+
+@benchmark('textanalytics.get_key_phrases_batch[1000]')
+def get_key_phrases_batch(temp_dir):
+    return _key_phrases_batch()
+
+@benchmark('textanalytics.get_key_phrases_batch[1000,json]')
+def get_key_phrases_batch_stdlib(temp_dir):
+    return _key_phrases_batch(JsonCodec())
+
+def measure(name, function, min_time=1.0, min_rounds=5):
+    '''
+    Times function until it has run for min_time seconds and at least min_rounds times, then 
+    runs it once more under tracemalloc for its peak memory.
+    '''
+    function()
+    durations = []
+    total = 0.0
+    while total < min_time or len(durations) < min_rounds:
+        start = time.perf_counter()
+        function()
+        duration = time.perf_counter() - start
+        durations.append(duration)
+        total += duration
+
+    tracemalloc.start()
+    try:
+        function()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+    durations.sort()
+    return Result(name, len(durations), len(durations) / total, _percentile(durations, 0.5), _percentile(durations, 0.99), peak)
+
+def _percentile(ordered, fraction):
+    return ordered[int(round(fraction * (len(ordered) - 1)))]
+
+def compare(result, baseline, tolerance):
+    '''
+    Returns a list of the ways result regressed from baseline.
+    '''
+    regressions = []
+    if result.ops_per_sec * (1 + tolerance) < baseline['ops_per_sec']:
+        regressions.append('ops/sec {:.1f} -> {:.1f}'.format(baseline['ops_per_sec'], result.ops_per_sec))
+    if result.peak_bytes > baseline['peak_bytes'] * (1 + tolerance):
+        regressions.append('peak memory {} -> {}'.format(_format_bytes(baseline['peak_bytes']), _format_bytes(result.peak_bytes)))
+    return regressions
+
+def _format_bytes(count):
+    for unit in ('B', 'KB', 'MB'):
+        if count < 1024:
+            return '{:.0f}{}'.format(count, unit)
+        count /= 1024
+    return '{:.1f}GB'.format(count)
+
+def _format_time(seconds):
+    if seconds < 1e-3:
+        return '{:.1f}us'.format(seconds * 1e6)
+    return '{:.2f}ms'.format(seconds * 1e3)
+
+def machine():
+    '''
+    Where the benchmarks run, as saved with a baseline.
+    '''
+    return { 
+        'platform' : platform.platform(), 
+        'processor' : platform.processor() or platform.machine(), 
+        'python' : '{0} {1}'.format(platform.python_implementation(), platform.python_version()) }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Offline micro-benchmarks for cortanaanalytics.')
+    parser.add_argument('--baseline', default=BASELINE_PATH, help='baseline file to compare with or save to')
+    parser.add_argument('--save-baseline', action='store_true', help='record the results as the new baseline')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='allowed slowdown or memory growth, 0.25 is 25%%')
+    parser.add_argument('--min-time', type=float, default=1.0, help='seconds to time each benchmark for')
+    parser.add_argument('--filter', default='', help='only run benchmarks whose name contains this')
+    args = parser.parse_args(argv)
+
+    baseline = {}
+    if os.path.isfile(args.baseline):
+        with open(args.baseline, 'r', encoding='utf-8') as file:
+            baseline = json.load(file)
+        if baseline.get('machine', machine()) != machine():
+            print('The baseline was recorded on {0}, not on this machine; record one here with --save-baseline'.format(baseline['machine']))
+    elif not args.save_baseline:
+        print('No baseline at {0}; record one on this machine with --save-baseline'.format(args.baseline))
+
+    print('{:<42} {:>10} {:>10} {:>10} {:>9}  {}'.format('benchmark', 'ops/sec', 'p50', 'p99', 'peak', 'vs baseline'))
+    results = []
+    regressed = False
+    temp_dir = tempfile.mkdtemp()
+    try:
+        for name, setup in BENCHMARKS:
+            if args.filter not in name:
+                continue
+            result = measure(name, setup(temp_dir), args.min_time)
+            results.append(result)
+
+            if name in baseline:
+                regressions = compare(result, baseline[name], args.tolerance)
+                regressed = regressed or bool(regressions)
+                status = '{:+.0%}'.format(result.ops_per_sec / baseline[name]['ops_per_sec'] - 1)
+                if regressions:
+                    status += ' REGRESSED: ' + ', '.join(regressions)
+            else:
+                status = 'new'
+            print('{:<42} {:>10.1f} {:>10} {:>10} {:>9}  {}'.format(
+                name, result.ops_per_sec, _format_time(result.p50), _format_time(result.p99), _format_bytes(result.peak_bytes), status))
+    finally:
+        shutil.rmtree(temp_dir)
+
+    if args.save_baseline:
+        baseline['machine'] = machine()
+        for result in results:
+            baseline[result.name] = dict((field, getattr(result, field)) for field in ('ops_per_sec', 'p50', 'p99', 'peak_bytes'))
+        with open(args.baseline, 'w', encoding='utf-8') as file:
+            json.dump(baseline, file, indent=2, sort_keys=True)
+            file.write('\n')
+        print('Saved baseline to {}'.format(args.baseline))
+        return 0
+
+    return 1 if regressed else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
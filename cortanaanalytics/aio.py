@@ -0,0 +1,612 @@
+﻿#-------------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation 
+# All rights reserved. 
+# 
+# Distributed under the terms of the MIT License
+#-------------------------------------------------------------------------
+''' 
+asyncio counterparts of the Recommendations, TextAnalytics and AnomalyDetection clients.
+
+Every service call is a coroutine and returns the same result types as the synchronous
+clients. The clients require aiohttp (pip install cortanaanalytics[async]).
+'''
+import asyncio
+import base64
+import json
+import os
+import random
+from .recommendations import Recommendations, Uris as RecommendationsUris, BuildStatus, BulkRecommendation, MAX_IMPORT_BYTES, RecommendationColumns, _ShardProgress
+from .textanalytics import ANALYSES, TextAnalytics, Uris as TextAnalyticsUris, _merged, _planned, _requested, _stream_results
+from .anomalydetection import AnomalyDetection, Uris as AnomalyDetectionUris
+from .upload import MultipartFileStream, plan_shards, shard_file_name
+from .instrumentation import current_call, instrumented, request_length
+from .singleflight import SingleFlight, coalesced
+from .cache import cached, call_cache
+from .dedup import deduplicated
+from .batching import MAX_BATCH_DOCUMENTS, in_input_order, plan_batches, with_ids
+from .exceptions import error_for
+from .concurrency import bounded_map_async
+from .codec import DEFAULT_CODEC
+from .throttling import RetryPolicy, rewind
+from threading import Lock
+from time import perf_counter
+
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+class Response:
+    '''
+    A fully read HTTP response, exposing the parts of requests.Response the clients use.
+    '''
+    def __init__(self, status_code, reason, content, headers=None):
+        self.status_code = status_code
+        self.reason = reason
+        self.content = content
+        self.headers = headers if headers is not None else {}
+
+    def json(self):
+        return json.loads(self.content.decode('utf-8'))
+
+async def _iterate(chunks):
+    # aiohttp streams request bodies given as async iterables.
+    for chunk in chunks:
+        yield chunk
+
+async def _gather(coroutines):
+    # the results of the coroutines, run concurrently; if one fails the others are cancelled
+    tasks = [asyncio.ensure_future(coroutine) for coroutine in coroutines]
+    try:
+        return await asyncio.gather(*tasks)
+    except BaseException:
+        for task in tasks:
+            task.cancel()
+        raise
+
+async def _limited(semaphore, function, *args):
+    # awaits function(*args) once semaphore lets it
+    async with semaphore:
+        return await function(*args)
+
+class AsyncTransport:
+    '''
+    A pooled, keep-alive asyncio HTTP transport which may be shared by the async clients.
+    '''
+
+    def __init__(self, limit=100, limit_per_host=0, max_concurrency=None, instrumentation=None, rate_limiter=None, retry_policy=None):
+        '''
+        limit (int, optional): total number of simultaneous connections. 0 means no limit.
+        limit_per_host (int, optional): simultaneous connections to one host. 0 means no limit.
+        max_concurrency (int, optional): 
+            number of requests allowed in flight at once; further requests wait their turn.
+            None means no limit beyond the connection limits.
+        instrumentation (Instrumentation, optional): reports each client call made through this transport.
+        rate_limiter (TokenBucket, optional): 
+            every request takes a token first. Share one bucket between all transports using a subscription.
+        retry_policy (RetryPolicy, optional): 
+            when throttled or failed requests are retried, by default RetryPolicy(). Use NO_RETRIES not to retry.
+        '''
+        if aiohttp is None:
+            raise ImportError('The async clients require aiohttp. Install it with "pip install cortanaanalytics[async]".')
+        self.limit = limit
+        self.limit_per_host = limit_per_host
+        self._semaphore = asyncio.Semaphore(max_concurrency) if max_concurrency else None
+        self.instrumentation = instrumentation
+        self.rate_limiter = rate_limiter
+        self.retry_policy = retry_policy if retry_policy is not None else RetryPolicy()
+        self._session = None
+
+    @property
+    def session(self):
+        '''
+        The underlying aiohttp.ClientSession, created on first use from within the event loop.
+        '''
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(limit=self.limit, limit_per_host=self.limit_per_host)
+            self._session = aiohttp.ClientSession(connector=connector)
+        return self._session
+
+    async def request(self, method, url, auth=None, **kwargs):
+        '''
+        Sends a request and reads the whole body.  Cancelling the calling task aborts the request
+        and frees its connection and its concurrency slot.  Throttled requests are retried as the
+        retry policy allows; the last response is returned.
+
+        Returns:
+            Response
+        '''
+        if auth is not None:
+            credentials = base64.b64encode('{}:{}'.format(*auth).encode('utf-8')).decode('ascii')
+            kwargs['headers'] = dict(kwargs.get('headers') or {}, Authorization='Basic ' + credentials)
+        attempt = 0
+        while True:
+            if self.rate_limiter is not None:
+                delay = self.rate_limiter.reserve()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+            try:
+                if self._semaphore is None:
+                    response = await self._send(method, url, kwargs)
+                else:
+                    async with self._semaphore:
+                        response = await self._send(method, url, kwargs)
+            except (aiohttp.ClientConnectionError, asyncio.TimeoutError):
+                delay = self.retry_policy.retry_after_error(attempt, method)
+                if delay is None or not rewind(kwargs.get('data')):
+                    raise
+            else:
+                delay = self.retry_policy.retry_after_response(attempt, response)
+                if delay is None or not rewind(kwargs.get('data')):
+                    return response
+                if self.rate_limiter is not None and response.status_code == 429:
+                    # hold back every user of the bucket, not just this request
+                    self.rate_limiter.pause(delay)
+                    delay = 0
+            call = current_call() if self.instrumentation is not None else None
+            if call is not None:
+                call.add_retry()
+            await asyncio.sleep(delay)
+            attempt += 1
+
+    async def _send(self, method, url, kwargs):
+        call = current_call() if self.instrumentation is not None else None
+        if call is None:
+            async with self.session.request(method, url, **kwargs) as response:
+                content = await response.read()
+                return Response(response.status, response.reason, content, response.headers)
+
+        start = perf_counter()
+        async with self.session.request(method, url, **kwargs) as response:
+            first_byte = perf_counter()
+            # aiohttp keeps a protocol per connection; mark each one the first time it is used
+            protocol = response.connection.protocol if response.connection is not None else None
+            reused = None
+            if protocol is not None:
+                reused = getattr(protocol, '_cortanaanalytics_used', False)
+                protocol._cortanaanalytics_used = True
+            content = await response.read()
+            call.add_request(
+                url, 
+                response.status, 
+                request_length(kwargs.get('data'), kwargs.get('headers')), 
+                len(content), 
+                first_byte - start, 
+                perf_counter() - first_byte, 
+                reused)
+            return Response(response.status, response.reason, content, response.headers)
+
+    async def get(self, url, **kwargs):
+        return await self.request('GET', url, **kwargs)
+
+    async def post(self, url, data=None, **kwargs):
+        return await self.request('POST', url, data=data, **kwargs)
+
+    async def put(self, url, data=None, **kwargs):
+        return await self.request('PUT', url, data=data, **kwargs)
+
+    async def close(self):
+        '''
+        Closes all pooled connections.
+        '''
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        await self.close()
+
+class AsyncRecommendations(Recommendations):
+    '''
+    asyncio version of Recommendations. Each service call is a coroutine.
+    '''
+
+    def __init__(self, email, account_key, transport=None, cache=None, coalesce=True):
+        '''
+        account_key (str): account_key provided at https://datamarket.azure.com/account/keys
+        transport (AsyncTransport, optional): a pooled transport, which may be shared with other clients.
+        cache (TTLCache or DiskCache, optional): caches get_recommendation results.  A DiskCache
+            is read and written in the event loop's default executor.
+        coalesce (bool, optional): if True, identical read-only calls in flight share one request.
+        '''
+        self.auth = (email, account_key)
+        self.transport = transport or AsyncTransport()
+        self.cache = cache
+        self.flights = SingleFlight() if coalesce else None
+        self._generations = {}
+        self._generations_lock = Lock()
+
+    @instrumented
+    async def create_model(self, model_name):
+        """
+        create the model with the given name.
+
+        Returns:
+            str: The model id.
+        """
+        create_model_url = RecommendationsUris.root_uri + RecommendationsUris.create_model_url.format(model_name, self.API_VERSION)
+
+        response = await self.transport.post(create_model_url, auth=self.auth)
+
+        if response.status_code != 200:
+            raise error_for(response, 'Failed to create model: Code:{} Reason:{}'.format(response.status_code, response.reason))
+
+        return self._parse_model_id(response.content)
+
+    @instrumented
+    async def _build_recommendation(self, model_id, build_description, build_type, body):
+        # build_rank_model, build_recommendation_model and build_fbt_model return this coroutine.
+        response = await self.transport.post(self._build_url(model_id, build_description, build_type), body, headers={'content-type': 'Application/xml'}, auth=self.auth)
+
+        if response.status_code != 200:
+            raise error_for(response, "Error {0}: Failed to start build for model {1}, \n reason {2}".format(
+                response.status_code, model_id, self.extract_error_info(response)))
+
+        return self._parse_build_id(response.content)
+
+    @instrumented
+    @coalesced
+    async def get_build_status(self, model_id, build_id):
+        """
+        Retrieve the build status for the given build
+        """
+        response = await self.transport.get(RecommendationsUris.root_uri + RecommendationsUris.build_statuses.format(model_id, False), auth=self.auth)
+        
+        if response.status_code != 200:
+            raise error_for(response, "Error {0}: Failed to retrieve build for status for model {1} and build id {2}, \n reason {3}".format(
+                response.status_code, model_id, build_id, self.extract_error_info(response)))
+        
+        return self._parse_build_status(response.content, build_id)
+
+    @instrumented
+    @coalesced
+    async def get_build_statuses(self, model_id):
+        """
+        Retrieve the status of every build of the given model with one call.
+        """
+        response = await self.transport.get(RecommendationsUris.root_uri + RecommendationsUris.build_statuses.format(model_id, False), auth=self.auth)
+        
+        if response.status_code != 200:
+            raise error_for(response, "Error {0}: Failed to retrieve build statuses for model {1}, \n reason {2}".format(
+                response.status_code, model_id, self.extract_error_info(response)))
+
+        return self._parse_build_statuses(response.content)
+
+    @instrumented
+    async def update_model(self, model_id, description, active_build_id):
+        """
+        Update model information.  If description is set we update the model name.  
+        If active_build_id is specified we update the active build.
+        """
+        response = await self.transport.put(RecommendationsUris.root_uri + RecommendationsUris.update_model.format(model_id), self._update_model_body(description, active_build_id), headers={'content-type':'Application/xml'}, auth=self.auth)
+
+        if response.status_code != 200:
+            raise error_for(response, "Error {0}: Failed to update model for model {1}, \n reason {2}".format(
+                response.status_code, model_id, self.extract_error_info(response)))
+
+        await call_cache(self.cache, self._invalidate_cache, model_id, active_build_id)
+
+    @instrumented
+    async def get_recommendation(self, model_id, item_id_list, number_of_results=10, include_metadata = False, columnar = False):
+        """
+        Retrieve recommendation for the given item(s)
+
+        Returns:
+            list of RecommendedItem): A collection of recommended items.
+        """
+        key = self._cache_key(model_id, item_id_list, number_of_results, include_metadata)
+        generation = 0
+        if key is not None:
+            generation = self._cache_generation(model_id)
+            rows = await call_cache(self.cache, self.cache.get, key)
+            if rows is not None:
+                columns = RecommendationColumns.from_rows(rows)
+                return columns if columnar else columns.to_items()
+
+        columns = await self._get_recommendation_columns(model_id, item_id_list, number_of_results, include_metadata, generation)
+
+        if key is not None:
+            await call_cache(self.cache, self._cache_rows, key, model_id, generation, columns)
+        return columns if columnar else columns.to_items()
+
+    @coalesced
+    async def _get_recommendation_columns(self, model_id, item_id_list, number_of_results, include_metadata, generation):
+        response = await self.transport.get(RecommendationsUris.root_uri + RecommendationsUris.get_recommendation.format(model_id,','.join(item_id_list), number_of_results, include_metadata), auth=self.auth)
+
+        if response.status_code != 200:
+            raise error_for(response,
+                "Error {0}: Failed to retrieve recommendation for item list {1} and model {2}, \n reason {3}".format(
+                    response.status_code, ",".join(item_id_list), model_id, self.extract_error_info(response)))
+        return self._parse_recommendation_columns(response.content)
+
+    async def import_file(self, model_id, file_path, import_uri, progress_callback=None):
+        """
+        Import the given file (catalog/usage) to the given model. The file is streamed from disk.
+        """
+        file_name = os.path.basename(file_path)
+        with MultipartFileStream(file_path, file_name, progress_callback=progress_callback) as body:
+            return await self._import_stream(model_id, file_path, import_uri, body)
+
+    @instrumented
+    async def _import_stream(self, model_id, file_path, import_uri, body):
+        file_name = body.file_name
+        response = await self.transport.post(RecommendationsUris.root_uri + import_uri.format(model_id, file_name), _iterate(body), headers=body.headers, auth=self.auth)
+
+        if response.status_code != 200:
+            raise error_for(response,
+                "Error {0}: Failed to import file {1}, for model {2} \n reason {3}".format(
+                    response.status_code, file_path, model_id, self.extract_error_info(response)))
+
+        return self._parse_import_report(response.content, file_name)
+
+    async def import_usage_sharded(self, model_id, file_path, max_shard_bytes=MAX_IMPORT_BYTES, max_workers=4, max_retries=2, progress_callback=None):
+        """
+        Same as Recommendations.import_usage_sharded: the shards are uploaded max_workers at a
+        time, then those which failed are retried one at a time.
+        """
+        file_name = os.path.basename(file_path)
+        shards = plan_shards(file_path, max_shard_bytes)
+        progress = _ShardProgress(progress_callback)
+
+        async def import_shard(index):
+            offset, length = shards[index]
+            with MultipartFileStream(file_path, shard_file_name(file_name, index), offset, length, progress_callback=progress.callback(index)) as body:
+                return await self._import_stream(model_id, file_path, RecommendationsUris.import_usage, body)
+
+        reports = [None] * len(shards)
+        errors = {}
+        async for outcome in bounded_map_async(import_shard, range(len(shards)), max_workers, ordered=False, max_in_flight=max_workers):
+            if outcome.error is not None:
+                errors[outcome.index] = outcome.error
+            else:
+                reports[outcome.index] = outcome.result
+
+        for index in sorted(errors):
+            for attempt in range(max_retries):
+                try:
+                    reports[index] = await import_shard(index)
+                    break
+                except Exception as e:
+                    errors[index] = e
+
+        return self._shards_report(model_id, file_path, reports, errors)
+
+    async def get_recommendations_bulk(self, model_id, item_id_lists, number_of_results=10, include_metadata=False, max_workers=8, ordered=True, columnar=False):
+        """
+        Same as Recommendations.get_recommendations_bulk, as an async generator:
+
+            async for result in rs.get_recommendations_bulk(model_id, item_id_lists):
+                ...
+        """
+        async def recommend(item_id_list):
+            return await self.get_recommendation(model_id, item_id_list, number_of_results, include_metadata, columnar)
+
+        async for outcome in bounded_map_async(recommend, item_id_lists, max_workers, ordered):
+            yield BulkRecommendation(*outcome)
+
+    async def wait_for_build(self, model_id, build_id, timeout=None, initial_interval=1, max_interval=60, backoff=1.5):
+        '''
+        Waits for build to either complete, cancel, or error out. Cancel the calling task to stop waiting.
+        The build is checked often at first and less often the longer it runs.
+
+        Args:
+            model_id (str)
+            build_id (str)
+            timeout (float, optional): seconds to wait before raising asyncio.TimeoutError.
+
+        Returns:
+            str : Status of the build.
+        '''
+        async def wait():
+            interval = initial_interval
+            status = await self.get_build_status(model_id, build_id)
+            while not BuildStatus.is_complete(status):
+                await asyncio.sleep(interval * random.uniform(0.9, 1.1))
+                interval = min(max_interval, interval * backoff)
+                status = await self.get_build_status(model_id, build_id)
+            return status
+
+        return await asyncio.wait_for(wait(), timeout)
+
+    async def close(self):
+        await self.transport.close()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        await self.close()
+
+class AsyncTextAnalytics(TextAnalytics):
+    '''
+    asyncio version of TextAnalytics. Each service call is a coroutine.
+    '''
+
+    def __init__(self, account_key, transport=None, coalesce=True, cache=None, dedup=None, codec=None):
+        '''
+        account_key (str): account_key provided at https://datamarket.azure.com/account/keys
+        transport (AsyncTransport, optional): a pooled transport, which may be shared with other clients.
+        coalesce (bool, optional): if True, identical calls in flight share one request.
+        cache (TTLCache or DiskCache, optional): caches results.  A DiskCache is read and written 
+            in the event loop's default executor.
+        dedup (ResultCache, optional): if given, each distinct text is sent once.
+        codec (JsonCodec, optional): encodes requests and decodes responses.
+        '''
+        self.auth = ('', account_key)
+        self.transport = transport or AsyncTransport()
+        self.flights = SingleFlight() if coalesce else None
+        self.cache = cache
+        self.dedup = dedup
+        self.codec = codec or DEFAULT_CODEC
+
+    @instrumented
+    @coalesced
+    @cached
+    @deduplicated('sentiment')
+    async def get_sentiment(self, text):
+        response = await self.transport.get(TextAnalyticsUris.get_sentiment, params = { 'text':text }, auth=self.auth)
+        return self._json(response, 'sentiment')['Score']
+
+    @instrumented
+    @coalesced
+    @cached
+    async def get_sentiment_batch(self, text_blocks, max_workers=4):
+        return await self._batch(ANALYSES['sentiment'], text_blocks, max_workers)
+
+    @instrumented
+    @coalesced
+    @cached
+    @deduplicated('key_phrases')
+    async def get_key_phrases(self, text):
+        response = await self.transport.get(TextAnalyticsUris.get_key_phrases, params = { 'text':text }, auth=self.auth)
+        return self._json(response, 'key phrases')['KeyPhrases']
+
+    @instrumented
+    @coalesced
+    @cached
+    async def get_key_phrases_batch(self, text_blocks, max_workers=4):
+        return await self._batch(ANALYSES['key_phrases'], text_blocks, max_workers)
+
+    @instrumented
+    @coalesced
+    @cached
+    @deduplicated('language')
+    async def get_language(self, text, number_of_languages_to_detect=1):
+        params = { 'text':text, 'NumberOfLanguagesToDetect':number_of_languages_to_detect }
+        response = await self.transport.get(TextAnalyticsUris.get_language, params = params, auth=self.auth)
+        return self._json(response, 'language')['DetectedLanguages']
+
+    @instrumented
+    @coalesced
+    @cached
+    async def get_language_batch(self, text_blocks, max_workers=4):
+        return await self._batch(ANALYSES['language'], text_blocks, max_workers)
+
+    @instrumented
+    async def _batch(self, analysis, text_blocks, max_workers):
+        documents = list(with_ids(text_blocks))
+        if self.dedup is None:
+            return await self._send_documents(analysis, documents, max_workers)
+        batch = self.dedup.batch(analysis, documents)
+        return batch.results(await self._send_documents(analysis, batch.unique, max_workers))
+
+    @instrumented
+    @coalesced
+    async def analyze(self, text_blocks, sentiment=True, key_phrases=True, language=True, max_workers=4):
+        analyses = _requested(sentiment, key_phrases, language)
+        documents = list(with_ids(text_blocks))
+        if self.dedup is not None:
+            parts = await _gather([self._batch(analysis, documents, max_workers) for analysis in analyses])
+            return _merged(documents, dict((analysis.name, part) for analysis, part in zip(analyses, parts)))
+
+        semaphore = asyncio.Semaphore(max_workers)
+        sends = [(analysis, batch) for batch in plan_batches(documents, codec=self.codec) for analysis in analyses]
+        parts = await _gather([_limited(semaphore, self._send_batch, analysis, batch) for analysis, batch in sends])
+        results = dict((analysis.name, []) for analysis in analyses)
+        for (analysis, batch), part in zip(sends, parts):
+            results[analysis.name].extend(part)
+        return _merged(documents, results)
+
+    async def _send_documents(self, analysis, documents, max_workers):
+        batches = list(plan_batches(documents, codec=self.codec))
+        semaphore = asyncio.Semaphore(max_workers)
+        parts = await _gather([_limited(semaphore, self._send_batch, analysis, batch) for batch in batches])
+        results = [result for part in parts for result in part]
+        return in_input_order(results, documents)
+
+    async def _send_batch(self, analysis, batch):
+        response = await self.transport.post(analysis.batch_uri, batch.payload, headers={ 'Content-Type' : 'application/json' }, auth=self.auth)
+        return self._json(response, analysis.description)[analysis.batch_key]
+
+    def iter_sentiment(self, text_blocks, max_workers=4, ordered=True, max_in_flight=None, batch_size=MAX_BATCH_DOCUMENTS):
+        '''
+        Same as TextAnalytics.iter_sentiment, as an async generator:
+
+            async for scored in ta.iter_sentiment(lines):
+                ...
+        '''
+        return self._iter(ANALYSES['sentiment'], text_blocks, max_workers, ordered, max_in_flight, batch_size)
+
+    def iter_key_phrases(self, text_blocks, max_workers=4, ordered=True, max_in_flight=None, batch_size=MAX_BATCH_DOCUMENTS):
+        return self._iter(ANALYSES['key_phrases'], text_blocks, max_workers, ordered, max_in_flight, batch_size)
+
+    def iter_language(self, text_blocks, max_workers=4, ordered=True, max_in_flight=None, batch_size=MAX_BATCH_DOCUMENTS):
+        return self._iter(ANALYSES['language'], text_blocks, max_workers, ordered, max_in_flight, batch_size)
+
+    async def _iter(self, analysis, text_blocks, max_workers, ordered, max_in_flight, batch_size):
+        async def send(planned_batch):
+            return await self._stream_batch(analysis, planned_batch[1])
+
+        planned = _planned(text_blocks, batch_size, self.codec)
+        async for outcome in bounded_map_async(send, planned, max_workers, ordered, max_in_flight):
+            start, batch = outcome.argument
+            for result in _stream_results(analysis, start, batch, outcome.result, outcome.error):
+                yield result
+
+    @instrumented
+    async def _stream_batch(self, analysis, batch):
+        if self.dedup is None:
+            return await self._send_batch(analysis, batch)
+        deduplicated = self.dedup.batch(analysis, batch.documents)
+        return deduplicated.results(await self._send_documents(analysis, deduplicated.unique, 1))
+
+    async def close(self):
+        await self.transport.close()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        await self.close()
+
+class AsyncAnomalyDetection(AnomalyDetection):
+    '''
+    asyncio version of AnomalyDetection. Each service call is a coroutine.
+    '''
+
+    def __init__(self, account_key, transport=None, coalesce=True, cache=None, codec=None):
+        '''
+        account_key (str): account_key provided at https://datamarket.azure.com/account/keys
+        transport (AsyncTransport, optional): a pooled transport, which may be shared with other clients.
+        coalesce (bool, optional): if True, identical calls in flight share one request.
+        cache (TTLCache or DiskCache, optional): caches results.  A DiskCache is read and written 
+            in the event loop's default executor.
+        codec (JsonCodec, optional): decodes responses.
+        '''
+        self.auth = ('', account_key)
+        self.transport = transport or AsyncTransport()
+        self.flights = SingleFlight() if coalesce else None
+        self.cache = cache
+        self.codec = codec or DEFAULT_CODEC
+
+    @instrumented
+    async def score(self, data, spike_detector_tukey_threshold=3, spike_detector_zscore_threshold=3):
+        '''
+        Given a list of tuples (datetime, float) this provides a list of results showing anomalies.
+        '''
+        formatted_data = self._format_data(data)
+        params = self._format_params(spike_detector_tukey_threshold, spike_detector_zscore_threshold)
+        raw = await self.score_raw(formatted_data, params)
+        return self._make_named_tuples(raw)
+
+    @instrumented
+    @coalesced
+    @cached
+    async def score_raw(self, data, params):
+        '''
+        Given a string of data and params, returns a string representing a table of data.
+        '''
+        response = await self.transport.get(AnomalyDetectionUris.score, params = { 'data':data, 'params' : params }, auth=self.auth)
+        return self._parse_table(self._json(response))
+
+    async def close(self):
+        await self.transport.close()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        await self.close()
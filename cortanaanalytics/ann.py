@@ -0,0 +1,255 @@
+﻿#-------------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation 
+# All rights reserved. 
+# 
+# Distributed under the terms of the MIT License
+#-------------------------------------------------------------------------
+'''
+An approximate nearest neighbour (inverted file) index over item vectors, which answers item to
+item lookups in process, in the shape Recommendations.get_recommendation returns.  The vectors can
+come from a local FactorizationModel or from the caller.  Requires numpy.
+
+    index = IvfIndex.from_factorization(FactorizationModel.load('rank-20'), nprobe=4)
+    items = index.get_recommendation(model_id, ['2406e770-769c-4189-89de-1c9283f93a96'])
+
+Items are clustered around number_of_lists centroids; a query only scores the items of its nprobe
+closest clusters.  Raising nprobe trades latency for recall, nprobe = number_of_lists is exact.
+'''
+from .factorization import _require_numpy
+from .recommendations import BulkRecommendation, RecommendedItem
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# queries and vectors are scored against the centroids this many rows at a time
+CHUNK_SIZE = 65536
+# centroids are placed using at most this many vectors per centroid
+TRAINING_SAMPLE = 256
+
+class IvfIndex:
+    '''
+    Unit length item vectors grouped by their closest centroid, scored by cosine similarity.
+    '''
+
+    def __init__(self, item_ids, vectors, item_names=None, number_of_lists=None, nprobe=8, iterations=10, seed=0, reasoning='Similar items'):
+        '''
+        Args:
+            item_ids (list of str)
+            vectors (numpy.ndarray): one row per item id.
+            item_names (list of str, optional)
+            number_of_lists (int, optional): centroids to cluster around, by default the square
+                root of the number of items.
+            nprobe (int, optional): lists scored by each query unless a query asks otherwise.
+            iterations (int, optional): k-means iterations used to place the centroids.
+            seed (int, optional): seeds the initial centroids.
+            reasoning (str, optional): the reasoning of recommended items.
+        '''
+        _require_numpy()
+        vectors = np.asarray(vectors, dtype=np.float64)
+        if vectors.ndim != 2 or len(vectors) != len(item_ids):
+            raise ValueError('vectors must have one row per item id')
+        self.item_ids = list(item_ids)
+        self.item_names = list(item_names) if item_names is not None else [''] * len(self.item_ids)
+        self.nprobe = nprobe
+        self.reasoning = reasoning
+        self._index = dict((item_id, i) for i, item_id in enumerate(self.item_ids))
+
+        self.vectors = _normalize(vectors)
+        if number_of_lists is None:
+            number_of_lists = int(np.sqrt(len(self.item_ids))) or 1
+        self.centroids = _kmeans(self.vectors, min(number_of_lists, len(self.item_ids)) or 1, iterations, seed)
+
+        self._fill_lists()
+
+    def _fill_lists(self):
+        # the items of list l are members[offsets[l]:offsets[l + 1]], their vectors are contiguous
+        assignments = _closest(self.vectors, self.centroids, 1)[:, 0]
+        self.members = np.argsort(assignments, kind='stable')
+        self.offsets = np.zeros(len(self.centroids) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(assignments, minlength=len(self.centroids)), out=self.offsets[1:])
+        self._list_vectors = self.vectors[self.members]
+
+    @classmethod
+    def from_factorization(cls, model, **kwargs):
+        '''
+        Indexes the item factors of a FactorizationModel. Keyword arguments are passed to IvfIndex.
+        '''
+        kwargs.setdefault('reasoning', 'Similar usage')
+        return cls(model.item_ids, model.item_factors, model.item_names, **kwargs)
+
+    @property
+    def number_of_lists(self):
+        return len(self.centroids)
+
+    def search(self, queries, number_of_results=10, nprobe=None, excluded=None):
+        '''
+        Finds the items closest to each of a batch of query vectors. Queries probing the same
+        list are scored together with one matrix product.
+
+        Args:
+            queries (numpy.ndarray): one query vector per row.
+            number_of_results (int, optional)
+            nprobe (int, optional): overrides the index's nprobe for these queries.
+            excluded (list of sequences of int, optional): item indexes left out of each query's results.
+
+        Returns:
+            list of (numpy.ndarray of item indexes, numpy.ndarray of scores), best first, per query.
+        '''
+        queries = _normalize(np.atleast_2d(np.asarray(queries, dtype=np.float64)))
+        nprobe = min(nprobe or self.nprobe, self.number_of_lists)
+        probes = _closest(queries, self.centroids, nprobe)
+
+        # keep only enough of each list to fill the results, excluded items included
+        keep = number_of_results + (max(len(items) for items in excluded) if excluded else 0)
+        found = [[] for query in queries]
+        for probed in np.unique(probes):
+            start, stop = self.offsets[probed], self.offsets[probed + 1]
+            if start == stop:
+                continue
+            asking = np.flatnonzero((probes == probed).any(axis=1))
+            scores = queries[asking] @ self._list_vectors[start:stop].T
+            if keep < stop - start:
+                best = np.argpartition(-scores, keep - 1, axis=1)[:, :keep]
+                scores = np.take_along_axis(scores, best, axis=1)
+            else:
+                best = np.broadcast_to(np.arange(stop - start), scores.shape)
+            for row, query in enumerate(asking):
+                found[query].append((self.members[start + best[row]], scores[row]))
+
+        results = []
+        for query, parts in enumerate(found):
+            if not parts:
+                results.append((np.zeros(0, dtype=np.int64), np.zeros(0)))
+                continue
+            items = np.concatenate([part[0] for part in parts])
+            scores = np.concatenate([part[1] for part in parts])
+            if excluded and len(excluded[query]):
+                allowed = ~np.isin(items, excluded[query])
+                items, scores = items[allowed], scores[allowed]
+            order = np.lexsort((items, -scores))[:number_of_results]
+            results.append((items[order], scores[order]))
+        return results
+
+    def related(self, item_id, number_of_results=10, nprobe=None):
+        '''
+        The items whose vectors are most similar to that of item_id.
+
+        Returns:
+            list of (item id, score), best first.
+        '''
+        return [(self.item_ids[item], score) for item, score in self._query([[item_id]], number_of_results, nprobe)[0]]
+
+    def get_recommendation(self, model_id, item_id_list, number_of_results=10, include_metadata = False, nprobe=None):
+        '''
+        Same as Recommendations.get_recommendation, answered from this index. model_id and
+        include_metadata are ignored. Items are scored by cosine similarity to the mean of the
+        seed items' vectors.
+
+        Returns:
+            list of RecommendedItem
+        '''
+        return self._recommended_items(self._query([item_id_list], number_of_results, nprobe)[0])
+
+    def get_recommendations_bulk(self, model_id, item_id_lists, number_of_results=10, include_metadata = False, nprobe=None):
+        '''
+        Same as Recommendations.get_recommendations_bulk, answered from this index as one batch
+        of queries. Results are yielded in input order.
+
+        Yields:
+            BulkRecommendation
+        '''
+        item_id_lists = list(item_id_lists)
+        for index, (item_id_list, best) in enumerate(zip(item_id_lists, self._query(item_id_lists, number_of_results, nprobe))):
+            yield BulkRecommendation(index, item_id_list, self._recommended_items(best), None)
+
+    def _query(self, item_id_lists, number_of_results, nprobe):
+        seeds = [sorted(set(self._index[item_id] for item_id in item_id_list if item_id in self._index)) for item_id_list in item_id_lists]
+        asked = [i for i, items in enumerate(seeds) if items]
+        results = [[] for item_id_list in item_id_lists]
+        if not asked:
+            return results
+        queries = np.array([self.vectors[seeds[i]].mean(axis=0) for i in asked])
+        found = self.search(queries, number_of_results, nprobe, [seeds[i] for i in asked])
+        for i, (items, scores) in zip(asked, found):
+            results[i] = list(zip(items.tolist(), scores.tolist()))
+        return results
+
+    def _recommended_items(self, best):
+        return [RecommendedItem(self.item_ids[item], self.item_names[item], score, self.reasoning) for item, score in best]
+
+    def save(self, path):
+        '''
+        Writes the index to path, as a .npz archive which IvfIndex.load reads back without
+        reclustering.  The path is used as given; numpy adds no .npz suffix to an open file.
+        '''
+        with open(path, 'wb') as file:
+            np.savez(file,
+                item_ids=np.array(self.item_ids, dtype=str),
+                item_names=np.array(self.item_names, dtype=str),
+                vectors=self.vectors,
+                centroids=self.centroids,
+                nprobe=self.nprobe,
+                reasoning=self.reasoning)
+
+    @classmethod
+    def load(cls, path):
+        '''
+        Reads an index written by save.
+        '''
+        _require_numpy()
+        with np.load(path) as saved:
+            index = cls.__new__(cls)
+            index.item_ids = saved['item_ids'].tolist()
+            index.item_names = saved['item_names'].tolist()
+            index.nprobe = int(saved['nprobe'])
+            index.reasoning = str(saved['reasoning'])
+            index._index = dict((item_id, i) for i, item_id in enumerate(index.item_ids))
+            index.vectors = saved['vectors']
+            index.centroids = saved['centroids']
+        index._fill_lists()
+        return index
+
+    def __len__(self):
+        return len(self.item_ids)
+
+def _normalize(vectors):
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.where(norms > 0, norms, 1)
+
+def _closest(vectors, centroids, count):
+    # the indexes of the count closest centroids of each vector, closest first
+    closest = np.empty((len(vectors), count), dtype=np.int64)
+    for start in range(0, len(vectors), CHUNK_SIZE):
+        scores = vectors[start:start + CHUNK_SIZE] @ centroids.T
+        if count == 1:
+            closest[start:start + CHUNK_SIZE, 0] = scores.argmax(axis=1)
+            continue
+        if count < len(centroids):
+            best = np.argpartition(-scores, count - 1, axis=1)[:, :count]
+        else:
+            best = np.broadcast_to(np.arange(len(centroids)), scores.shape)
+        order = np.argsort(-np.take_along_axis(scores, best, axis=1), axis=1, kind='stable')
+        closest[start:start + CHUNK_SIZE] = np.take_along_axis(best, order, axis=1)
+    return closest
+
+def _kmeans(vectors, count, iterations, seed):
+    # spherical k-means: centroids are unit length and vectors join the most similar
+    random = np.random.default_rng(seed)
+    if not len(vectors):
+        return np.zeros((count, vectors.shape[1]))
+    if len(vectors) > TRAINING_SAMPLE * count:
+        vectors = vectors[random.choice(len(vectors), TRAINING_SAMPLE * count, replace=False)]
+    centroids = vectors[random.choice(len(vectors), count, replace=False)].copy()
+    for iteration in range(iterations):
+        assignments = _closest(vectors, centroids, 1)[:, 0]
+        order = np.argsort(assignments, kind='stable')
+        sizes = np.bincount(assignments, minlength=count)
+        sums = np.zeros_like(centroids)
+        used = np.flatnonzero(sizes)
+        sums[used] = np.add.reduceat(vectors[order], (np.cumsum(sizes) - sizes)[used], axis=0)
+        empty = np.flatnonzero(sizes == 0)
+        sums[empty] = vectors[random.choice(len(vectors), len(empty))]
+        centroids = _normalize(sums)
+    return centroids
@@ -4,7 +4,12 @@
 # 
 # Distributed under the terms of the MIT License
 #-------------------------------------------------------------------------
-import requests
+from .transport import Transport
+from .instrumentation import instrumented
+from .singleflight import SingleFlight, coalesced
+from .cache import cached
+from .exceptions import error_for
+from .codec import DEFAULT_CODEC, decode
 from collections import namedtuple
 from datetime import datetime
 
@@ -12,12 +17,25 @@ DATE_FORMAT = '%m/%d/%Y %H:%M:%S %p'
 
 class AnomalyDetection:
 
-    def __init__(self, account_key):
+    def __init__(self, account_key, transport=None, warm_up=False, coalesce=True, cache=None, codec=None):
         '''
         account_key (str): account_key provided at https://datamarket.azure.com/account/keys
+        transport (Transport, optional): a pooled transport, which may be shared with other clients.
+        warm_up (bool, optional): if True, open a connection to the service now.
+        coalesce (bool, optional): 
+            if True, identical calls made while one is in flight share its request and its result.
+        cache (TTLCache or DiskCache, optional): caches scores. A DiskCache keeps them across restarts.
+        codec (JsonCodec, optional): decodes responses, by default with orjson if it is installed.
         '''
         self.auth = ('', account_key)
+        self.transport = transport or Transport()
+        self.flights = SingleFlight() if coalesce else None
+        self.cache = cache
+        self.codec = codec or DEFAULT_CODEC
+        if warm_up:
+            self.transport.warm_up(Uris.root)
 
+    @instrumented
     def score(self, data, spike_detector_tukey_threshold=3, spike_detector_zscore_threshold=3):
         '''
         Given a list of tuples (datetime, float) this provides a list of results showing anomalies.
@@ -27,18 +45,26 @@ class AnomalyDetection:
         spike_detector_tukey_threshold (int, optional)
         spike_detector_zscore_threshold (int, optional)
         '''
+        formatted_data = self._format_data(data)
+        params = self._format_params(spike_detector_tukey_threshold, spike_detector_zscore_threshold)
+        raw = self.score_raw(formatted_data, params)
+        results = self._make_named_tuples(raw)
+        return results
 
+    def _format_data(self, data):
         formatted_data = ""
         for i in data:
             date, value = i
             date_str = date.strftime(DATE_FORMAT)
             formatted_data += '{}={};'.format(date_str, value)
-            
-        params = "SpikeDetector.TuKeyThresh={}; SpikeDetector.ZscoreThresh={}".format(spike_detector_tukey_threshold, spike_detector_zscore_threshold)
-        raw = self.score_raw(formatted_data, params)
-        results = self._make_named_tuples(raw)
-        return results
+        return formatted_data
+
+    def _format_params(self, spike_detector_tukey_threshold, spike_detector_zscore_threshold):
+        return "SpikeDetector.TuKeyThresh={}; SpikeDetector.ZscoreThresh={}".format(spike_detector_tukey_threshold, spike_detector_zscore_threshold)
 
+    @instrumented
+    @coalesced
+    @cached
     def score_raw(self, data, params):
         '''
         Given a string of data and params, returns a string representing a table of data.
@@ -56,8 +82,16 @@ class AnomalyDetection:
         '''
 
         API_URL = Uris.score
-        response = requests.get(API_URL, params = { 'data':data, 'params' : params }, auth=self.auth)
-        json_response = response.json()
+        response = self.transport.get(API_URL, params = { 'data':data, 'params' : params }, auth=self.auth)
+        return self._parse_table(self._json(response))
+
+    def _json(self, response):
+        if response.status_code != 200:
+            raise error_for(response, "Error {0}: Failed to score data, \n reason {1}->{2}".format(
+                response.status_code, response.reason, response.content))
+        return decode(self.codec, response)
+
+    def _parse_table(self, json_response):
         table = json_response['table']
         if len(table) > 2:
             table = table[1:-1] # trim '"' characters
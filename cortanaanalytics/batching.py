@@ -0,0 +1,80 @@
+﻿#-------------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation 
+# All rights reserved. 
+# 
+# Distributed under the terms of the MIT License
+#-------------------------------------------------------------------------
+'''
+Splitting of Text Analytics documents into batch requests which the service accepts.
+'''
+from .codec import DEFAULT_CODEC
+from collections import namedtuple
+
+# the most documents, and bytes of request body, the service accepts in one batch call
+MAX_BATCH_DOCUMENTS = 1000
+MAX_BATCH_BYTES = 1024 * 1024
+
+Batch = namedtuple('Batch', ['documents', 'payload'])
+
+_PREFIX = b'{"Inputs":['
+_SUFFIX = b']}'
+
+def with_ids(text_blocks, start=0):
+    '''
+    Yields each of text_blocks as a document dict.  Strings become {"Id", "Text"} documents, and 
+    documents without an Id get their index, counted from start, as their Id, or "<index>-<n>" 
+    if a document was given that Id.  All of text_blocks is read first, as the Ids given must be 
+    known; two documents given the same Id raise ValueError.
+    '''
+    text_blocks = list(text_blocks)
+    # compared as strings, as the results are matched to their documents
+    taken = set()
+    for block in text_blocks:
+        if not isinstance(block, str) and 'Id' in block:
+            if str(block['Id']) in taken:
+                raise ValueError('More than one document has the Id "{0}"'.format(block['Id']))
+            taken.add(str(block['Id']))
+
+    for index, block in enumerate(text_blocks, start):
+        if isinstance(block, str) or 'Id' not in block:
+            document_id, n = str(index), 0
+            while document_id in taken:
+                n += 1
+                document_id = '{0}-{1}'.format(index, n)
+            taken.add(document_id)
+            yield { 'Id' : document_id, 'Text' : block } if isinstance(block, str) else dict(block, Id=document_id)
+        else:
+            yield block
+
+def plan_batches(documents, max_documents=MAX_BATCH_DOCUMENTS, max_bytes=MAX_BATCH_BYTES, codec=DEFAULT_CODEC):
+    '''
+    Packs documents, in order, into batches of at most max_documents documents and max_bytes 
+    bytes of request body.  Each document is encoded once, by codec, and documents are consumed lazily.
+
+    Returns:
+        generator of Batch(documents, payload), where payload is the encoded request body.
+    '''
+    empty_size = len(_PREFIX) + len(_SUFFIX)
+    batch, encoded, size = [], [], empty_size
+    for document in documents:
+        body = codec.dumps(document)
+        if empty_size + len(body) > max_bytes:
+            raise ValueError('Document {0} is {1} bytes, more than the {2} bytes of a batch'.format(document.get('Id'), len(body), max_bytes))
+        # documents after the first are preceded by a comma
+        if batch and (len(batch) >= max_documents or size + 1 + len(body) > max_bytes):
+            yield Batch(batch, _PREFIX + b','.join(encoded) + _SUFFIX)
+            batch, encoded, size = [], [], empty_size
+        size += len(body) + (1 if batch else 0)
+        batch.append(document)
+        encoded.append(body)
+    if batch:
+        yield Batch(batch, _PREFIX + b','.join(encoded) + _SUFFIX)
+
+def in_input_order(results, documents):
+    '''
+    Sorts the results of a batch call, which carry the Id of their document, into the order of documents.
+    '''
+    positions = {}
+    for index, document in enumerate(documents):
+        positions.setdefault(str(document['Id']), index)
+    return sorted(results, key=lambda result: positions.get(str(result.get('Id')), len(positions)))
@@ -0,0 +1,230 @@
+﻿#-------------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation 
+# All rights reserved. 
+# 
+# Distributed under the terms of the MIT License
+#-------------------------------------------------------------------------
+from .exceptions import ResponseFormatError
+from concurrent.futures import Future
+from threading import Condition, Thread
+from time import monotonic
+import random
+
+class BuildStatus:
+    create = 'Create'
+    queued = 'Queued'
+    building = 'Building'
+    success = 'Success'
+    error = 'Error'
+    cancelling = 'Cancelling'
+    cancelled = 'Cancelled'
+
+    @staticmethod
+    def is_complete(status):
+        '''
+        True if a build with the given status will not change status again.
+        '''
+        return status in (BuildStatus.error, BuildStatus.cancelled, BuildStatus.success)
+
+class BuildMonitor:
+    '''
+    Waits for many builds, across many models, at once.  Each model's builds are checked 
+    with a single GetModelBuildsStatus call per tick.  A model is checked often while its 
+    builds are new and less often the longer they run, with random jitter so that monitors
+    started together do not poll together.
+
+        monitor = BuildMonitor(rs)
+        futures = [monitor.watch(model_id, build_id) for build_id in build_ids]
+        monitor.run(timeout=3600)
+        statuses = [f.result() for f in futures]
+
+    Alternatively, start() checks the builds on a background thread until stop() is called.
+    '''
+
+    def __init__(self, recommendations, initial_interval=1, max_interval=60, backoff=1.5, jitter=0.1, max_errors=3):
+        '''
+        recommendations (Recommendations): the client used to get build statuses.
+        initial_interval (float, optional): seconds between the first checks of a model.
+        max_interval (float, optional): the most seconds between checks of a model.
+        backoff (float, optional): how much the interval grows after each check.
+        jitter (float, optional): each interval is randomly scaled by up to this fraction.
+        max_errors (int, optional): 
+            consecutive failed status calls after which a model's builds fail with the error, and
+            consecutive checks missing a build after which it fails with ResponseFormatError.
+        '''
+        self.recommendations = recommendations
+        self.initial_interval = initial_interval
+        self.max_interval = max_interval
+        self.backoff = backoff
+        self.jitter = jitter
+        self.max_errors = max_errors
+        self._models = {}
+        self._condition = Condition()
+        self._thread = None
+        self._stopping = False
+
+    def watch(self, model_id, build_id, callback=None, timeout=None):
+        '''
+        Starts watching a build.
+
+        Args:
+            model_id (str)
+            build_id (str)
+            callback (callable, optional): called with the future once the build completes.
+            timeout (float, optional): 
+                seconds after which the future fails with TimeoutError if the build has not completed.
+
+        Returns:
+            concurrent.futures.Future: resolves to the final status of the build.
+        '''
+        future = Future()
+        if callback is not None:
+            future.add_done_callback(callback)
+        deadline = None if timeout is None else monotonic() + timeout
+
+        with self._condition:
+            model = self._models.get(model_id)
+            if model is None:
+                model = self._models[model_id] = _WatchedModel()
+            # new builds are checked right away and then often, whatever the model's current interval
+            model.interval = self.initial_interval
+            model.next_poll = monotonic()
+            model.builds[str(build_id)] = (future, deadline)
+            self._condition.notify_all()
+        return future
+
+    def __len__(self):
+        '''
+        The number of builds still being watched.
+        '''
+        with self._condition:
+            return sum(len(model.builds) for model in self._models.values())
+
+    def poll(self):
+        '''
+        Checks every model which is due for a check.
+
+        Returns:
+            float: the time (as time.monotonic()) of the next check due, or None if nothing is watched.
+        '''
+        with self._condition:
+            now = monotonic()
+            due = [model_id for model_id, model in self._models.items() if model.next_poll <= now]
+
+        for model_id in due:
+            try:
+                statuses = self.recommendations.get_build_statuses(model_id)
+                error = None
+            except Exception as e:
+                statuses = {}
+                error = e
+            self._update(model_id, statuses, error)
+
+        with self._condition:
+            if not self._models:
+                return None
+            return min(model.next_poll for model in self._models.values())
+
+    def _update(self, model_id, statuses, error):
+        completed = []
+        with self._condition:
+            model = self._models[model_id]
+            model.errors = model.errors + 1 if error is not None else 0
+            now = monotonic()
+            for build_id, (future, deadline) in list(model.builds.items()):
+                status = statuses.get(build_id)
+                # an unknown or deleted build never completes
+                if error is None and status is None:
+                    model.missing[build_id] = model.missing.get(build_id, 0) + 1
+                else:
+                    model.missing.pop(build_id, None)
+
+                if BuildStatus.is_complete(status):
+                    completed.append((future, status, None))
+                elif model.errors >= self.max_errors:
+                    completed.append((future, None, error))
+                elif model.missing.get(build_id, 0) >= self.max_errors:
+                    completed.append((future, None, ResponseFormatError("Failed to find entry/content/properties[Id='{0}']/Status Element for model {1}".format(build_id, model_id))))
+                elif deadline is not None and deadline <= now:
+                    completed.append((future, None, TimeoutError("Build {0} of model {1} did not complete in time, last status {2}".format(build_id, model_id, status))))
+                else:
+                    continue
+                del model.builds[build_id]
+                model.missing.pop(build_id, None)
+
+            if model.builds:
+                delay = model.interval * random.uniform(1 - self.jitter, 1 + self.jitter)
+                model.interval = min(self.max_interval, model.interval * self.backoff)
+                deadlines = [deadline for future, deadline in model.builds.values() if deadline is not None]
+                model.next_poll = min([now + delay] + deadlines)
+            else:
+                del self._models[model_id]
+
+        # resolve outside the lock, callbacks may watch more builds
+        for future, status, exception in completed:
+            if exception is not None:
+                future.set_exception(exception)
+            else:
+                future.set_result(status)
+
+    def run(self, timeout=None):
+        '''
+        Checks builds until none are left to watch.
+
+        Args:
+            timeout (float, optional): seconds after which to stop, even if builds are still being watched.
+        '''
+        stop_time = None if timeout is None else monotonic() + timeout
+        while not self._stopping:
+            next_poll = self.poll()
+            if next_poll is None:
+                return
+            if stop_time is not None:
+                if monotonic() >= stop_time:
+                    return
+                next_poll = min(next_poll, stop_time)
+            with self._condition:
+                # watch() may add a build which is due sooner, so wait on the condition
+                self._condition.wait(max(0, next_poll - monotonic()))
+
+    def start(self):
+        '''
+        Checks builds on a background thread until stop() is called.
+        '''
+        with self._condition:
+            if self._thread is not None:
+                return
+            self._stopping = False
+            self._thread = Thread(target=self._run_forever, name='BuildMonitor', daemon=True)
+            self._thread.start()
+
+    @property
+    def running(self):
+        '''
+        True while a background thread started by start() is checking builds.
+        '''
+        return self._thread is not None
+
+    def _run_forever(self):
+        while not self._stopping:
+            self.run()
+            with self._condition:
+                while not self._models and not self._stopping:
+                    self._condition.wait()
+
+    def stop(self):
+        with self._condition:
+            self._stopping = True
+            thread, self._thread = self._thread, None
+            self._condition.notify_all()
+        if thread is not None:
+            thread.join()
+
+class _WatchedModel:
+    def __init__(self):
+        self.builds = {}
+        self.interval = 0
+        self.next_poll = float('inf')
+        self.errors = 0
+        # build id -> consecutive checks which did not find the build
+        self.missing = {}
@@ -0,0 +1,300 @@
+﻿#-------------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation 
+# All rights reserved. 
+# 
+# Distributed under the terms of the MIT License
+#-------------------------------------------------------------------------
+from .singleflight import _call_key
+from collections import OrderedDict
+from functools import wraps
+from threading import Lock, local
+from time import monotonic, time
+import asyncio
+import hashlib
+import json
+import os
+import sqlite3
+
+_MISSING = object()
+
+class TTLCache:
+    '''
+    A thread-safe, in-process cache of bounded size.  The least recently used entry is evicted
+    when the cache is full, and entries expire ttl seconds after they were set.
+    '''
+
+    def __init__(self, max_size=1024, ttl=300, clock=monotonic):
+        '''
+        max_size (int, optional): the most entries to keep.
+        ttl (float, optional): seconds an entry stays valid. None means entries do not expire.
+        clock (callable, optional): returns the current time in seconds.
+        '''
+        self.max_size = max_size
+        self.ttl = ttl
+        self.clock = clock
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = Lock()
+
+    def get(self, key, default=None):
+        '''
+        Returns the value stored for key, or default if it is missing or has expired.
+        '''
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                value, expires = entry
+                if expires is None or expires > self.clock():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._entries[key]
+            self.misses += 1
+            return default
+
+    def set(self, key, value):
+        with self._lock:
+            expires = None if self.ttl is None else self.clock() + self.ttl
+            self._entries[key] = (value, expires)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def evict(self, predicate):
+        '''
+        Removes every entry whose key satisfies predicate(key).
+        '''
+        with self._lock:
+            for key in [key for key in self._entries if predicate(key)]:
+                del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+class DiskCache:
+    '''
+    A persistent cache in a SQLite database, with the interface of TTLCache.  It survives
+    restarts and may be shared by the threads and processes of one host; SQLite's write-ahead
+    log lets readers go on while another process writes.
+
+    Keys are stored by the SHA-256 of their JSON text.  Values must be JSON serializable and
+    come back as JSON decodes them, e.g. tuples as lists.  When the cache is full, expired
+    entries and then the least recently used ones are removed.
+
+    Each thread has its own connection to the database; close() closes them all, and the cache
+    may be used as a context manager which closes it on exit.
+    '''
+
+    SCHEMA = '''
+        CREATE TABLE IF NOT EXISTS entries (
+            key BLOB PRIMARY KEY, key_text TEXT NOT NULL, value TEXT NOT NULL, 
+            size INTEGER NOT NULL, expires REAL, accessed REAL NOT NULL) WITHOUT ROWID;
+        CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed);
+        CREATE INDEX IF NOT EXISTS entries_expires ON entries (expires);
+        CREATE TABLE IF NOT EXISTS totals (id INTEGER PRIMARY KEY CHECK (id = 0), count INTEGER NOT NULL, size INTEGER NOT NULL);
+        INSERT OR IGNORE INTO totals VALUES (0, 0, 0);
+        CREATE TRIGGER IF NOT EXISTS entries_insert AFTER INSERT ON entries BEGIN
+            UPDATE totals SET count = count + 1, size = size + new.size; END;
+        CREATE TRIGGER IF NOT EXISTS entries_delete AFTER DELETE ON entries BEGIN
+            UPDATE totals SET count = count - 1, size = size - old.size; END;
+    '''
+
+    # seconds between updates of an entry's last use, so that most hits do not write
+    ACCESS_RESOLUTION = 1.0
+
+    def __init__(self, path, max_size=100000, max_bytes=None, ttl=3600, clock=time, timeout=30):
+        '''
+        path (str): the database file, created if missing.
+        max_size (int, optional): the most entries to keep.
+        max_bytes (int, optional): the most bytes of values to keep. None means no limit.
+        ttl (float, optional): seconds an entry stays valid. None means entries do not expire.
+        clock (callable, optional): returns the current time in seconds, the same in every process.
+        timeout (float, optional): seconds to wait for another process's write to finish.
+        '''
+        self.path = path
+        self.max_size = max_size
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.clock = clock
+        self.timeout = timeout
+        self.hits = 0
+        self.misses = 0
+        self._lock = Lock()
+        self._local = local()
+        # (connection, pid) of every thread's connection, and how many times close() was called
+        self._connections = []
+        self._closes = 0
+        self._connection()
+
+    def _connection(self):
+        # sqlite3 connections belong to one thread, and must not be carried into a forked process
+        connection = getattr(self._local, 'connection', None)
+        if connection is None or self._local.pid != os.getpid() or self._local.closes != self._closes:
+            # only used by this thread, but closed by whichever thread calls close()
+            connection = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None, check_same_thread=False)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            connection.executescript(self.SCHEMA)
+            with self._lock:
+                self._connections.append((connection, os.getpid()))
+                self._local.closes = self._closes
+            self._local.connection = connection
+            self._local.pid = os.getpid()
+        return connection
+
+    def get(self, key, default=None):
+        '''
+        Returns the value stored for key, or default if it is missing or has expired.
+        '''
+        digest = _digest(_key_text(key))
+        connection = self._connection()
+        now = self.clock()
+        row = connection.execute('SELECT value, expires, accessed FROM entries WHERE key = ?', (digest,)).fetchone()
+        if row is not None:
+            value, expires, accessed = row
+            if expires is None or expires > now:
+                if now - accessed > self.ACCESS_RESOLUTION:
+                    connection.execute('UPDATE entries SET accessed = ? WHERE key = ?', (now, digest))
+                with self._lock:
+                    self.hits += 1
+                return json.loads(value)
+            connection.execute('DELETE FROM entries WHERE key = ? AND expires <= ?', (digest, now))
+        with self._lock:
+            self.misses += 1
+        return default
+
+    def set(self, key, value):
+        key_text = _key_text(key)
+        digest = _digest(key_text)
+        value = json.dumps(value, separators=(',', ':'))
+        now = self.clock()
+        expires = None if self.ttl is None else now + self.ttl
+        with self._transaction() as connection:
+            # delete and insert rather than replace, so that the triggers keep the totals
+            connection.execute('DELETE FROM entries WHERE key = ?', (digest,))
+            connection.execute('INSERT INTO entries VALUES (?, ?, ?, ?, ?, ?)', (digest, key_text, value, len(value), expires, now))
+            count, total = connection.execute('SELECT count, size FROM totals').fetchone()
+            if count > self.max_size or (self.max_bytes is not None and total > self.max_bytes):
+                self._cull(connection, now)
+
+    def _cull(self, connection, now):
+        connection.execute('DELETE FROM entries WHERE expires <= ?', (now,))
+        count, total = connection.execute('SELECT count, size FROM totals').fetchone()
+        while count > self.max_size or (self.max_bytes is not None and total > self.max_bytes and count):
+            # free a tenth of the cache at a time, so that a full cache is not culled on every set
+            excess = max(count - self.max_size, count // 10, 1)
+            connection.execute('DELETE FROM entries WHERE key IN (SELECT key FROM entries ORDER BY accessed LIMIT ?)', (excess,))
+            count, total = connection.execute('SELECT count, size FROM totals').fetchone()
+
+    def evict(self, predicate):
+        '''
+        Removes every entry whose key satisfies predicate(key).  Every key is read and decoded,
+        so the cost grows with the number of entries, not with the number removed.
+        '''
+        with self._transaction() as connection:
+            keys = [(digest,) for digest, key_text in connection.execute('SELECT key, key_text FROM entries') 
+                if predicate(_tuples(json.loads(key_text)))]
+            connection.executemany('DELETE FROM entries WHERE key = ?', keys)
+
+    def clear(self):
+        with self._transaction() as connection:
+            connection.execute('DELETE FROM entries')
+
+    def _transaction(self):
+        return _Transaction(self._connection())
+
+    def close(self):
+        '''
+        Closes the connections of every thread to the database, so it must not be called while
+        other threads are using the cache.  A later call opens a new connection.
+        '''
+        with self._lock:
+            connections, self._connections = self._connections, []
+            self._closes += 1
+        for connection, pid in connections:
+            # those of the parent of a forked process are left to the parent
+            if pid == os.getpid():
+                connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def __len__(self):
+        return self._connection().execute('SELECT count FROM totals').fetchone()[0]
+
+class _Transaction:
+    # takes the write lock up front, so that transactions of several processes cannot deadlock
+    def __init__(self, connection):
+        self.connection = connection
+
+    def __enter__(self):
+        self.connection.execute('BEGIN IMMEDIATE')
+        return self.connection
+
+    def __exit__(self, error_type, error, traceback):
+        self.connection.execute('ROLLBACK' if error_type is not None else 'COMMIT')
+
+def _key_text(key):
+    return json.dumps(key, separators=(',', ':'), sort_keys=True)
+
+def _digest(key_text):
+    return hashlib.sha256(key_text.encode('utf-8')).digest()
+
+def _tuples(value):
+    # keys come back from JSON with lists where they had tuples
+    if isinstance(value, list):
+        return tuple(_tuples(item) for item in value)
+    return value
+
+async def call_cache(cache, function, *args):
+    '''
+    Calls function(*args), which uses cache, from a coroutine.  A DiskCache reads and writes a 
+    file and may wait for another process's write, so its calls run in the event loop's default 
+    executor rather than block the loop.  With a TTLCache, or no cache, function is called directly.
+    '''
+    if cache is None or isinstance(cache, TTLCache):
+        return function(*args)
+    return await asyncio.get_event_loop().run_in_executor(None, function, *args)
+
+def cached(function):
+    '''
+    Keeps the result of each call of a client method in the client's cache attribute, a TTLCache
+    or DiskCache, if it has one.  Calls with equal arguments, defaults applied, share an entry.
+    Results must be JSON serializable to be kept in a DiskCache.
+    '''
+    key = _call_key(function)
+
+    if asyncio.iscoroutinefunction(function):
+        @wraps(function)
+        async def cached_coroutine(self, *args, **kwargs):
+            cache = getattr(self, 'cache', None)
+            cache_key = key(args, kwargs) if cache is not None else None
+            if cache_key is None:
+                return await function(self, *args, **kwargs)
+            result = await call_cache(cache, cache.get, cache_key, _MISSING)
+            if result is _MISSING:
+                result = await function(self, *args, **kwargs)
+                await call_cache(cache, cache.set, cache_key, result)
+            return result
+        return cached_coroutine
+
+    @wraps(function)
+    def cached_function(self, *args, **kwargs):
+        cache = getattr(self, 'cache', None)
+        cache_key = key(args, kwargs) if cache is not None else None
+        if cache_key is None:
+            return function(self, *args, **kwargs)
+        result = cache.get(cache_key, _MISSING)
+        if result is _MISSING:
+            result = function(self, *args, **kwargs)
+            cache.set(cache_key, result)
+        return result
+    return cached_function
@@ -0,0 +1,124 @@
+﻿#-------------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation 
+# All rights reserved. 
+# 
+# Distributed under the terms of the MIT License
+#-------------------------------------------------------------------------
+from collections import deque, namedtuple
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from contextvars import copy_context
+import asyncio
+
+Outcome = namedtuple('Outcome', ['index', 'argument', 'result', 'error'])
+
+def bounded_map(function, iterable, max_workers=8, ordered=True, max_in_flight=None):
+    '''
+    Calls function on each item of iterable on a pool of threads. The iterable is consumed 
+    lazily, with at most max_in_flight calls submitted and not yet yielded, so memory use
+    does not grow with the number of items.  A call which raises does not stop the others.
+    Each call runs in a copy of the caller's context, so e.g. instrumentation sees it.
+
+    Args:
+        function (callable): called with one item at a time.
+        iterable: the items.
+        max_workers (int, optional): the number of threads.
+        ordered (bool, optional): 
+            if True, results are yielded in input order, otherwise as they complete.
+        max_in_flight (int, optional): defaults to twice max_workers.
+
+    Returns:
+        generator of Outcome(index, argument, result, error), where error is the exception 
+        raised by the call, or None.
+    '''
+    max_in_flight = max(max_in_flight or max_workers * 2, 1)
+    items = enumerate(iterable)
+    pending = deque() if ordered else {}
+
+    with ThreadPoolExecutor(max_workers) as executor:
+        def submit():
+            for index, argument in items:
+                future = executor.submit(copy_context().run, function, argument)
+                if ordered:
+                    pending.append((index, argument, future))
+                else:
+                    pending[future] = (index, argument)
+                return True
+            return False
+
+        try:
+            while len(pending) < max_in_flight and submit():
+                pass
+
+            while pending:
+                if ordered:
+                    index, argument, future = pending.popleft()
+                    completed = [(index, argument, future)]
+                else:
+                    done, not_done = wait(pending, return_when=FIRST_COMPLETED)
+                    completed = [pending.pop(future) + (future,) for future in done]
+
+                for index, argument, future in completed:
+                    error = future.exception()
+                    yield Outcome(index, argument, None if error else future.result(), error)
+                    submit()
+        finally:
+            # the caller stopped early; don't start calls nobody will see
+            for future in (entry[2] for entry in pending) if ordered else pending:
+                future.cancel()
+
+async def bounded_map_async(function, iterable, max_workers=8, ordered=True, max_in_flight=None):
+    '''
+    The asyncio version of bounded_map: awaits function on each item of iterable, at most
+    max_workers at a time, with at most max_in_flight calls started and not yet yielded.
+
+    Args:
+        function (coroutine function): called with one item at a time.
+        iterable: the items, consumed lazily.
+        max_workers (int, optional): the most calls awaited at once.
+        ordered (bool, optional): 
+            if True, results are yielded in input order, otherwise as they complete.
+        max_in_flight (int, optional): defaults to twice max_workers.
+
+    Returns:
+        async generator of Outcome(index, argument, result, error).
+    '''
+    max_in_flight = max(max_in_flight or max_workers * 2, 1)
+    semaphore = asyncio.Semaphore(max_workers)
+    items = enumerate(iterable)
+    pending = deque() if ordered else {}
+
+    async def call(argument):
+        async with semaphore:
+            return await function(argument)
+
+    def submit():
+        for index, argument in items:
+            task = asyncio.ensure_future(call(argument))
+            if ordered:
+                pending.append((index, argument, task))
+            else:
+                pending[task] = (index, argument)
+            return True
+        return False
+
+    try:
+        while len(pending) < max_in_flight and submit():
+            pass
+
+        while pending:
+            if ordered:
+                index, argument, task = pending.popleft()
+                await asyncio.wait((task,))
+                completed = [(index, argument, task)]
+            else:
+                done, not_done = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                completed = [pending.pop(task) + (task,) for task in done]
+
+            for index, argument, task in completed:
+                error = task.exception()
+                yield Outcome(index, argument, None if error else task.result(), error)
+                submit()
+    finally:
+        # the caller stopped early; don't start calls nobody will see
+        for task in (entry[2] for entry in pending) if ordered else pending:
+            task.cancel()
@@ -0,0 +1,172 @@
+﻿#-------------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation 
+# All rights reserved. 
+# 
+# Distributed under the terms of the MIT License
+#-------------------------------------------------------------------------
+'''
+Deduplication of Text Analytics documents by content.  Give a TextAnalytics client a ResultCache
+and texts which are the same once normalized are sent to the service once: a batch sends one copy
+of each text whose result is not already known, and every copy receives that result.
+
+    ta = TextAnalytics(key, dedup=ResultCache(max_size=100000))
+    scores = ta.get_sentiment_batch(tweets)
+
+Normalizing applies Unicode NFC, trims the text and collapses runs of whitespace, so texts which
+differ only in spacing share a result.  Case is kept.
+'''
+from .cache import TTLCache, _MISSING
+from functools import wraps
+from inspect import signature
+from threading import Lock
+import asyncio
+import hashlib
+import re
+import unicodedata
+
+_WHITESPACE = re.compile(r'\s+')
+
+def normalize(text):
+    '''
+    The form of a text which decides whether it is a duplicate of another.
+    '''
+    return _WHITESPACE.sub(' ', unicodedata.normalize('NFC', text)).strip()
+
+def content_hash(text):
+    '''
+    The SHA-256 digest of a normalized text.
+    '''
+    return hashlib.sha256(normalize(text).encode('utf-8')).digest()
+
+class ResultCache:
+    '''
+    The results of each analysis (sentiment, key phrases, language) of the texts seen, keyed by the 
+    hash of the normalized text and the parameters of the analysis.  Each analysis keeps at most
+    max_size results, dropping the least recently used.
+    '''
+
+    def __init__(self, max_size=100000, ttl=None):
+        '''
+        max_size (int, optional): the most results to keep per analysis.
+        ttl (float, optional): seconds a result stays valid. None means results do not expire.
+        '''
+        self.max_size = max_size
+        self.ttl = ttl
+        self._lock = Lock()
+        self._caches = {}
+        # documents of batches answered by a known result or by another copy, instead of being sent
+        self.duplicates = 0
+
+    def cache(self, analysis):
+        '''
+        The TTLCache of the results of an analysis, by name.
+        '''
+        with self._lock:
+            cache = self._caches.get(analysis)
+            if cache is None:
+                cache = self._caches[analysis] = TTLCache(self.max_size, self.ttl)
+            return cache
+
+    def batch(self, analysis, documents):
+        '''
+        Leaves out of a batch the documents whose result is known, and the copies of the rest.
+
+        Args:
+            analysis (Analysis): what the batch asks for.
+            documents (list of dict): documents with an Id and a Text.
+
+        Returns:
+            DeduplicatedBatch: the documents to send, and the results of all of the documents from theirs.
+        '''
+        cache = self.cache(analysis.name)
+        known = {}
+        unique = {}
+        keys = []
+        for document in documents:
+            key = (content_hash(document['Text']),) + analysis.batch_params
+            keys.append(key)
+            if key in known or key in unique:
+                continue
+            value = cache.get(key, _MISSING)
+            if value is _MISSING:
+                unique[key] = document
+            else:
+                known[key] = value
+        with self._lock:
+            self.duplicates += len(documents) - len(unique)
+        return DeduplicatedBatch(self.cache(analysis.name), analysis.field, documents, keys, list(unique.items()), known)
+
+class DeduplicatedBatch:
+    '''
+    The documents of a batch which have to be sent (unique), and the results known for the others.
+    '''
+
+    def __init__(self, cache, field, documents, keys, unique, known):
+        self._cache = cache
+        self._field = field
+        self._documents = documents
+        self._keys = keys
+        self._unique_keys = dict((str(document['Id']), key) for key, document in unique)
+        self._known = known
+        self.unique = [document for key, document in unique]
+
+    def results(self, sent):
+        '''
+        Stores the results of the unique documents and returns one result per document, in order, 
+        with its document's Id.  Documents the service returned no result for have none.
+        '''
+        for result in sent:
+            key = self._unique_keys.get(str(result.get('Id')))
+            if key is not None:
+                self._known[key] = result[self._field]
+                self._cache.set(key, result[self._field])
+
+        results = []
+        for document, key in zip(self._documents, self._keys):
+            value = self._known.get(key, _MISSING)
+            if value is not _MISSING:
+                results.append({ self._field : value, 'Id' : document['Id'] })
+        return results
+
+def deduplicated(analysis):
+    '''
+    Answers a single text call of a client method from the client's dedup ResultCache, if it has
+    one, when the same normalized text was analysed with the same parameters.  The method's first
+    argument is the text and the others are its parameters.
+    '''
+    def decorate(function):
+        parameters = signature(function)
+
+        def key(args, kwargs):
+            bound = parameters.bind(None, *args, **kwargs)
+            bound.apply_defaults()
+            values = list(bound.arguments.values())[1:]
+            return (content_hash(values[0]),) + tuple(values[1:])
+
+        if asyncio.iscoroutinefunction(function):
+            @wraps(function)
+            async def deduplicated_coroutine(self, *args, **kwargs):
+                dedup = getattr(self, 'dedup', None)
+                if dedup is None:
+                    return await function(self, *args, **kwargs)
+                cache, result_key = dedup.cache(analysis), key(args, kwargs)
+                result = cache.get(result_key, _MISSING)
+                if result is _MISSING:
+                    result = await function(self, *args, **kwargs)
+                    cache.set(result_key, result)
+                return result
+            return deduplicated_coroutine
+
+        @wraps(function)
+        def deduplicated_function(self, *args, **kwargs):
+            dedup = getattr(self, 'dedup', None)
+            if dedup is None:
+                return function(self, *args, **kwargs)
+            cache, result_key = dedup.cache(analysis), key(args, kwargs)
+            result = cache.get(result_key, _MISSING)
+            if result is _MISSING:
+                result = function(self, *args, **kwargs)
+                cache.set(result_key, result)
+            return result
+        return deduplicated_function
+    return decorate
@@ -0,0 +1,141 @@
+﻿#-------------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation 
+# All rights reserved. 
+# 
+# Distributed under the terms of the MIT License
+#-------------------------------------------------------------------------
+'''
+Micro-batching of single document Text Analytics calls.  A MicroBatcher has the get_sentiment,
+get_key_phrases and get_language methods of TextAnalytics; the documents of concurrent calls
+are collected for up to max_delay seconds and sent together through the batch endpoints.
+
+    batcher = MicroBatcher(TextAnalytics(key), max_delay=0.01, max_batch_size=100)
+    score = batcher.get_sentiment(text)  # from any number of threads
+
+A call waits at most max_delay for others to join it, plus the time of the batch request.
+'''
+from .exceptions import CortanaAnalyticsError
+from .textanalytics import ANALYSES
+import asyncio
+from concurrent.futures import Future, ThreadPoolExecutor
+from threading import Condition, Thread
+from time import monotonic
+
+class MicroBatcher:
+    '''
+    Sends the single document calls made through it as batch calls of a TextAnalytics client.
+    '''
+
+    def __init__(self, text_analytics, max_delay=0.01, max_batch_size=100, max_workers=4):
+        '''
+        text_analytics (TextAnalytics): the client which sends the batches, not an AsyncTextAnalytics.
+        max_delay (float, optional): the most seconds a document waits for others to join its batch.
+        max_batch_size (int, optional): a batch is sent as soon as it has this many documents.
+        max_workers (int, optional): how many batches may be in flight at once.
+        '''
+        if asyncio.iscoroutinefunction(text_analytics.get_sentiment_batch):
+            raise TypeError('MicroBatcher sends from threads and needs a TextAnalytics, not an AsyncTextAnalytics')
+        self.text_analytics = text_analytics
+        self.max_delay = max_delay
+        self.max_batch_size = max_batch_size
+        self._condition = Condition()
+        # analysis name -> [(text, future, deadline)], oldest first
+        self._pending = dict((name, []) for name in ANALYSES)
+        self._executor = ThreadPoolExecutor(max_workers)
+        self._thread = None
+        self._closed = False
+        self.batches = 0
+
+    def get_sentiment(self, text):
+        return self.submit('sentiment', text).result()
+
+    def get_key_phrases(self, text):
+        return self.submit('key_phrases', text).result()
+
+    def get_language(self, text, number_of_languages_to_detect=1):
+        # the batch endpoint detects one language per document
+        if number_of_languages_to_detect != 1:
+            return self.text_analytics.get_language(text, number_of_languages_to_detect)
+        return self.submit('language', text).result()
+
+    def submit(self, analysis, text):
+        '''
+        Queues a document for the next batch of an analysis.
+
+        Args:
+            analysis (str): 'sentiment', 'key_phrases' or 'language'.
+            text (str)
+
+        Returns:
+            concurrent.futures.Future: resolves to what the single document call returns.
+        '''
+        future = Future()
+        with self._condition:
+            if self._closed:
+                raise RuntimeError('The MicroBatcher is closed')
+            pending = self._pending[analysis]
+            pending.append((text, future, monotonic() + self.max_delay))
+            if self._thread is None:
+                self._thread = Thread(target=self._run, name='MicroBatcher', daemon=True)
+                self._thread.start()
+            # the collector only needs waking for a new deadline or a full batch
+            if len(pending) == 1 or len(pending) >= self.max_batch_size:
+                self._condition.notify()
+        return future
+
+    def _run(self):
+        with self._condition:
+            while True:
+                now = monotonic()
+                for name, pending in self._pending.items():
+                    while pending and (len(pending) >= self.max_batch_size or pending[0][2] <= now or self._closed):
+                        batch = pending[:self.max_batch_size]
+                        del pending[:self.max_batch_size]
+                        self.batches += 1
+                        self._executor.submit(self._send, name, batch)
+
+                deadlines = [pending[0][2] for pending in self._pending.values() if pending]
+                if not deadlines and self._closed:
+                    return
+                self._condition.wait(max(0, min(deadlines) - now) if deadlines else None)
+
+    def _send(self, name, batch):
+        # callers which cancelled their future are left out
+        batch = [entry for entry in batch if entry[1].set_running_or_notify_cancel()]
+        if not batch:
+            return
+        analysis = ANALYSES[name]
+        documents = [{ 'Id' : str(index), 'Text' : text } for index, (text, future, deadline) in enumerate(batch)]
+        try:
+            # through the public method, so the client's cache and coalescing apply
+            results = getattr(self.text_analytics, 'get_{0}_batch'.format(name))(documents, 1)
+        except BaseException as e:
+            for text, future, deadline in batch:
+                future.set_exception(e)
+            return
+
+        found = dict((str(result.get('Id')), result) for result in results)
+        for index, (text, future, deadline) in enumerate(batch):
+            result = found.get(str(index))
+            if result is None:
+                future.set_exception(CortanaAnalyticsError('The service returned no {0} for document {1}'.format(analysis.description, index)))
+            else:
+                future.set_result(result[analysis.field])
+
+    def close(self):
+        '''
+        Sends the documents still queued, waits for their batches and stops.
+        '''
+        with self._condition:
+            self._closed = True
+            thread = self._thread
+            self._condition.notify()
+        if thread is not None:
+            thread.join()
+        self._executor.shutdown(wait=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
@@ -0,0 +1,84 @@
+﻿#-------------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation 
+# All rights reserved. 
+# 
+# Distributed under the terms of the MIT License
+#-------------------------------------------------------------------------
+'''
+The errors raised by the clients.  They all derive from CortanaAnalyticsError, which derives from
+Exception, so existing "except Exception" handlers keep working.
+
+    try:
+        rs.get_recommendation(model_id, item_ids)
+    except ThrottlingError as e:
+        time.sleep(e.retry_after or 1)
+'''
+from email.utils import parsedate_to_datetime
+from datetime import datetime, timezone
+
+# statuses which mean the service did not process the request and it may be sent again later
+THROTTLING_STATUSES = (429, 503)
+
+class CortanaAnalyticsError(Exception):
+    '''
+    Base class of the errors raised by the clients.
+    '''
+
+class ServiceError(CortanaAnalyticsError):
+    '''
+    The service answered with an error status.
+
+    status_code (int)
+    reason (str): the HTTP reason phrase.
+    content (bytes): the body of the response.
+    '''
+    def __init__(self, message, status_code=None, reason=None, content=None):
+        super().__init__(message)
+        self.status_code = status_code
+        self.reason = reason
+        self.content = content
+
+class ThrottlingError(ServiceError):
+    '''
+    The service is throttling this subscription (429) or is temporarily unavailable (503).
+
+    retry_after (float): seconds the service asked to wait before retrying, None if it did not say.
+    '''
+    def __init__(self, message, status_code=None, reason=None, content=None, retry_after=None):
+        super().__init__(message, status_code, reason, content)
+        self.retry_after = retry_after
+
+class ResponseFormatError(CortanaAnalyticsError):
+    '''
+    A successful response did not contain what was expected.
+    '''
+
+def error_for(response, message):
+    '''
+    The ServiceError, or ThrottlingError, to raise for a failed response.
+    '''
+    if response.status_code in THROTTLING_STATUSES:
+        headers = getattr(response, 'headers', None) or {}
+        return ThrottlingError(message, response.status_code, response.reason, response.content, parse_retry_after(headers.get('Retry-After')))
+    return ServiceError(message, response.status_code, response.reason, response.content)
+
+def parse_retry_after(value):
+    '''
+    The number of seconds in a Retry-After header, given either as seconds or as an HTTP date.
+
+    Returns:
+        float, or None if value is missing or not understood.
+    '''
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError, IndexError):
+        return None
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=timezone.utc)
+    return max(0.0, (when - datetime.now(timezone.utc)).total_seconds())
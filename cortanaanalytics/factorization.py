@@ -0,0 +1,322 @@
+﻿#-------------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation 
+# All rights reserved. 
+# 
+# Distributed under the terms of the MIT License
+#-------------------------------------------------------------------------
+'''
+A local ranking model: implicit feedback matrix factorization trained with alternating least
+squares on the usage files Recommendations.import_file accepts.  It takes the parameters of
+Recommendations.build_rank_model, so parameter grids can be tried offline before paying for a
+remote build.  Requires numpy ("pip install cortanaanalytics[local]").
+
+    usage = load_usage('usage.txt')
+    for dimensions in (10, 20, 40):
+        model = FactorizationModel.train(usage, number_of_model_dimensions=dimensions)
+        model.save('rank-{}'.format(dimensions))
+'''
+from .fbt import _read_item_names
+from .recommendations import RecommendedItem
+from collections import Counter, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+import json
+import os
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# Rows are solved in blocks of about this many usage points; each block needs
+# 16 * dimensions bytes per point while it is being solved.
+BLOCK_SIZE = 4096
+
+Usage = namedtuple('Usage', ['user_ids', 'item_ids', 'users', 'items', 'counts'])
+
+def load_usage(usage_path):
+    '''
+    Reads a usage file once so it can be trained on many times.
+
+    Args:
+        usage_path (str): lines of "<User Id>,<Item Id>[,<Time>[,<Event>]]"
+
+    Returns:
+        Usage: the distinct user and item ids, and for each (user, item) pair used, the
+            indexes of the user and item and how often the item was used.
+    '''
+    _require_numpy()
+    user_index = {}
+    item_index = {}
+    counts = Counter()
+    with open(usage_path, 'r', encoding='utf-8') as usage:
+        for line in usage:
+            fields = line.split(',', 2)
+            if len(fields) < 2:
+                continue
+            user_id = fields[0].strip()
+            item_id = fields[1].strip()
+            if not user_id or not item_id:
+                continue
+            user = user_index.setdefault(user_id, len(user_index))
+            item = item_index.setdefault(item_id, len(item_index))
+            counts[(user, item)] += 1
+
+    pairs = np.array(list(counts.keys()), dtype=np.int64).reshape(-1, 2)
+    return Usage(
+        list(user_index),
+        list(item_index),
+        pairs[:, 0].copy(),
+        pairs[:, 1].copy(),
+        np.fromiter(counts.values(), dtype=np.float64, count=len(counts)))
+
+class FactorizationModel:
+    '''
+    User and item factor matrices; a user's predicted preference for an item is the dot product
+    of their rows.
+    '''
+
+    USER_FACTORS_FILE = 'user_factors.npy'
+    ITEM_FACTORS_FILE = 'item_factors.npy'
+    MODEL_FILE = 'model.json'
+
+    def __init__(self, user_ids, item_ids, user_factors, item_factors, item_names=None, parameters=None):
+        '''
+        Use FactorizationModel.train or FactorizationModel.load rather than creating a model directly.
+
+        user_ids (list of str)
+        item_ids (list of str)
+        user_factors (numpy.ndarray): one row per user id.
+        item_factors (numpy.ndarray): one row per item id.
+        item_names (list of str, optional)
+        parameters (dict, optional): the parameters the model was trained with.
+        '''
+        self.user_ids = user_ids
+        self.item_ids = item_ids
+        self.user_factors = user_factors
+        self.item_factors = item_factors
+        self.item_names = item_names if item_names is not None else [''] * len(item_ids)
+        self.parameters = parameters or {}
+        self._user_index = dict((user_id, i) for i, user_id in enumerate(user_ids))
+        self._item_index = dict((item_id, i) for i, item_id in enumerate(item_ids))
+        self._normalized = None
+
+    @classmethod
+    def train(cls, usage, catalog_path=None, number_of_model_iterations=10, number_of_model_dimensions=20,
+              item_cut_off_lower_bound=1, item_cut_off_upper_bound=0, user_cut_off_lower_bound=0, user_cut_off_upper_bound=0,
+              regularization=0.1, alpha=40.0, max_workers=None, seed=0):
+        '''
+        Trains a model with implicit feedback alternating least squares. Each half iteration
+        solves the rows of one side in blocks spread over a thread pool.
+
+        Args:
+            usage (str or Usage): a usage file, or a Usage from load_usage.
+            catalog_path (str, optional): used to fill in item names.
+            number_of_model_iterations (int, optional)
+            number_of_model_dimensions (int, optional)
+            item_cut_off_lower_bound (int, optional): items used fewer times are dropped.
+            item_cut_off_upper_bound (int, optional): items used more times are dropped, 0 for no limit.
+            user_cut_off_lower_bound (int, optional): users with fewer usage points are dropped.
+            user_cut_off_upper_bound (int, optional): users with more usage points are dropped, 0 for no limit.
+            regularization (float, optional)
+            alpha (float, optional): confidence = 1 + alpha * usage count.
+            max_workers (int, optional): threads solving blocks, by default one per core.
+            seed (int, optional): seeds the initial item factors.
+
+        Returns:
+            FactorizationModel
+        '''
+        _require_numpy()
+        if not isinstance(usage, Usage):
+            usage = load_usage(usage)
+        parameters = {
+            'number_of_model_iterations': number_of_model_iterations,
+            'number_of_model_dimensions': number_of_model_dimensions,
+            'item_cut_off_lower_bound': item_cut_off_lower_bound,
+            'item_cut_off_upper_bound': item_cut_off_upper_bound,
+            'user_cut_off_lower_bound': user_cut_off_lower_bound,
+            'user_cut_off_upper_bound': user_cut_off_upper_bound,
+            'regularization': regularization,
+            'alpha': alpha,
+            'seed': seed,
+        }
+
+        users, items, counts = usage.users, usage.items, usage.counts
+        keep = _within_bounds(items, counts, len(usage.item_ids), item_cut_off_lower_bound, item_cut_off_upper_bound)
+        users, items, counts = users[keep], items[keep], counts[keep]
+        keep = _within_bounds(users, counts, len(usage.user_ids), user_cut_off_lower_bound, user_cut_off_upper_bound)
+        users, items, counts = users[keep], items[keep], counts[keep]
+
+        # renumber the remaining users and items densely
+        user_kept, users = np.unique(users, return_inverse=True)
+        item_kept, items = np.unique(items, return_inverse=True)
+        user_ids = [usage.user_ids[i] for i in user_kept]
+        item_ids = [usage.item_ids[i] for i in item_kept]
+
+        weights = alpha * counts
+        by_user = _compressed_rows(users, items, weights, len(user_ids))
+        by_item = _compressed_rows(items, users, weights, len(item_ids))
+
+        random = np.random.default_rng(seed)
+        user_factors = np.zeros((len(user_ids), number_of_model_dimensions))
+        item_factors = random.normal(scale=0.01, size=(len(item_ids), number_of_model_dimensions))
+        with ThreadPoolExecutor(max_workers or os.cpu_count() or 1) as executor:
+            for iteration in range(number_of_model_iterations):
+                _solve(executor, user_factors, item_factors, by_user, regularization)
+                _solve(executor, item_factors, user_factors, by_item, regularization)
+
+        names = _read_item_names(catalog_path) if catalog_path is not None else {}
+        return cls(user_ids, item_ids, user_factors, item_factors, [names.get(item_id, '') for item_id in item_ids], parameters)
+
+    def save(self, directory):
+        '''
+        Writes the factors to user_factors.npy and item_factors.npy in directory, and the ids,
+        names and parameters to model.json.
+        '''
+        os.makedirs(directory, exist_ok=True)
+        np.save(os.path.join(directory, self.USER_FACTORS_FILE), self.user_factors)
+        np.save(os.path.join(directory, self.ITEM_FACTORS_FILE), self.item_factors)
+        with open(os.path.join(directory, self.MODEL_FILE), 'w', encoding='utf-8') as file:
+            json.dump({
+                'user_ids': self.user_ids,
+                'item_ids': self.item_ids,
+                'item_names': self.item_names,
+                'parameters': self.parameters,
+            }, file)
+
+    @classmethod
+    def load(cls, directory, mmap_mode='r'):
+        '''
+        Loads a model written by save. By default the factors are mapped read only rather than read.
+        '''
+        _require_numpy()
+        with open(os.path.join(directory, cls.MODEL_FILE), 'r', encoding='utf-8') as file:
+            model = json.load(file)
+        return cls(
+            model['user_ids'],
+            model['item_ids'],
+            np.load(os.path.join(directory, cls.USER_FACTORS_FILE), mmap_mode=mmap_mode),
+            np.load(os.path.join(directory, cls.ITEM_FACTORS_FILE), mmap_mode=mmap_mode),
+            model['item_names'],
+            model['parameters'])
+
+    def rank(self, user_id, number_of_results=10):
+        '''
+        The items with the highest predicted preference of user_id, including items they used.
+
+        Returns:
+            list of (item id, score), best first.
+        '''
+        user = self._user_index.get(user_id)
+        if user is None:
+            return []
+        return self._best(self.item_factors @ self.user_factors[user], number_of_results, ())
+
+    def related(self, item_id, number_of_results=10):
+        '''
+        The items with factors most similar (by cosine) to those of item_id.
+
+        Returns:
+            list of (item id, score), best first.
+        '''
+        item = self._item_index.get(item_id)
+        if item is None:
+            return []
+        normalized = self.normalized_item_factors()
+        return self._best(normalized @ normalized[item], number_of_results, (item,))
+
+    def get_recommendation(self, model_id, item_id_list, number_of_results=10, include_metadata = False):
+        '''
+        Same as Recommendations.get_recommendation, answered from this model. model_id and
+        include_metadata are ignored. Items are scored by cosine similarity to the mean of the
+        seed items' normalized factors.
+
+        Returns:
+            list of RecommendedItem
+        '''
+        seeds = sorted(set(self._item_index[item_id] for item_id in item_id_list if item_id in self._item_index))
+        if not seeds:
+            return []
+        normalized = self.normalized_item_factors()
+        query = normalized[seeds].mean(axis=0)
+        norm = np.linalg.norm(query)
+        if norm > 0:
+            query /= norm
+        best = self._best(normalized @ query, number_of_results, seeds)
+        return [RecommendedItem(item_id, self.item_names[self._item_index[item_id]], score, 'Similar usage') for item_id, score in best]
+
+    def normalized_item_factors(self):
+        '''
+        The item factors scaled to unit length, computed once.
+        '''
+        if self._normalized is None:
+            norms = np.linalg.norm(self.item_factors, axis=1, keepdims=True)
+            self._normalized = self.item_factors / np.where(norms > 0, norms, 1)
+        return self._normalized
+
+    def _best(self, scores, number_of_results, excluded):
+        scores = np.array(scores, dtype=np.float64)
+        scores[list(excluded)] = -np.inf
+        count = min(number_of_results, len(scores) - len(excluded))
+        if count <= 0:
+            return []
+        best = np.argpartition(-scores, count - 1)[:count]
+        best = best[np.argsort(-scores[best], kind='stable')]
+        return [(self.item_ids[i], float(scores[i])) for i in best]
+
+    def __len__(self):
+        return len(self.item_ids)
+
+def _require_numpy():
+    if np is None:
+        raise ImportError('Local factorization requires numpy. Install it with "pip install cortanaanalytics[local]".')
+
+def _within_bounds(rows, counts, row_count, lower_bound, upper_bound):
+    totals = np.bincount(rows, weights=counts, minlength=row_count)
+    keep = totals >= lower_bound
+    if upper_bound:
+        keep &= totals <= upper_bound
+    return keep[rows]
+
+_CompressedRows = namedtuple('_CompressedRows', ['offsets', 'columns', 'weights', 'blocks'])
+
+def _compressed_rows(rows, columns, weights, row_count):
+    order = np.argsort(rows, kind='stable')
+    offsets = np.zeros(row_count + 1, dtype=np.int64)
+    np.cumsum(np.bincount(rows, minlength=row_count), out=offsets[1:])
+    return _CompressedRows(offsets, columns[order], weights[order], _blocks(offsets, BLOCK_SIZE))
+
+def _blocks(offsets, block_size):
+    # Groups rows of similar length, so that each block can be padded to its longest row and
+    # solved with batched matrix products, holding about block_size (padded) usage points.
+    lengths = np.diff(offsets)
+    order = np.argsort(lengths, kind='stable')
+    order = order[lengths[order] > 0]
+    lengths = lengths[order]
+    blocks = []
+    start = 0
+    while start < len(order):
+        stop = min(len(order), start + max(1, block_size // lengths[start]))
+        while stop - start > 1 and (stop - start) * lengths[stop - 1] > block_size:
+            stop = start + max(1, (stop - start) // 2)
+        blocks.append(order[start:stop])
+        start = stop
+    return blocks
+
+def _solve(executor, factors, fixed, rows, regularization):
+    # every row shares Y'Y + lambda * I; each row only adds its own usage points
+    dimensions = fixed.shape[1]
+    shared = fixed.T @ fixed + regularization * np.eye(dimensions)
+    list(executor.map(lambda block: _solve_block(factors, fixed, shared, rows, block), rows.blocks))
+
+def _solve_block(factors, fixed, shared, rows, block):
+    # x_u = (Y'Y + Y'(C_u - I)Y + lambda * I)^-1 Y'C_u p_u for each row u of the block
+    starts = rows.offsets[block]
+    lengths = rows.offsets[block + 1] - starts
+    positions = np.arange(lengths.max())
+    used = positions < lengths[:, None]
+    positions = np.where(used, starts[:, None] + positions, 0)
+    weights = np.where(used, rows.weights[positions], 0)
+    vectors = fixed[rows.columns[positions]]
+    matrices = shared + vectors.transpose(0, 2, 1) @ (weights[:, :, None] * vectors)
+    targets = vectors.transpose(0, 2, 1) @ (used + weights)[:, :, None]
+    factors[block] = np.linalg.solve(matrices, targets)[:, :, 0]
@@ -0,0 +1,264 @@
+﻿#-------------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation 
+# All rights reserved. 
+# 
+# Distributed under the terms of the MIT License
+#-------------------------------------------------------------------------
+''' 
+A local frequently-bought-together model, built from the usage files Recommendations.import_file 
+accepts and using the parameters of Recommendations.build_fbt_model.  It answers item to item 
+lookups in process, e.g. as a low latency shadow of, or fallback for, a remote FBT build.
+
+    model = FbtModel.build('usage.txt', 'catalog.txt', support_threshold=6)
+    model.save('groceries.fbt')
+    model = FbtModel.load('groceries.fbt')
+    items = model.get_recommendation(model_id, ['2406e770-769c-4189-89de-1c9283f93a96'])
+'''
+from .recommendations import RecommendedItem
+from array import array
+from collections import Counter, defaultdict
+from itertools import combinations
+import mmap
+import struct
+
+FILE_MAGIC = b'CAFBT\x00\x01\x00'
+# magic, item count, pair count, then the byte length of each section
+_HEADER = struct.Struct('<8sqq5q')
+
+class FbtModel:
+    '''
+    Items which were used together, with a score, stored as sparse rows: for each item, its 
+    related items sorted by descending score.
+    '''
+
+    SIMILARITIES = ('jaccard', 'cooccurrence', 'lift')
+
+    def __init__(self, item_ids, item_names, offsets, neighbors, scores, buffer=None):
+        '''
+        Use FbtModel.build or FbtModel.load rather than creating a model directly.
+
+        item_ids (list of str)
+        item_names (list of str)
+        offsets (sequence of int): row i is neighbors[offsets[i]:offsets[i + 1]].
+        neighbors (sequence of int): indexes into item_ids.
+        scores (sequence of float): the score of each neighbor.
+        buffer (mmap, optional): the mapped file the sequences are views of.
+        '''
+        self.item_ids = item_ids
+        self.item_names = item_names
+        self.offsets = offsets
+        self.neighbors = neighbors
+        self.scores = scores
+        self._buffer = buffer
+        self._index = dict((item_id, i) for i, item_id in enumerate(item_ids))
+
+    @classmethod
+    def build(cls, usage_path, catalog_path=None, support_threshold=6, max_item_set_size=2, minimal_score=0, similarity='jaccard'):
+        '''
+        Builds a model from a usage file.  Items used by the same user at the same time (or 
+        by the same user, when the file has no times) make up one transaction.
+
+        Args:
+            usage_path (str): lines of "<User Id>,<Item Id>[,<Time>[,<Event>]]"
+            catalog_path (str, optional): used to fill in item names.
+            support_threshold (int, optional): the fewest transactions a pair must appear in.
+            max_item_set_size (int, optional): only pairs (2) are supported locally.
+            minimal_score (float, optional): pairs scoring lower are dropped.
+            similarity (str, optional): how pairs are scored: 'jaccard', 'cooccurrence' or 'lift'.
+
+        Returns:
+            FbtModel
+        '''
+        if max_item_set_size != 2:
+            raise ValueError('Only item sets of size 2 are supported locally, not {}'.format(max_item_set_size))
+        if similarity not in cls.SIMILARITIES:
+            raise ValueError('similarity must be one of {}'.format(', '.join(cls.SIMILARITIES)))
+
+        item_ids = []
+        index = {}
+        transactions = defaultdict(set)
+        with open(usage_path, 'r', encoding='utf-8') as usage:
+            for line in usage:
+                fields = [field.strip() for field in line.split(',')]
+                if len(fields) < 2 or not fields[0] or not fields[1]:
+                    continue
+                item = index.get(fields[1])
+                if item is None:
+                    item = index[fields[1]] = len(item_ids)
+                    item_ids.append(fields[1])
+                transactions[(fields[0], fields[2] if len(fields) > 2 else None)].add(item)
+
+        item_counts = Counter()
+        pair_counts = Counter()
+        for items in transactions.values():
+            item_counts.update(items)
+            if len(items) > 1:
+                pair_counts.update(combinations(sorted(items), 2))
+        transaction_count = len(transactions)
+        del transactions
+
+        rows = [[] for i in item_ids]
+        for (a, b), count in pair_counts.items():
+            if count < support_threshold:
+                continue
+            if similarity == 'jaccard':
+                score = count / (item_counts[a] + item_counts[b] - count)
+            elif similarity == 'lift':
+                score = count * transaction_count / (item_counts[a] * item_counts[b])
+            else:
+                score = float(count)
+            if score < minimal_score:
+                continue
+            rows[a].append((score, b))
+            rows[b].append((score, a))
+
+        offsets = array('q', [0])
+        neighbors = array('i')
+        scores = array('d')
+        for row in rows:
+            row.sort(key=lambda entry: (-entry[0], item_ids[entry[1]]))
+            neighbors.extend(neighbor for score, neighbor in row)
+            scores.extend(score for score, neighbor in row)
+            offsets.append(len(neighbors))
+
+        names = _read_item_names(catalog_path) if catalog_path is not None else {}
+        return cls(item_ids, [names.get(item_id, '') for item_id in item_ids], offsets, neighbors, scores)
+
+    def save(self, path):
+        '''
+        Writes the model to a file which FbtModel.load maps into memory.
+        '''
+        ids = _encode_strings(self.item_ids)
+        names = _encode_strings(self.item_names)
+        sections = [
+            array('q', self.offsets).tobytes(),
+            array('d', self.scores).tobytes(),
+            array('i', self.neighbors).tobytes(),
+            ids,
+            names,
+        ]
+        with open(path, 'wb') as file:
+            file.write(_HEADER.pack(FILE_MAGIC, len(self.item_ids), len(self.scores), *[len(section) for section in sections]))
+            for section in sections:
+                file.write(section)
+                file.write(b'\0' * _padding(len(section)))
+
+    @classmethod
+    def load(cls, path):
+        '''
+        Maps a file written by save into memory. The score rows are used in place and paged in
+        by the operating system as they are looked up.
+        '''
+        with open(path, 'rb') as file:
+            buffer = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, item_count, pair_count, *lengths = _HEADER.unpack_from(buffer)
+        if magic != FILE_MAGIC:
+            buffer.close()
+            raise ValueError('{} is not an FBT model file'.format(path))
+
+        views = []
+        position = _HEADER.size
+        view = memoryview(buffer)
+        for length in lengths:
+            views.append(view[position:position + length])
+            position += length + _padding(length)
+        offsets, scores, neighbors, ids, names = views
+
+        return cls(
+            _decode_strings(ids, item_count), 
+            _decode_strings(names, item_count), 
+            offsets.cast('q'), 
+            neighbors.cast('i'), 
+            scores.cast('d'), 
+            buffer)
+
+    def related(self, item_id, number_of_results=10):
+        '''
+        The items most often used together with item_id.
+
+        Returns:
+            list of (item id, score), best first.
+        '''
+        item = self._index.get(item_id)
+        if item is None:
+            return []
+        item_ids = self.item_ids
+        return [(item_ids[neighbor], score) for neighbor, score in self._row(item, number_of_results)]
+
+    def _row(self, item, number_of_results=None):
+        start = self.offsets[item]
+        end = self.offsets[item + 1]
+        if number_of_results is not None:
+            end = min(end, start + number_of_results)
+        return zip(self.neighbors[start:end], self.scores[start:end])
+
+    def get_recommendation(self, model_id, item_id_list, number_of_results=10, include_metadata = False):
+        '''
+        Same as Recommendations.get_recommendation, answered from this model. model_id and 
+        include_metadata are ignored. The scores of items related to several seed items are added.
+
+        Returns:
+            list of RecommendedItem
+        '''
+        seeds = set(self._index[item_id] for item_id in item_id_list if item_id in self._index)
+        if len(seeds) == 1:
+            # rows are already sorted best first
+            best = self._row(seeds.pop(), number_of_results)
+        else:
+            totals = defaultdict(float)
+            for seed in seeds:
+                for neighbor, score in self._row(seed):
+                    if neighbor not in seeds:
+                        totals[neighbor] += score
+            best = sorted(totals.items(), key=lambda entry: (-entry[1], self.item_ids[entry[0]]))[:number_of_results]
+
+        return [RecommendedItem(self.item_ids[item], self.item_names[item], score, 'Frequently bought together') for item, score in best]
+
+    def __len__(self):
+        return len(self.item_ids)
+
+    def close(self):
+        '''
+        Unmaps the file of a loaded model.
+        '''
+        if self._buffer is not None:
+            self.offsets.release()
+            self.neighbors.release()
+            self.scores.release()
+            self.offsets = self.neighbors = self.scores = None
+            self._buffer.close()
+            self._buffer = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+def _read_item_names(catalog_path):
+    names = {}
+    with open(catalog_path, 'r', encoding='utf-8') as catalog:
+        for line in catalog:
+            fields = line.split(',', 2)
+            if len(fields) > 1:
+                names[fields[0].strip()] = fields[1].strip()
+    return names
+
+def _padding(length):
+    # sections start on 8 byte boundaries so they can be cast in place
+    return -length % 8
+
+def _encode_strings(strings):
+    # item count + 1 end offsets followed by the utf-8 text
+    encoded = [string.encode('utf-8') for string in strings]
+    ends = array('q', [0])
+    for value in encoded:
+        ends.append(ends[-1] + len(value))
+    return ends.tobytes() + b''.join(encoded)
+
+def _decode_strings(view, count):
+    ends = view[:(count + 1) * 8].cast('q')
+    text = view[(count + 1) * 8:]
+    strings = [str(text[ends[i]:ends[i + 1]], 'utf-8') for i in range(count)]
+    ends.release()
+    return strings
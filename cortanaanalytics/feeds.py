@@ -0,0 +1,58 @@
+﻿#-------------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation 
+# All rights reserved. 
+# 
+# Distributed under the terms of the MIT License
+#-------------------------------------------------------------------------
+''' 
+Decoding of the Atom/OData feeds returned by the Data Market.
+
+Each body is parsed once, as a stream, with lxml when it is installed 
+(pip install cortanaanalytics[speedups]) and the standard library otherwise.
+'''
+from io import BytesIO
+
+try:
+    from lxml.etree import iterparse
+except ImportError:
+    from xml.etree.ElementTree import iterparse
+
+ATOM_NAMESPACE = 'http://www.w3.org/2005/Atom'
+METADATA_NAMESPACE = 'http://schemas.microsoft.com/ado/2007/08/dataservices/metadata'
+DATA_NAMESPACE = 'http://schemas.microsoft.com/ado/2007/08/dataservices'
+
+ENTRY_TAG = '{%s}entry' % ATOM_NAMESPACE
+PROPERTIES_TAG = '{%s}properties' % METADATA_NAMESPACE
+
+# qualified tag -> property name, filled in as new properties are seen
+_property_names = dict(('{%s}%s' % (DATA_NAMESPACE, name), name) for name in (
+    'Id', 'Name', 'Rating', 'Reasoning', 'BuildId', 'Status', 'LineCount', 'ErrorCount'))
+
+def _property_name(tag):
+    name = _property_names.get(tag)
+    if name is None:
+        name = _property_names[tag] = tag.rpartition('}')[2]
+    return name
+
+def iter_properties(content):
+    '''
+    Yields the m:properties of each entry of a feed, in order, as a dict of 
+    property name -> text, e.g. { 'Id' : '1514886', 'Status' : 'Building' }.
+
+    content (bytes): the response body.
+    '''
+    for event, element in iterparse(BytesIO(content), events=('end',)):
+        tag = element.tag
+        if tag == PROPERTIES_TAG:
+            yield dict((_property_name(child.tag), child.text) for child in element)
+        elif tag == ENTRY_TAG:
+            # the entry has been decoded; let its subtree go
+            element.clear()
+
+def first_properties(content):
+    '''
+    The properties of the first entry of a feed, or None if it has no entries.
+    '''
+    for properties in iter_properties(content):
+        return properties
+    return None
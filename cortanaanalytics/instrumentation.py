@@ -0,0 +1,316 @@
+﻿#-------------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation 
+# All rights reserved. 
+# 
+# Distributed under the terms of the MIT License
+#-------------------------------------------------------------------------
+'''
+Per-call instrumentation for the clients.  Give a Transport (or AsyncTransport) an Instrumentation
+and every client call made through it is reported to its sinks as a CallRecord:
+
+    histogram = PrometheusSink()
+    transport = Transport(instrumentation=Instrumentation(histogram, lambda record: print(record)))
+    rs = Recommendations(email, key, transport)
+    ...
+    print(histogram.render())
+
+A sink is any callable taking a CallRecord.  Without an Instrumentation the clients and transports
+skip all of the bookkeeping.
+'''
+from bisect import bisect_left
+from contextvars import ContextVar
+from functools import wraps
+from threading import Lock
+from time import perf_counter
+from urllib.parse import urlsplit
+import asyncio
+
+# upper bounds, in seconds, of the histogram buckets
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+PHASES = ('ttfb', 'transfer', 'parse', 'total')
+
+_current = ContextVar('cortanaanalytics_call', default=None)
+_record_lock = Lock()
+
+class CallRecord:
+    '''
+    What one client call spent its time on.  Times are in seconds.
+
+    client (str): the client class, e.g. 'Recommendations'.
+    method (str): the client method, e.g. 'get_recommendation'.
+    endpoint (str): the service endpoint of the last request, e.g. 'ItemRecommend'.
+    status (int): the HTTP status of the last response, None if no response arrived.
+    requests (int): HTTP requests sent.
+    reused (bool): whether every request went over an already open connection, None if unknown.
+    ttfb (float): from sending each request to its response headers.
+    transfer (float): reading the response bodies.
+    parse (float): from the last response body to the call returning.
+    total (float): the whole call.
+    request_bytes (int), response_bytes (int): body sizes.
+    retries (int): requests repeated after a failure.
+    error (str): the name of the exception the call raised, if any.
+    '''
+    __slots__ = ('client', 'method', 'endpoint', 'status', 'requests', 'reused', 'ttfb', 'transfer', 'parse',
+                 'total', 'request_bytes', 'response_bytes', 'retries', 'error', '_received')
+
+    def __init__(self, client, method):
+        self.client = client
+        self.method = method
+        self.endpoint = None
+        self.status = None
+        self.requests = 0
+        self.reused = None
+        self.ttfb = 0.0
+        self.transfer = 0.0
+        self.parse = 0.0
+        self.total = 0.0
+        self.request_bytes = 0
+        self.response_bytes = 0
+        self.retries = 0
+        self.error = None
+        self._received = None
+
+    def add_request(self, url, status, request_bytes, response_bytes, ttfb, transfer, reused, retries=0):
+        '''
+        Called by transports once a response body has been read.  A call may send requests
+        from several threads.
+        '''
+        endpoint = endpoint_of(url)
+        with _record_lock:
+            self.endpoint = endpoint
+            self.status = status
+            self.requests += 1
+            self.request_bytes += request_bytes
+            self.response_bytes += response_bytes
+            self.ttfb += ttfb
+            self.transfer += transfer
+            self.retries += retries
+            if reused is not None:
+                self.reused = reused if self.reused is None else self.reused and reused
+            self._received = perf_counter()
+
+    def add_retry(self):
+        with _record_lock:
+            self.retries += 1
+
+    def __repr__(self):
+        return 'CallRecord({}.{} {} status={} total={:.4f} ttfb={:.4f} transfer={:.4f} parse={:.4f})'.format(
+            self.client, self.method, self.endpoint, self.status, self.total, self.ttfb, self.transfer, self.parse)
+
+class Instrumentation:
+    '''
+    Sends the CallRecord of every instrumented call to each sink.
+    '''
+
+    def __init__(self, *sinks):
+        self.sinks = list(sinks)
+
+    def add_sink(self, sink):
+        self.sinks.append(sink)
+
+    def emit(self, record):
+        for sink in self.sinks:
+            sink(record)
+
+def current_call():
+    '''
+    The CallRecord of the instrumented call in progress, or None.  Transports report to it.
+    '''
+    return _current.get()
+
+def endpoint_of(url):
+    return urlsplit(url).path.rsplit('/', 1)[-1]
+
+def request_length(body, headers=None):
+    '''
+    The size of a request body, from its Content-Length header or its length, 0 if unknown.
+    '''
+    if headers:
+        for name, value in headers.items():
+            if name.lower() == 'content-length':
+                return int(value)
+    if isinstance(body, str):
+        return len(body.encode('utf-8'))
+    try:
+        return len(body)
+    except TypeError:
+        return 0
+
+def instrumented(function):
+    '''
+    Reports each call of a client method, whose transport has an instrumentation, as one
+    CallRecord.  Calls made by an instrumented method to other instrumented methods are part
+    of the outer call.  Calls which send no request, such as cache hits, are not reported.
+    '''
+    name = function.__name__.lstrip('_')
+
+    if asyncio.iscoroutinefunction(function):
+        @wraps(function)
+        async def instrumented_coroutine(self, *args, **kwargs):
+            instrumentation = getattr(self.transport, 'instrumentation', None)
+            if instrumentation is None or _current.get() is not None:
+                return await function(self, *args, **kwargs)
+            record, token = _start(self, name)
+            try:
+                return await function(self, *args, **kwargs)
+            except BaseException as e:
+                record.error = type(e).__name__
+                raise
+            finally:
+                _finish(instrumentation, record, token)
+        return instrumented_coroutine
+
+    @wraps(function)
+    def instrumented_function(self, *args, **kwargs):
+        instrumentation = getattr(self.transport, 'instrumentation', None)
+        if instrumentation is None or _current.get() is not None:
+            return function(self, *args, **kwargs)
+        record, token = _start(self, name)
+        try:
+            return function(self, *args, **kwargs)
+        except BaseException as e:
+            record.error = type(e).__name__
+            raise
+        finally:
+            _finish(instrumentation, record, token)
+    return instrumented_function
+
+def _start(client, name):
+    record = CallRecord(type(client).__name__, name)
+    record.total = perf_counter()
+    return record, _current.set(record)
+
+def _finish(instrumentation, record, token):
+    end = perf_counter()
+    _current.reset(token)
+    record.total = end - record.total
+    if record._received is not None:
+        record.parse = end - record._received
+    if record.requests:
+        instrumentation.emit(record)
+
+class Histogram:
+    '''
+    Counts of observed values by bucket upper bound.
+    '''
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def percentile(self, fraction):
+        '''
+        The upper bound of the bucket holding the given fraction (0 to 1) of observations,
+        infinity if it is past the last bucket and None if nothing was observed.
+        '''
+        if not self.count:
+            return None
+        rank = fraction * self.count
+        seen = 0
+        for bound, count in zip(self.buckets, self.counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return float('inf')
+
+class HistogramSink:
+    '''
+    Keeps a Histogram of each phase of the calls to each endpoint, and totals of their calls,
+    errors, bytes, retries and reused connections.
+    '''
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self._lock = Lock()
+        self._histograms = {}
+        self._counters = {}
+
+    def __call__(self, record):
+        endpoint = record.endpoint
+        with self._lock:
+            for phase in PHASES:
+                histogram = self._histograms.get((endpoint, phase))
+                if histogram is None:
+                    histogram = self._histograms[(endpoint, phase)] = Histogram(self.buckets)
+                histogram.observe(getattr(record, phase))
+            self._count(('calls', endpoint, record.status), 1)
+            if record.error is not None:
+                self._count(('errors', endpoint, record.error), 1)
+            self._count(('request_bytes', endpoint), record.request_bytes)
+            self._count(('response_bytes', endpoint), record.response_bytes)
+            self._count(('retries', endpoint), record.retries)
+            if record.reused:
+                self._count(('reused_connections', endpoint), record.requests)
+
+    def _count(self, key, value):
+        self._counters[key] = self._counters.get(key, 0) + value
+
+    def histogram(self, endpoint, phase='total'):
+        '''
+        The Histogram of one phase ('ttfb', 'transfer', 'parse' or 'total') of calls to endpoint.
+        '''
+        with self._lock:
+            return self._histograms.get((endpoint, phase))
+
+    def counter(self, name, endpoint, *labels):
+        '''
+        A total: 'calls' (by status), 'errors' (by exception name), 'request_bytes',
+        'response_bytes', 'retries' or 'reused_connections'.
+        '''
+        with self._lock:
+            return self._counters.get((name, endpoint) + labels, 0)
+
+class PrometheusSink(HistogramSink):
+    '''
+    A HistogramSink which renders its metrics in the Prometheus text exposition format.
+    '''
+
+    def __init__(self, buckets=DEFAULT_BUCKETS, prefix='cortanaanalytics'):
+        super().__init__(buckets)
+        self.prefix = prefix
+
+    def render(self):
+        '''
+        Returns:
+            str: the metrics, for a /metrics handler to serve as text/plain; version=0.0.4.
+        '''
+        with self._lock:
+            histograms = sorted(self._histograms.items(), key=lambda entry: (str(entry[0][0]), entry[0][1]))
+            counters = sorted(self._counters.items(), key=lambda entry: tuple(str(part) for part in entry[0]))
+
+        name = self.prefix + '_call_seconds'
+        lines = [
+            '# HELP {} Time spent in each phase of a client call.'.format(name),
+            '# TYPE {} histogram'.format(name),
+        ]
+        for (endpoint, phase), histogram in histograms:
+            labels = 'endpoint="{}",phase="{}"'.format(_escape(endpoint), phase)
+            cumulative = 0
+            for bound, count in zip(histogram.buckets + ('+Inf',), histogram.counts):
+                cumulative += count
+                lines.append('{}_bucket{{{},le="{}"}} {}'.format(name, labels, bound, cumulative))
+            lines.append('{}_sum{{{}}} {}'.format(name, labels, repr(histogram.sum)))
+            lines.append('{}_count{{{}}} {}'.format(name, labels, histogram.count))
+
+        label_names = {'calls': ('status',), 'errors': ('error',)}
+        written = set()
+        for key, value in counters:
+            counter, endpoint, labels = key[0], key[1], key[2:]
+            name = '{}_{}_total'.format(self.prefix, counter)
+            if counter not in written:
+                lines.append('# TYPE {} counter'.format(name))
+                written.add(counter)
+            label_text = ''.join(',{}="{}"'.format(label, _escape(value)) for label, value in zip(label_names.get(counter, ()), labels))
+            lines.append('{}{{endpoint="{}"{}}} {}'.format(name, _escape(endpoint), label_text, value))
+        return '\n'.join(lines) + '\n'
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
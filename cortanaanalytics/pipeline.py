@@ -0,0 +1,205 @@
+﻿#-------------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation 
+# All rights reserved. 
+# 
+# Distributed under the terms of the MIT License
+#-------------------------------------------------------------------------
+'''
+The whole lifecycle of a recommendations model as one resumable run: create the model, import
+its catalog and usage concurrently, start several builds in parallel, wait for them together and
+make the best successful build the active one.
+
+    pipeline = ModelPipeline(rs, 'books', 'catalog.csv', 'usage.csv', 
+                             build_types=('Recommendation', 'Fbt'), checkpoint_path='books.json')
+    result = pipeline.run()
+
+After each step the pipeline's state is written to checkpoint_path.  Running a pipeline again
+with the same checkpoint skips every step already done, so a run which crashed part way
+neither uploads the files again nor starts new builds.
+'''
+from .buildmonitor import BuildMonitor
+from .exceptions import CortanaAnalyticsError
+from .recommendations import BuildStatus, ImportReport, MAX_IMPORT_BYTES, Uris
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from threading import Lock
+import json
+import os
+
+BUILD_METHODS = {
+    'Ranking' : 'build_rank_model',
+    'Recommendation' : 'build_recommendation_model',
+    'Fbt' : 'build_fbt_model',
+}
+
+PipelineBuild = namedtuple('PipelineBuild', ['build_type', 'build_id', 'status'])
+PipelineResult = namedtuple('PipelineResult', ['model_id', 'imports', 'builds', 'active_build_id'])
+
+class ModelPipeline:
+    '''
+    Creates, imports, builds and promotes one model, checkpointing after each step.
+    '''
+
+    def __init__(self, recommendations, model_name, catalog_path, usage_path, build_types=('Recommendation',), 
+                 build_description=None, checkpoint_path=None, choose=None, monitor=None, timeout=None):
+        '''
+        recommendations (Recommendations): the client to use.
+        model_name (str): the name of the model to create.
+        catalog_path (str): the catalog file.
+        usage_path (str): the usage file. Files over the import size limit are imported in shards.
+        build_types (sequence of str, optional): 
+            'Ranking', 'Recommendation' and/or 'Fbt', most preferred first. One build of each 
+            type is started.
+        build_description (str, optional): the description of each build.
+        checkpoint_path (str, optional): the file the state is kept in. None keeps it in memory only.
+        choose (callable, optional): 
+            called with the list of successful PipelineBuild to return the one to promote. By 
+            default the successful build whose type comes first in build_types is promoted.
+        monitor (BuildMonitor, optional): 
+            the monitor used to wait for the builds, e.g. one shared by several pipelines. Unless
+            it was started, it is run on the calling thread.
+        timeout (float, optional): seconds to wait for the builds.
+        '''
+        unknown = [build_type for build_type in build_types if build_type not in BUILD_METHODS]
+        if unknown or not build_types:
+            raise ValueError('build_types must be some of {0}, got {1}'.format(', '.join(BUILD_METHODS), list(build_types)))
+        self.recommendations = recommendations
+        self.model_name = model_name
+        self.catalog_path = catalog_path
+        self.usage_path = usage_path
+        self.build_types = list(build_types)
+        self.build_description = build_description
+        self.checkpoint_path = checkpoint_path
+        self.choose = choose
+        self.monitor = monitor
+        self.timeout = timeout
+        self._lock = Lock()
+        self.state = self._load()
+
+    def _load(self):
+        inputs = {
+            'model_name' : self.model_name, 
+            'catalog' : _describe(self.catalog_path), 
+            'usage' : _describe(self.usage_path),
+        }
+        state = { 'inputs' : inputs, 'model_id' : None, 'imports' : {}, 'builds' : {}, 'active_build_id' : None }
+        if self.checkpoint_path is None or not os.path.exists(self.checkpoint_path):
+            return state
+        with open(self.checkpoint_path, 'r', encoding='utf-8') as f:
+            saved = json.load(f)
+        if saved.get('inputs') != inputs:
+            raise ValueError('The checkpoint {0} was written for other inputs: {1}'.format(self.checkpoint_path, saved.get('inputs')))
+        state.update(saved)
+        return state
+
+    def _save(self):
+        # write a new file and rename it over the old one, so a crash never leaves half a checkpoint
+        if self.checkpoint_path is None:
+            return
+        with self._lock:
+            temporary_path = self.checkpoint_path + '.tmp'
+            with open(temporary_path, 'w', encoding='utf-8') as f:
+                json.dump(self.state, f, indent=2, sort_keys=True)
+            os.replace(temporary_path, self.checkpoint_path)
+
+    def _update(self, *path_and_value):
+        *path, name, value = path_and_value
+        with self._lock:
+            entry = self.state
+            for part in path:
+                entry = entry[part]
+            entry[name] = value
+        self._save()
+
+    def run(self):
+        '''
+        Runs the steps not already done.
+
+        Returns:
+            PipelineResult(model_id, imports, builds, active_build_id): imports maps 'catalog' and 
+            'usage' to an ImportReport, builds maps each build type to a PipelineBuild.
+        '''
+        if self.state['model_id'] is None:
+            self._update('model_id', self.recommendations.create_model(self.model_name))
+        model_id = self.state['model_id']
+
+        self._import(model_id)
+        self._build(model_id)
+        self._wait(model_id)
+        if self.state['active_build_id'] is None:
+            self._promote(model_id)
+        return self.result()
+
+    def _import(self, model_id):
+        pending = [name for name in ('catalog', 'usage') if name not in self.state['imports']]
+
+        def import_file(name):
+            if name == 'catalog':
+                report = self.recommendations.import_file(model_id, self.catalog_path, Uris.import_catalog)
+            elif os.path.getsize(self.usage_path) > MAX_IMPORT_BYTES:
+                report = self.recommendations.import_usage_sharded(model_id, self.usage_path)
+            else:
+                report = self.recommendations.import_file(model_id, self.usage_path, Uris.import_usage)
+            self._update('imports', name, [report.info, report.line_count, report.error_count])
+
+        _run_all(import_file, pending)
+
+    def _build(self, model_id):
+        pending = [build_type for build_type in self.build_types if build_type not in self.state['builds']]
+
+        def build(build_type):
+            build_id = getattr(self.recommendations, BUILD_METHODS[build_type])(model_id, self.build_description)
+            self._update('builds', build_type, { 'build_id' : str(build_id), 'status' : None })
+
+        _run_all(build, pending)
+
+    def _wait(self, model_id):
+        builds = self.state['builds']
+        waiting = [build_type for build_type in self.build_types if not BuildStatus.is_complete(builds[build_type]['status'])]
+        if not waiting:
+            return
+        monitor = self.monitor or BuildMonitor(self.recommendations)
+
+        def completed(build_type):
+            def callback(future):
+                if future.exception() is None:
+                    self._update('builds', build_type, 'status', future.result())
+            return callback
+
+        futures = [monitor.watch(model_id, builds[build_type]['build_id'], completed(build_type), self.timeout) for build_type in waiting]
+        if not monitor.running:
+            monitor.run()
+        for future in futures:
+            future.result()
+
+    def _promote(self, model_id):
+        builds = [build for build in self.result().builds.values() if build.status == BuildStatus.success]
+        if not builds:
+            raise CortanaAnalyticsError('No build of model {0} succeeded: {1}'.format(
+                model_id, ', '.join('{0} {1} {2}'.format(*build) for build in self.result().builds.values())))
+        best = self.choose(builds) if self.choose is not None else builds[0]
+        self.recommendations.update_model(model_id, None, best.build_id)
+        self._update('active_build_id', best.build_id)
+
+    def result(self):
+        '''
+        The state of the pipeline so far, as a PipelineResult.
+        '''
+        with self._lock:
+            imports = dict((name, ImportReport(*report)) for name, report in self.state['imports'].items())
+            builds = dict((build_type, PipelineBuild(build_type, self.state['builds'][build_type]['build_id'], self.state['builds'][build_type]['status'])) 
+                for build_type in self.build_types if build_type in self.state['builds'])
+            return PipelineResult(self.state['model_id'], imports, builds, self.state['active_build_id'])
+
+def _describe(path):
+    # what identifies an input file, so that a checkpoint is not resumed with other files
+    return [os.path.abspath(path), os.path.getsize(path)]
+
+def _run_all(function, arguments):
+    # calls function on each argument concurrently and raises the first error once all are done
+    if not arguments:
+        return
+    with ThreadPoolExecutor(len(arguments)) as executor:
+        futures = [executor.submit(function, argument) for argument in arguments]
+    for future in futures:
+        future.result()
@@ -0,0 +1,169 @@
+﻿#-------------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation 
+# All rights reserved. 
+# 
+# Distributed under the terms of the MIT License
+#-------------------------------------------------------------------------
+''' 
+Local checks of catalog and usage files before they are imported with Recommendations.import_file.
+
+Catalog lines are "<Item Id>,<Item Name>,<Item Category>[,<Description>[,<Feature>=<Value>,...]]".
+Usage lines are "<User Id>,<Item Id>[,<Time>[,<Event>]]".
+
+Each check streams the file as bytes, drops invalid and duplicate lines, normalizes what is kept
+and optionally writes the compacted file, so only lines the service will accept are uploaded.
+'''
+from hashlib import blake2b
+
+MAX_ID_LENGTH = 50
+MAX_NAME_LENGTH = 255
+MAX_CATEGORY_LENGTH = 255
+MAX_DESCRIPTION_LENGTH = 4000
+MAX_USER_ID_LENGTH = 255
+
+BUFFER_SIZE = 1024 * 1024
+
+class PreflightReport:
+    __slots__ = ('info', 'line_count', 'output_count', 'duplicate_count', 'error_count', 'errors')
+
+    def __init__(self, info=''):
+        self.info = info
+        self.line_count = 0
+        self.output_count = 0
+        self.duplicate_count = 0
+        self.error_count = 0
+        # (line number, reason) of the first errors found
+        self.errors = []
+
+    def __str__(self):
+        return "Info: {0}, Lines: {1}, Kept: {2}, Duplicates: {3}, Errors: {4}".format(
+            self.info, self.line_count, self.output_count, self.duplicate_count, self.error_count)
+
+def check_catalog(catalog_path, output_path=None, max_reported_errors=100):
+    '''
+    Checks a catalog file. Lines with a missing or too long id, name or category, an item id 
+    seen before, or a feature which is not name=value are dropped. Spaces around fields and 
+    features are removed, as are empty and repeated features.
+
+    Args:
+        catalog_path (str): the catalog file.
+        output_path (str, optional): where to write the compacted catalog.
+        max_reported_errors (int, optional): how many errors to keep in PreflightReport.errors.
+
+    Returns:
+        PreflightReport
+    '''
+    seen = set()
+
+    def check(fields):
+        if len(fields) < 3:
+            return None, 'expected at least id, name and category'
+        item_id, name, category = fields[0], fields[1], fields[2]
+        if not item_id or _too_long(item_id, MAX_ID_LENGTH):
+            return None, 'item id must be 1 to {} characters'.format(MAX_ID_LENGTH)
+        if not name or _too_long(name, MAX_NAME_LENGTH):
+            return None, 'name must be 1 to {} characters'.format(MAX_NAME_LENGTH)
+        if not category or _too_long(category, MAX_CATEGORY_LENGTH):
+            return None, 'category must be 1 to {} characters'.format(MAX_CATEGORY_LENGTH)
+        if len(fields) > 3 and _too_long(fields[3], MAX_DESCRIPTION_LENGTH):
+            return None, 'description must be at most {} characters'.format(MAX_DESCRIPTION_LENGTH)
+
+        features = []
+        for feature in fields[4:]:
+            if not feature:
+                continue
+            feature_name, equals, value = feature.partition(b'=')
+            feature_name, value = feature_name.strip(), value.strip()
+            if not equals or not feature_name:
+                return None, 'feature "{}" is not name=value'.format(feature.decode('utf-8', 'replace'))
+            feature = feature_name + b'=' + value
+            if feature not in features:
+                features.append(feature)
+
+        if item_id in seen:
+            return False, None
+        seen.add(item_id)
+        return b','.join(fields[:4] + features), None
+
+    return _check_file(catalog_path, output_path, max_reported_errors, check)
+
+def check_usage(usage_path, output_path=None, catalog_path=None, max_reported_errors=100):
+    '''
+    Checks a usage file. Lines with a missing or too long user or item id, or whose item is not
+    in the catalog, are dropped, as are repeated lines. Spaces around fields are removed.
+
+    Repeated lines are found by a 128 bit BLAKE2 digest of each kept line, so memory use grows 
+    with the number of distinct lines (about 50 bytes each), not with their length.
+
+    Args:
+        usage_path (str): the usage file.
+        output_path (str, optional): where to write the compacted usage file.
+        catalog_path (str, optional): if given, items must be in this catalog.
+        max_reported_errors (int, optional): how many errors to keep in PreflightReport.errors.
+
+    Returns:
+        PreflightReport
+    '''
+    item_ids = None if catalog_path is None else _read_item_ids(catalog_path)
+    seen = set()
+
+    def check(fields):
+        if len(fields) < 2 or len(fields) > 4:
+            return None, 'expected user id, item id and optionally time and event'
+        user_id, item_id = fields[0], fields[1]
+        if not user_id or _too_long(user_id, MAX_USER_ID_LENGTH):
+            return None, 'user id must be 1 to {} characters'.format(MAX_USER_ID_LENGTH)
+        if not item_id or _too_long(item_id, MAX_ID_LENGTH):
+            return None, 'item id must be 1 to {} characters'.format(MAX_ID_LENGTH)
+        if item_ids is not None and item_id not in item_ids:
+            return None, 'item "{}" is not in the catalog'.format(item_id.decode('utf-8', 'replace'))
+
+        line = b','.join(fields)
+        digest = blake2b(line, digest_size=16).digest()
+        if digest in seen:
+            return False, None
+        seen.add(digest)
+        return line, None
+
+    return _check_file(usage_path, output_path, max_reported_errors, check)
+
+def _too_long(field, max_length):
+    # limits are in characters; a UTF-8 field has at least as many bytes, so most are not decoded
+    return len(field) > max_length and len(field.decode('utf-8', 'replace')) > max_length
+
+def _read_item_ids(catalog_path):
+    item_ids = set()
+    with open(catalog_path, 'rb', BUFFER_SIZE) as catalog:
+        for line in catalog:
+            item_id = line.split(b',', 1)[0].strip()
+            if item_id:
+                item_ids.add(item_id)
+    return item_ids
+
+def _check_file(path, output_path, max_reported_errors, check):
+    # check(fields) returns (line to keep, None), (False, None) for a duplicate or (None, error)
+    report = PreflightReport(path)
+    output = open(output_path, 'wb', BUFFER_SIZE) if output_path is not None else None
+    try:
+        with open(path, 'rb', BUFFER_SIZE) as file:
+            for line_number, line in enumerate(file, 1):
+                report.line_count += 1
+                line = line.rstrip(b'\r\n')
+                if not line.strip():
+                    continue
+                kept, error = check([field.strip() for field in line.split(b',')])
+                if error is not None:
+                    report.error_count += 1
+                    if len(report.errors) < max_reported_errors:
+                        report.errors.append((line_number, error))
+                elif kept is False:
+                    report.duplicate_count += 1
+                else:
+                    report.output_count += 1
+                    if output is not None:
+                        output.write(kept)
+                        output.write(b'\n')
+    finally:
+        if output is not None:
+            output.close()
+    return report
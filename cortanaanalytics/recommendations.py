@@ -4,18 +4,30 @@
 # 
 # Distributed under the terms of the MIT License
 #-------------------------------------------------------------------------
-import requests
-import base64
-from xml.etree import ElementTree
+from .transport import Transport
+from .instrumentation import instrumented
+from .singleflight import SingleFlight, coalesced
+from .exceptions import CortanaAnalyticsError, ResponseFormatError, error_for
+from .upload import MultipartFileStream, plan_shards, shard_file_name
+from .concurrency import bounded_map
+from .feeds import iter_properties, first_properties
+from .buildmonitor import BuildMonitor, BuildStatus
 import os
-from time import sleep
+import warnings
 from datetime import datetime
+from collections import namedtuple
+from array import array
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from threading import Lock
+
+# The largest file the service accepts in one import call.
+MAX_IMPORT_BYTES = 200 * 1024 * 1024
 
 class Recommendations:
     API_VERSION = '1.0'
     ns = { 'a' : 'http://www.w3.org/2005/Atom', 'm' : "http://schemas.microsoft.com/ado/2007/08/dataservices/metadata", 'd' : "http://schemas.microsoft.com/ado/2007/08/dataservices" }
 
-    def __init__(self, email, account_key):
+    def __init__(self, email, account_key, transport=None, warm_up=False, cache=None, coalesce=True):
         """
         Sample app to show usage of part of the cloudML recommendation API 
         The application will create a model container, add catalog and usage data, 
@@ -26,9 +38,25 @@ class Recommendations:
         other API according to your need.
 
         account_key (str): account_key provided at https://datamarket.azure.com/account/keys
+        transport (Transport, optional): a pooled transport, which may be shared with other clients.
+        warm_up (bool, optional): if True, open a connection to the service now.
+        cache (TTLCache or DiskCache, optional): 
+            caches get_recommendation results. Entries for a model are dropped when update_model 
+            changes its active build.
+        coalesce (bool, optional): 
+            if True, identical get_recommendation and build status calls made while one is in 
+            flight share its request and its result.
         """
         self.auth = (email, account_key)
-
+        self.transport = transport or Transport()
+        self.cache = cache
+        self.flights = SingleFlight() if coalesce else None
+        self._generations = {}
+        self._generations_lock = Lock()
+        if warm_up:
+            self.transport.warm_up(Uris.root_uri)
+
+    @instrumented
     def create_model(self, model_name):
         """
         create the model with the given name.
@@ -38,15 +66,20 @@ class Recommendations:
         """
         create_model_url = Uris.root_uri + Uris.create_model_url.format(model_name, self.API_VERSION)
 
-        response = requests.post(create_model_url, auth=self.auth)
+        response = self.transport.post(create_model_url, auth=self.auth)
 
         if response.status_code != 200:
-            raise Exception('Failed to create model: Code:{} Reason:{}'.format(response.status_code, response.reason))
+            raise error_for(response, 'Failed to create model: Code:{} Reason:{}'.format(response.status_code, response.reason))
+
+        return self._parse_model_id(response.content)
 
+    def _parse_model_id(self, content):
         # get model id
-        tree = ElementTree.fromstring(response.content)
-        model_id = tree.find('a:entry/a:content/m:properties/d:Id', self.ns).text
-        return model_id
+        properties = first_properties(content)
+        if properties is not None and 'Id' in properties:
+            return properties['Id']
+        else:
+            raise ResponseFormatError('Response did not contain expected elements.  Unable to find model id.')
 
     def extract_error_info(self, response):
         """
@@ -59,6 +92,7 @@ class Recommendations:
         error_msg = '{}->{}'.format(response.reason, detailed_reason) if detailed_reason else response.reason 
         return error_msg
 
+    @instrumented
     def _build_recommendation(self, model_id, build_description, build_type, body):
         """
         Helper to trigger a build for the given model and body
@@ -73,23 +107,27 @@ class Recommendations:
         Returns:
             str: The id of the triggered build.
         """
-        if not build_description:
-            build_description = "build of " + datetime.now().strftime('%Y%m%d%H%M%S')
-
-        response = requests.post(Uris.root_uri + Uris.build_model.format(model_id, build_description, build_type), body, headers={'content-type': 'Application/xml'}, auth=self.auth)
+        response = self.transport.post(self._build_url(model_id, build_description, build_type), body, headers={'content-type': 'Application/xml'}, auth=self.auth)
 
         if response.status_code != 200:
-            raise Exception("Error {0}: Failed to start build for model {1}, \n reason {2}".format(
+            raise error_for(response, "Error {0}: Failed to start build for model {1}, \n reason {2}".format(
                 response.status_code, model_id, self.extract_error_info(response)))
 
-        build_id = None
+        return self._parse_build_id(response.content)
+
+    def _build_url(self, model_id, build_description, build_type):
+        if not build_description:
+            build_description = "build of " + datetime.now().strftime('%Y%m%d%H%M%S')
+        return Uris.root_uri + Uris.build_model.format(model_id, build_description, build_type)
+
+    def _parse_build_id(self, content):
         #process response if success
-        node = ElementTree.fromstring(response.content).find('a:entry/a:content/m:properties/d:Id', self.ns)
-        if node is not None:
-            build_id = node.text
+        properties = first_properties(content)
+        if properties is not None and 'Id' in properties:
+            build_id = properties['Id']
             return build_id
         else:
-            raise Exception('Response did not contain expected elements.  Unable to find build id.')
+            raise ResponseFormatError('Response did not contain expected elements.  Unable to find build id.')
     
     def build_rank_model(self, model_id, build_description = None):
         """
@@ -176,27 +214,58 @@ class Recommendations:
         
         return self._build_recommendation(model_id, build_description, 'Fbt', body)
 
+    @instrumented
+    @coalesced
     def get_build_status(self, model_id, build_id):
         """
         Retrieve the build status for the given build
         """
-        response = requests.get(Uris.root_uri + Uris.build_statuses.format(model_id, False), auth=self.auth)
+        response = self.transport.get(Uris.root_uri + Uris.build_statuses.format(model_id, False), auth=self.auth)
         
         if response.status_code != 200:
-            raise Exception("Error {0}: Failed to retrieve build for status for model {1} and build id {2}, \n reason {3}".format(
+            raise error_for(response, "Error {0}: Failed to retrieve build for status for model {1} and build id {2}, \n reason {3}".format(
                 response.status_code, model_id, build_id, self.extract_error_info(response)))
         
-        build_status_str = None
-        node = ElementTree.fromstring(response.content).find("a:entry/a:content/m:properties[d:BuildId='{0}']/d:Status".format(build_id), self.ns)
-        if node is  None:
-            # Queued objects don't have a 'BuildId' but instead an 'Id' Element
-            node = ElementTree.fromstring(response.content).find("a:entry/a:content/m:properties[d:Id='{0}']/d:Status".format(build_id), self.ns)
+        return self._parse_build_status(response.content, build_id)
+
+    @instrumented
+    @coalesced
+    def get_build_statuses(self, model_id):
+        """
+        Retrieve the status of every build of the given model with one call.
+
+        Returns:
+            dict: build id (str) -> status (str)
+        """
+        response = self.transport.get(Uris.root_uri + Uris.build_statuses.format(model_id, False), auth=self.auth)
         
-        if node is not None:
-            return node.text
+        if response.status_code != 200:
+            raise error_for(response, "Error {0}: Failed to retrieve build statuses for model {1}, \n reason {2}".format(
+                response.status_code, model_id, self.extract_error_info(response)))
+
+        return self._parse_build_statuses(response.content)
+
+    def _parse_build_statuses(self, content):
+        # the first entry of a build is kept, and an entry with its BuildId before one with its Id
+        statuses, queued = {}, {}
+        for properties in iter_properties(content):
+            if 'BuildId' in properties:
+                statuses.setdefault(properties['BuildId'], properties.get('Status'))
+            elif 'Id' in properties:
+                # Queued objects don't have a 'BuildId' but instead an 'Id' Element
+                queued.setdefault(properties['Id'], properties.get('Status'))
+        for build_id, status in queued.items():
+            statuses.setdefault(build_id, status)
+        return statuses
+
+    def _parse_build_status(self, content, build_id):
+        status = self._parse_build_statuses(content).get(str(build_id))
+        if status is not None:
+            return status
         else:
-            raise Exception("Failed to find entry/content/properties[Id='{}']/Status Element".format(build_id))
+            raise ResponseFormatError("Failed to find entry/content/properties[Id='{}']/Status Element".format(build_id))
                 
+    @instrumented
     def update_model(self, model_id, description, active_build_id):
         """
         Update model information.  If description is set we update the model name.  
@@ -207,7 +276,32 @@ class Recommendations:
             description (str): The model description (optional)
             active_build_id (str): The id of the build to be active (optional)
         """
-        
+        response = self.transport.put(Uris.root_uri + Uris.update_model.format(model_id), self._update_model_body(description, active_build_id), headers={'content-type':'Application/xml'}, auth=self.auth)
+
+        if response.status_code != 200:
+            raise error_for(response, "Error {0}: Failed to update model for model {1}, \n reason {2}".format(
+                response.status_code, model_id, self.extract_error_info(response)))
+
+        self._invalidate_cache(model_id, active_build_id)
+
+    def _invalidate_cache(self, model_id, active_build_id):
+        if self.cache is not None and active_build_id:
+            # results of the old build still in flight are not cached once the generation changes
+            with self._generations_lock:
+                self._generations[model_id] = self._generations.get(model_id, 0) + 1
+            self.cache.evict(lambda key: key[0] == model_id)
+
+    def _cache_generation(self, model_id):
+        with self._generations_lock:
+            return self._generations.get(model_id, 0)
+
+    def _cache_rows(self, key, model_id, generation, columns):
+        # under the lock, so that the cache cannot be invalidated between the check and the write
+        with self._generations_lock:
+            if self._generations.get(model_id, 0) == generation:
+                self.cache.set(key, columns.to_rows())
+
+    def _update_model_body(self, description, active_build_id):
         body = '<ModelUpdateParams xmlns:xsd="http://www.w3.org/2001/XMLSchema" xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance">'                  
 
         if description is not None and description != '':
@@ -217,14 +311,10 @@ class Recommendations:
             body += "<ActiveBuildId>{0}</ActiveBuildId>".format(active_build_id)
         
         body += "</ModelUpdateParams>"
-           
-        response = requests.put(Uris.root_uri + Uris.update_model.format(model_id), body, headers={'content-type':'Application/xml'}, auth=self.auth)
+        return body
 
-        if response.status_code != 200:
-            raise Exception("Error {0}: Failed to update model for model {1}, \n reason {2}".format(
-                response.status_code, model_id, self.extract_error_info(response)))
-
-    def get_recommendation(self, model_id, item_id_list, number_of_results=10, include_metadata = False):
+    @instrumented
+    def get_recommendation(self, model_id, item_id_list, number_of_results=10, include_metadata = False, columnar = False):
         """
         Retrieve recommendation for the given item(s)
 
@@ -232,91 +322,231 @@ class Recommendations:
             model_id (str):
             item_id_list (list of str):
             number_of_results (int):
+            include_metadata (bool):
+            columnar (bool): if True, return a RecommendationColumns instead of a list.
 
         Returns:
             list of RecommendedItem): A collection of recommended items.
         """
-        
-        response = requests.get(Uris.root_uri + Uris.get_recommendation.format(model_id,','.join(item_id_list), number_of_results, include_metadata), auth=self.auth)
+        key = self._cache_key(model_id, item_id_list, number_of_results, include_metadata)
+        generation = 0
+        if key is not None:
+            generation = self._cache_generation(model_id)
+            rows = self.cache.get(key)
+            if rows is not None:
+                columns = RecommendationColumns.from_rows(rows)
+                return columns if columnar else columns.to_items()
+
+        columns = self._get_recommendation_columns(model_id, item_id_list, number_of_results, include_metadata, generation)
+
+        if key is not None:
+            self._cache_rows(key, model_id, generation, columns)
+        return columns if columnar else columns.to_items()
+
+    @coalesced
+    def _get_recommendation_columns(self, model_id, item_id_list, number_of_results, include_metadata, generation):
+        # shared by identical calls in flight, which each make their own items from the columns.
+        # generation only keeps calls made after the cache was invalidated from joining older ones
+        response = self.transport.get(Uris.root_uri + Uris.get_recommendation.format(model_id,','.join(item_id_list), number_of_results, include_metadata), auth=self.auth)
 
         if response.status_code != 200:
-            raise Exception(
+            raise error_for(response,
                 "Error {0}: Failed to retrieve recommendation for item list {1} and model {2}, \n reason {3}".format(
                     response.status_code, ",".join(item_id_list), model_id, self.extract_error_info(response)))
-        
-        reco_list = []
-        node_list = ElementTree.fromstring(response.content).findall("a:entry/a:content/m:properties", self.ns)
+        return self._parse_recommendation_columns(response.content)
+
+    def get_recommendations_bulk(self, model_id, item_id_lists, number_of_results=10, include_metadata=False, max_workers=8, ordered=True, columnar=False):
+        """
+        Retrieve recommendations for many seed item lists, using a pool of max_workers threads.
+        item_id_lists is consumed lazily, so it may be a generator over millions of lists.
+        A failed lookup is reported in its result and does not stop the others.
+
+        Args:
+            model_id (str):
+            item_id_lists (iterable of list of str):
+            number_of_results (int):
+            include_metadata (bool):
+            max_workers (int): the number of concurrent requests.
+            ordered (bool): if True, results are yielded in input order, otherwise as they complete.
+            columnar (bool): if True, the items of each result are a RecommendationColumns.
+
+        Returns:
+            generator of BulkRecommendation(index, item_id_list, items, error)
+        """
+        def recommend(item_id_list):
+            return self.get_recommendation(model_id, item_id_list, number_of_results, include_metadata, columnar)
 
-        for node in node_list:
-            item = RecommendedItem()
+        for outcome in bounded_map(recommend, item_id_lists, max_workers, ordered):
+            yield BulkRecommendation(*outcome)
+
+    def _cache_key(self, model_id, item_id_list, number_of_results, include_metadata):
+        # the service treats the seed items as a set, so their order and duplicates do not matter
+        if self.cache is None:
+            return None
+        items = tuple(sorted(set(item_id.strip() for item_id in item_id_list)))
+        return (model_id, items, int(number_of_results), bool(include_metadata))
+
+    def _parse_recommendations(self, content):
+        return self._parse_recommendation_columns(content).to_items()
+
+    def _parse_recommendation_columns(self, content):
+        columns = RecommendationColumns()
+
+        for properties in iter_properties(content):
             # cycle through the recommended items
-            for child in node.getchildren():
-                childName = str(child)
-            
-                if "Id" in childName:
-                    item.id = child.text
-                elif "Name" in childName:
-                    item.name = child.text
-                elif "Rating" in childName:
-                    item.rating = child.text
-                elif "Reasoning" in childName:
-                    item.reasoning = child.text
-                else:
-                    print('WARNING: Found an unexpected value "{}"'.format(childName)) # TODO: Should this be an error/exception
-
-            reco_list.append(item)
-
-        return reco_list
-
-    def import_file(self, model_id, file_path, import_uri):
+            for name in properties:
+                if name not in RecommendationColumns.fields:
+                    warnings.warn('Found an unexpected value "{}"'.format(name))
+
+            rating = properties.get('Rating')
+            columns.append(
+                properties.get('Id') or '', 
+                properties.get('Name') or '', 
+                float(rating) if rating else 0.0, 
+                properties.get('Reasoning') or '')
+
+        return columns
+
+    @instrumented
+    def import_file(self, model_id, file_path, import_uri, progress_callback=None):
         """
         Import the given file (catalog/usage) to the given model. 
+        The file is streamed from disk, so files of any size can be imported in constant memory.
+
+        Args:
+            model_id (str): the model id
+            file_path (str): the catalog or usage file
+            import_uri (str): Uris.import_catalog or Uris.import_usage
+            progress_callback (callable, optional): 
+                called as progress_callback(bytes_sent, total_bytes) as the upload proceeds.
+
+        Returns:
+            ImportReport
         """
-        file = open(file_path)
         file_name = os.path.basename(file_path)
-        
-        response = requests.post(Uris.root_uri + import_uri.format(model_id, file_name), files={file_name: file}, auth=self.auth) 
+
+        with MultipartFileStream(file_path, file_name, progress_callback=progress_callback) as body:
+            return self._import_stream(model_id, file_path, import_uri, body)
+
+    @instrumented
+    def _import_stream(self, model_id, file_path, import_uri, body):
+        file_name = body.file_name
+        response = self.transport.post(Uris.root_uri + import_uri.format(model_id, file_name), body, headers=body.headers, auth=self.auth) 
 
         if response.status_code != 200:
-            raise Exception(
+            raise error_for(response,
                 "Error {0}: Failed to import file {1}, for model {2} \n reason {3}".format(
                     response.status_code, file_path, model_id, self.extract_error_info(response)))
 
+        return self._parse_import_report(response.content, file_name)
+
+    def import_usage_sharded(self, model_id, file_path, max_shard_bytes=MAX_IMPORT_BYTES, max_workers=4, max_retries=2, progress_callback=None):
+        """
+        Import a usage file too large for a single ImportUsageFile call.  The file is split on 
+        line boundaries into shards of at most max_shard_bytes, which are uploaded concurrently.
+        Shards that fail are then retried one at a time; the rest of the file is not resent.
+
+        Args:
+            model_id (str): the model id
+            file_path (str): the usage file
+            max_shard_bytes (int, optional): the largest number of bytes of the file sent in one call.
+            max_workers (int, optional): how many shards to upload at once.
+            max_retries (int, optional): how many more times to try a shard which failed.
+            progress_callback (callable, optional): 
+                called as progress_callback(bytes_sent, total_bytes) for all shards together.
+
+        Returns:
+            ImportReport: the line and error counts of all shards.
+        """
+        file_name = os.path.basename(file_path)
+        shards = plan_shards(file_path, max_shard_bytes)
+        progress = _ShardProgress(progress_callback)
+
+        def import_shard(index):
+            offset, length = shards[index]
+            with MultipartFileStream(file_path, shard_file_name(file_name, index), offset, length, progress_callback=progress.callback(index)) as body:
+                return self._import_stream(model_id, file_path, Uris.import_usage, body)
+
+        reports = [None] * len(shards)
+        errors = {}
+        with ThreadPoolExecutor(max_workers) as executor:
+            futures = { executor.submit(import_shard, index) : index for index in range(len(shards)) }
+            for future in as_completed(futures):
+                try:
+                    reports[futures[future]] = future.result()
+                except Exception as e:
+                    errors[futures[future]] = e
+
+        for index in sorted(errors):
+            for attempt in range(max_retries):
+                try:
+                    reports[index] = import_shard(index)
+                    break
+                except Exception as e:
+                    errors[index] = e
+
+        return self._shards_report(model_id, file_path, reports, errors)
+
+    def _shards_report(self, model_id, file_path, reports, errors):
+        # the report of all of the shards of a file, or the error of the shards which failed
+        file_name = os.path.basename(file_path)
+        failed = [index for index in sorted(errors) if reports[index] is None]
+        if failed:
+            raise CortanaAnalyticsError("Failed to import shards {0} of file {1}, for model {2} \n reason {3}".format(
+                ', '.join(shard_file_name(file_name, index) for index in failed), file_path, model_id, errors[failed[0]]))
+
+        return ImportReport(file_name, sum(r.line_count for r in reports), sum(r.error_count for r in reports))
+
+    def _parse_import_report(self, content, file_name):
         # process response if success
-        node_list = ElementTree.fromstring(response.content).findall("a:entry/a:content/m:properties/*", self.ns)
-
-        report = ImportReport()
-        report.info = file_name
-        for node in node_list:
-            if "LineCount" in str(node):
-                report.line_count = node.text
-            elif "ErrorCount" in str(node):
-                report.error_count = node.text
+        report = ImportReport(file_name)
+        for properties in iter_properties(content):
+            report.line_count = int(properties.get('LineCount', report.line_count))
+            report.error_count = int(properties.get('ErrorCount', report.error_count))
         
         return report
 
-    def wait_for_build(self, model_id, build_id):
+    def wait_for_build(self, model_id, build_id, timeout=None):
         '''
-        Waits for build to either complete, cancel, or error out
+        Waits for build to either complete, cancel, or error out.
+        The build is checked often at first and less often the longer it runs.
+        To wait for many builds at once use a BuildMonitor.
 
         Args:
             model_id (str)
             build_id (str)
+            timeout (float, optional): seconds to wait before raising TimeoutError.
 
         Returns:
             str : Status of the build.
         '''
-        status = BuildStatus.create
-        monitor = True
-        while monitor:
-            status = self.get_build_status(model_id, build_id)
-            print("\tbuild '{0}' (model '{1}'): status {2}".format(build_id, model_id,status))
-            if status != BuildStatus.error and status != BuildStatus.cancelled and status != BuildStatus.success:
-                print(" --> will check in 5 sec...")
-                sleep(5)
-            else:
-                monitor = False
-        return status
+        monitor = BuildMonitor(self)
+        future = monitor.watch(model_id, build_id, timeout=timeout)
+        monitor.run()
+        return future.result()
+
+BulkRecommendation = namedtuple('BulkRecommendation', ['index', 'item_id_list', 'items', 'error'])
+
+class _ShardProgress:
+    '''
+    Adds up the progress of concurrently uploading shards.
+    '''
+    def __init__(self, progress_callback):
+        self.progress_callback = progress_callback
+        self._lock = Lock()
+        self._sent = {}
+        self._totals = {}
+
+    def callback(self, index):
+        if self.progress_callback is None:
+            return None
+        def shard_progress(sent, total):
+            with self._lock:
+                self._sent[index] = sent
+                self._totals[index] = total
+                sent, total = sum(self._sent.values()), sum(self._totals.values())
+            self.progress_callback(sent, total)
+        return shard_progress
 
 class Uris:
     root_uri = "https://api.datamarket.azure.com/amla/recommendations/v2/"
@@ -328,15 +558,6 @@ class Uris:
     get_recommendation = "ItemRecommend?modelId=%27{0}%27&itemIds=%27{1}%27&numberOfResults={2}&includeMetadata={3}&apiVersion=%271.0%27"
     update_model = "UpdateModel?id=%27{0}%27&apiVersion=%271.0%27"
 
-class BuildStatus:
-    create = 'Create'
-    queued = 'Queued'
-    building = 'Building'
-    success = 'Success'
-    error = 'Error'
-    cancelling = 'Cancelling'
-    cancelled = 'Cancelled'
-
 class CatalogItem:
     def __init__(self, id, name):
         self.id = id
@@ -346,16 +567,69 @@ class CatalogItem:
         return 'Id: {}, Name: {}'.format(self.id, self.name)
 
 class ImportReport:
-    info = ""
-    error_count = 0
-    line_count = 0
+    __slots__ = ('info', 'line_count', 'error_count')
+
+    def __init__(self, info='', line_count=0, error_count=0):
+        self.info = info
+        self.line_count = line_count
+        self.error_count = error_count
+
+    def __str__(self):
+        return "Info: {0}, Lines: {1}, Errors: {2}".format(self.info, self.line_count, self.error_count)
 
 class RecommendedItem:
-    name = ''
-    rating = ''
-    reasoning = ''
-    id = ''
+    __slots__ = ('id', 'name', 'rating', 'reasoning')
+
+    def __init__(self, id='', name='', rating=0.0, reasoning=''):
+        self.id = id
+        self.name = name
+        self.rating = rating
+        self.reasoning = reasoning
 
     def __str__(self):
         return "Name: {0}, Id: {1}, Rating: {2}, Reasoning: {3}".format(
-            self.name, self.id, self.rating, self.reasoning)
\ No newline at end of file
+            self.name, self.id, self.rating, self.reasoning)
+
+class RecommendationColumns:
+    """
+    Recommended items stored as columns rather than as one object per item. 
+    Used by bulk lookups which never need the individual RecommendedItem objects.
+    """
+    __slots__ = ('ids', 'names', 'ratings', 'reasonings')
+    fields = frozenset(('Id', 'Name', 'Rating', 'Reasoning'))
+
+    def __init__(self):
+        self.ids = []
+        self.names = []
+        self.ratings = array('d')
+        self.reasonings = []
+
+    def append(self, id, name, rating, reasoning):
+        self.ids.append(id)
+        self.names.append(name)
+        self.ratings.append(rating)
+        self.reasonings.append(reasoning)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def to_items(self):
+        """
+        Returns:
+            list of RecommendedItem
+        """
+        return [RecommendedItem(*row) for row in zip(self.ids, self.names, self.ratings, self.reasonings)]
+
+    def to_rows(self):
+        """
+        Returns:
+            list of [id, name, rating, reasoning]: the items as plain values, which is how caches keep them.
+        """
+        return [list(row) for row in zip(self.ids, self.names, self.ratings, self.reasonings)]
+
+    @classmethod
+    def from_rows(cls, rows):
+        columns = cls()
+        for row in rows:
+            columns.append(*row)
+        return columns
\ No newline at end of file
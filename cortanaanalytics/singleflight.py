@@ -0,0 +1,151 @@
+﻿#-------------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation 
+# All rights reserved. 
+# 
+# Distributed under the terms of the MIT License
+#-------------------------------------------------------------------------
+'''
+Coalescing of identical concurrent calls.  While a read-only client call is in flight, the same
+call made from other threads (or tasks) waits for it instead of sending its own request, and
+receives its result or its error.
+
+The clients coalesce by default; pass coalesce=False to a client to send every call.
+'''
+from collections.abc import Iterator
+from concurrent.futures import Future
+from functools import wraps
+from inspect import signature
+from threading import Lock
+import asyncio
+
+class SingleFlight:
+    '''
+    Runs at most one call per key at a time.  Callers arriving while the call for their key is
+    in flight share its outcome.  Callers sharing a call receive the same result object, so
+    results should be treated as read-only.
+    '''
+
+    def __init__(self):
+        self._lock = Lock()
+        self._calls = {}
+        # calls answered by another caller's call
+        self.shared = 0
+
+    def call(self, key, function, *args, **kwargs):
+        '''
+        Returns function(*args, **kwargs), or the result of the identical call in flight.
+        '''
+        with self._lock:
+            future = self._calls.get(key)
+            leader = future is None
+            if leader:
+                future = self._calls[key] = Future()
+            else:
+                self.shared += 1
+        if not leader:
+            return future.result()
+
+        try:
+            result = function(*args, **kwargs)
+        except BaseException as e:
+            self._done(key, future)
+            future.set_exception(e)
+            raise
+        self._done(key, future)
+        future.set_result(result)
+        return result
+
+    async def call_async(self, key, function, *args, **kwargs):
+        '''
+        Awaits function(*args, **kwargs), or the identical call in flight.  The call runs as
+        its own task, so cancelling one of its callers does not cancel it for the others; it is
+        cancelled once all of its callers are.
+        '''
+        with self._lock:
+            flight = self._calls.get(key)
+            if flight is None:
+                flight = self._calls[key] = _Flight(asyncio.ensure_future(function(*args, **kwargs)))
+                flight.task.add_done_callback(lambda task: self._done(key, flight))
+            else:
+                self.shared += 1
+            flight.waiters += 1
+        try:
+            return await asyncio.shield(flight.task)
+        finally:
+            flight.waiters -= 1
+            if not flight.waiters and not flight.task.done():
+                self._done(key, flight)
+                flight.task.cancel()
+
+    def _done(self, key, flight):
+        # later callers start a new call rather than get a result which may be stale
+        with self._lock:
+            if self._calls.get(key) is flight:
+                del self._calls[key]
+
+    def __len__(self):
+        return len(self._calls)
+
+class _Flight:
+    __slots__ = ('task', 'waiters')
+
+    def __init__(self, task):
+        self.task = task
+        self.waiters = 0
+
+def coalesced(function):
+    '''
+    Shares each call of a read-only client method with the identical calls already in flight
+    on the same client, if the client has a SingleFlight in its flights attribute.  Calls are
+    identical when their arguments, defaults applied, are equal.
+    '''
+    key = _call_key(function)
+
+    if asyncio.iscoroutinefunction(function):
+        @wraps(function)
+        async def coalesced_coroutine(self, *args, **kwargs):
+            flights = getattr(self, 'flights', None)
+            flight_key = key(args, kwargs) if flights is not None else None
+            if flight_key is None:
+                return await function(self, *args, **kwargs)
+            return await flights.call_async(flight_key, function, self, *args, **kwargs)
+        return coalesced_coroutine
+
+    @wraps(function)
+    def coalesced_function(self, *args, **kwargs):
+        flights = getattr(self, 'flights', None)
+        flight_key = key(args, kwargs) if flights is not None else None
+        if flight_key is None:
+            return function(self, *args, **kwargs)
+        return flights.call(flight_key, function, self, *args, **kwargs)
+    return coalesced_function
+
+def _call_key(function):
+    # a function making a hashable key of the arguments of a call of the method function, or
+    # None if an argument cannot be compared
+    parameters = signature(function)
+    name = function.__name__
+
+    def key(args, kwargs):
+        bound = parameters.bind(None, *args, **kwargs)
+        bound.apply_defaults()
+        try:
+            key = (name,) + tuple(_freeze(value) for value in list(bound.arguments.values())[1:])
+            hash(key)
+        except TypeError:
+            return None
+        return key
+    return key
+
+def _freeze(value):
+    # a hashable equivalent of an argument, e.g. of a list of text blocks.  An iterator cannot
+    # be compared without consuming it
+    if isinstance(value, Iterator):
+        raise TypeError('an iterator has no key')
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(item) for item in value)
+    if isinstance(value, dict):
+        return tuple(sorted((key, _freeze(item)) for key, item in value.items()))
+    if isinstance(value, (set, frozenset)):
+        return frozenset(_freeze(item) for item in value)
+    return value
@@ -4,67 +4,284 @@
 # 
 # Distributed under the terms of the MIT License
 #-------------------------------------------------------------------------
-import requests
+from .transport import Transport
+from .instrumentation import instrumented
+from .singleflight import SingleFlight, coalesced
+from .cache import cached
+from .dedup import deduplicated
+from .batching import MAX_BATCH_DOCUMENTS, in_input_order, plan_batches, with_ids
+from .concurrency import bounded_map
+from .exceptions import CortanaAnalyticsError, error_for
+from .codec import DEFAULT_CODEC, decode
+from collections import namedtuple
+from itertools import islice
+
+# what each analysis is called, where its batches are sent, where its results are in the responses,
+# and the parameters of the single document call which a batch call implies
+Analysis = namedtuple('Analysis', ['name', 'description', 'batch_uri', 'batch_key', 'field', 'batch_params'])
+
+# a result of the iter_ methods: the document's index in the input, the document, and its
+# score, key phrases or detected languages, or the exception which kept it from being analysed
+StreamResult = namedtuple('StreamResult', ['index', 'document', 'result', 'error'])
+
+# the result of analyze for one document; analyses not asked for, or which failed for the document, are None
+DocumentAnalysis = namedtuple('DocumentAnalysis', ['id', 'sentiment', 'key_phrases', 'language'])
 
 class TextAnalytics:
-    def __init__(self, account_key):
+    def __init__(self, account_key, transport=None, warm_up=False, coalesce=True, cache=None, dedup=None, codec=None):
         '''
         account_key (str): account_key provided at https://datamarket.azure.com/account/keys
+        transport (Transport, optional): a pooled transport, which may be shared with other clients.
+        warm_up (bool, optional): if True, open a connection to the service now.
+        coalesce (bool, optional): 
+            if True, identical calls made while one is in flight share its request and its result.
+        cache (TTLCache or DiskCache, optional): caches results. A DiskCache keeps them across restarts.
+        dedup (ResultCache, optional): 
+            if given, each distinct text is sent once and its result is kept for its copies.
+        codec (JsonCodec, optional): encodes requests and decodes responses, by default with orjson if it is installed.
         '''
         self.auth = ('', account_key)
+        self.transport = transport or Transport()
+        self.flights = SingleFlight() if coalesce else None
+        self.cache = cache
+        self.dedup = dedup
+        self.codec = codec or DEFAULT_CODEC
+        if warm_up:
+            self.transport.warm_up(Uris.root)
 
+    @instrumented
+    @coalesced
+    @cached
+    @deduplicated('sentiment')
     def get_sentiment(self, text):
         '''
         text (str)
         '''
         API_URL = Uris.get_sentiment
-        response = requests.get(API_URL, params = { 'text':text }, auth=self.auth)
-        return response.json()['Score']
+        response = self.transport.get(API_URL, params = { 'text':text }, auth=self.auth)
+        return self._json(response, 'sentiment')['Score']
 
-    def get_sentiment_batch(self, text_blocks):
+    @instrumented
+    @coalesced
+    @cached
+    def get_sentiment_batch(self, text_blocks, max_workers=4):
         '''
-        text_blocks ([{"Text":'string' Id:0},...])
+        text_blocks ([{"Text":'string', "Id":'string'},...] or ['string',...]): any number of documents.
+        max_workers (int, optional): how many batch requests to send at once.
         '''
-        data = { "Inputs" : text_blocks }
-        API_URL = Uris.get_sentiment_batch
-        response = requests.post(API_URL, json=data, auth=self.auth)
-        return response.json()['SentimentBatch']
+        return self._batch(ANALYSES['sentiment'], text_blocks, max_workers)
 
+    @instrumented
+    @coalesced
+    @cached
+    @deduplicated('key_phrases')
     def get_key_phrases(self, text):
         '''
         text (str)
         '''
         API_URL = Uris.get_key_phrases
-        response = requests.get(API_URL, params = { 'text':text }, auth=self.auth)
-        return response.json()['KeyPhrases']
+        response = self.transport.get(API_URL, params = { 'text':text }, auth=self.auth)
+        return self._json(response, 'key phrases')['KeyPhrases']
 
-    def get_key_phrases_batch(self, text_blocks):
+    @instrumented
+    @coalesced
+    @cached
+    def get_key_phrases_batch(self, text_blocks, max_workers=4):
         '''
-        text_blocks ([{"Text":'string' Id:0},...])
+        text_blocks ([{"Text":'string', "Id":'string'},...] or ['string',...]): any number of documents.
+        max_workers (int, optional): how many batch requests to send at once.
         '''
-        data = { "Inputs" : text_blocks }
-        API_URL = Uris.get_key_phrases_batch
-        response = requests.post(API_URL, json=data, auth=self.auth)
-        return response.json()['KeyPhrasesBatch']
+        return self._batch(ANALYSES['key_phrases'], text_blocks, max_workers)
 
+    @instrumented
+    @coalesced
+    @cached
+    @deduplicated('language')
     def get_language(self, text, number_of_languages_to_detect=1):
         '''
         text (str)
         '''
         API_URL = Uris.get_language
         params = { 'text':text, 'NumberOfLanguagesToDetect':number_of_languages_to_detect }
-        response = requests.get(API_URL, params = params, auth=self.auth)
-        return response.json()['DetectedLanguages']
+        response = self.transport.get(API_URL, params = params, auth=self.auth)
+        return self._json(response, 'language')['DetectedLanguages']
+
+    @instrumented
+    @coalesced
+    @cached
+    def get_language_batch(self, text_blocks, max_workers=4):
+        '''
+        text_blocks ([{"Text":'string', "Id":'string'},...] or ['string',...]): any number of documents.
+        max_workers (int, optional): how many batch requests to send at once.
+        '''
+        return self._batch(ANALYSES['language'], text_blocks, max_workers)
+
+    @instrumented
+    @coalesced
+    def analyze(self, text_blocks, sentiment=True, key_phrases=True, language=True, max_workers=4):
+        '''
+        Several analyses of the same documents at once.  The documents are encoded once, and the 
+        batches are sent to each analysis's endpoint concurrently, so the call takes about as long
+        as the slowest analysis.
+
+        Args:
+            text_blocks ([{"Text":'string', "Id":'string'},...] or ['string',...]): any number of documents.
+            sentiment (bool, optional), key_phrases (bool, optional), language (bool, optional):
+                the analyses to run.
+            max_workers (int, optional): how many batch requests to send at once.
+
+        Returns:
+            list of DocumentAnalysis(id, sentiment, key_phrases, language), in the order of the documents.
+        '''
+        analyses = _requested(sentiment, key_phrases, language)
+        documents = list(with_ids(text_blocks))
+        results = dict((analysis.name, []) for analysis in analyses)
+        if self.dedup is not None:
+            # each analysis knows the results of different texts, so sends its own documents
+            for outcome in bounded_map(lambda analysis: self._batch(analysis, documents, max_workers), analyses, len(analyses)):
+                if outcome.error is not None:
+                    raise outcome.error
+                results[outcome.argument.name] = outcome.result
+            return _merged(documents, results)
+
+        sends = [(analysis, batch) for batch in plan_batches(documents, codec=self.codec) for analysis in analyses]
+        for outcome in bounded_map(lambda send: self._send_batch(*send), sends, max_workers):
+            if outcome.error is not None:
+                raise outcome.error
+            results[outcome.argument[0].name].extend(outcome.result)
+        return _merged(documents, results)
+
+    def iter_sentiment(self, text_blocks, max_workers=4, ordered=True, max_in_flight=None, batch_size=MAX_BATCH_DOCUMENTS):
+        '''
+        The sentiment of each of a stream of documents, e.g. the lines of a file.  text_blocks is
+        consumed lazily and sent in batches, max_workers at a time; at most max_in_flight batches
+        (by default twice max_workers) are read ahead of the results taken, so memory use does not
+        grow with the number of documents.  A failed batch is reported in its documents' results
+        and does not stop the others.  Given Ids need only be unique among each batch_size documents.
+
+        Args:
+            text_blocks (iterable of {"Text":'string', "Id":'string'} or 'string')
+            max_workers (int, optional): how many batch requests to send at once.
+            ordered (bool, optional): if True, results are yielded in input order, otherwise
+                a batch at a time as they complete.
+            max_in_flight (int, optional): the most batches sent and not yet yielded.
+            batch_size (int, optional): the most documents per batch request.
+
+        Returns:
+            generator of StreamResult(index, document, result, error), where result is the score.
+        '''
+        return self._iter(ANALYSES['sentiment'], text_blocks, max_workers, ordered, max_in_flight, batch_size)
+
+    def iter_key_phrases(self, text_blocks, max_workers=4, ordered=True, max_in_flight=None, batch_size=MAX_BATCH_DOCUMENTS):
+        '''
+        Same as iter_sentiment, for the key phrases of each document.
+        '''
+        return self._iter(ANALYSES['key_phrases'], text_blocks, max_workers, ordered, max_in_flight, batch_size)
 
-    def get_language_batch(self, text_blocks):
+    def iter_language(self, text_blocks, max_workers=4, ordered=True, max_in_flight=None, batch_size=MAX_BATCH_DOCUMENTS):
         '''
-        text_blocks ([{"Text":'string' Id:0},...])
+        Same as iter_sentiment, for the detected languages of each document.
         '''
-        data = { "Inputs" : text_blocks }
-        API_URL = Uris.get_language_batch
-        response = requests.post(API_URL, json=data, auth=self.auth)
-        print(response.json())
-        return response.json()['LanguageBatch']
+        return self._iter(ANALYSES['language'], text_blocks, max_workers, ordered, max_in_flight, batch_size)
+
+    @instrumented
+    def _batch(self, analysis, text_blocks, max_workers):
+        # documents without an Id are numbered, and the results are returned in the order of the
+        # documents.  With a dedup ResultCache, only texts without a known result are sent
+        documents = list(with_ids(text_blocks))
+        if self.dedup is None:
+            return self._send_documents(analysis, documents, max_workers)
+        batch = self.dedup.batch(analysis, documents)
+        return batch.results(self._send_documents(analysis, batch.unique, max_workers))
+
+    def _send_documents(self, analysis, documents, max_workers):
+        # as many requests as the service's batch limits require
+        batches = list(plan_batches(documents, codec=self.codec))
+        # the service does not answer in the order of the documents, whatever the number of batches
+        if len(batches) <= 1:
+            results = [result for batch in batches for result in self._send_batch(analysis, batch)]
+        else:
+            results = []
+            for outcome in bounded_map(lambda batch: self._send_batch(analysis, batch), batches, max_workers):
+                if outcome.error is not None:
+                    raise outcome.error
+                results.extend(outcome.result)
+        return in_input_order(results, documents)
+
+    def _send_batch(self, analysis, batch):
+        response = self.transport.post(analysis.batch_uri, batch.payload, headers={ 'Content-Type' : 'application/json' }, auth=self.auth)
+        return self._json(response, analysis.description)[analysis.batch_key]
+
+    def _iter(self, analysis, text_blocks, max_workers, ordered, max_in_flight, batch_size):
+        def send(planned_batch):
+            return self._stream_batch(analysis, planned_batch[1])
+
+        planned = _planned(text_blocks, batch_size, self.codec)
+        for outcome in bounded_map(send, planned, max_workers, ordered, max_in_flight):
+            start, batch = outcome.argument
+            for result in _stream_results(analysis, start, batch, outcome.result, outcome.error):
+                yield result
+
+    @instrumented
+    def _stream_batch(self, analysis, batch):
+        # one batch of an iter_ call, reported as a call of its own
+        if self.dedup is None:
+            return self._send_batch(analysis, batch)
+        deduplicated = self.dedup.batch(analysis, batch.documents)
+        return deduplicated.results(self._send_documents(analysis, deduplicated.unique, 1))
+
+    def _json(self, response, analysis):
+        if response.status_code != 200:
+            raise error_for(response, "Error {0}: Failed to get {1}, \n reason {2}->{3}".format(
+                response.status_code, analysis, response.reason, response.content))
+        return decode(self.codec, response)
+
+def _planned(text_blocks, batch_size, codec):
+    # the batches of an iter_ call, each with the input index of its first document.  Results are
+    # matched to documents a batch at a time, so Ids are numbered batch_size documents at a time
+    # rather than holding the whole stream
+    text_blocks = iter(text_blocks)
+    start = 0
+    while True:
+        blocks = list(islice(text_blocks, batch_size))
+        if not blocks:
+            return
+        for batch in plan_batches(with_ids(blocks, start), batch_size, codec=codec):
+            yield start, batch
+            start += len(batch.documents)
+
+def _stream_results(analysis, start, batch, results, error):
+    # a StreamResult for each document of a batch of an iter_ call
+    if error is not None:
+        for index, document in enumerate(batch.documents, start):
+            yield StreamResult(index, document, None, error)
+        return
+    found = dict((str(result.get('Id')), result) for result in results)
+    for index, document in enumerate(batch.documents, start):
+        result = found.get(str(document['Id']))
+        if result is None:
+            missing = CortanaAnalyticsError('The service returned no {0} for document {1}'.format(analysis.description, document['Id']))
+            yield StreamResult(index, document, None, missing)
+        else:
+            yield StreamResult(index, document, result[analysis.field], None)
+
+def _requested(sentiment, key_phrases, language):
+    analyses = [ANALYSES[name] for name, wanted in (('sentiment', sentiment), ('key_phrases', key_phrases), ('language', language)) if wanted]
+    if not analyses:
+        raise ValueError('No analysis was requested')
+    return analyses
+
+def _merged(documents, results):
+    # one DocumentAnalysis per document from the batch results of each analysis, found by Id
+    values = {}
+    for name, analysis_results in results.items():
+        field = ANALYSES[name].field
+        values[name] = dict((str(result.get('Id')), result[field]) for result in analysis_results)
+    merged = []
+    for document in documents:
+        key = str(document['Id'])
+        merged.append(DocumentAnalysis(document['Id'], *(values[name].get(key) if name in values else None for name in DocumentAnalysis._fields[1:])))
+    return merged
 
 class Uris:
     root = 'https://api.datamarket.azure.com/data.ashx/amla/text-analytics/v1/'
@@ -73,4 +290,11 @@ class Uris:
     get_key_phrases = root + 'GetKeyPhrases'
     get_key_phrases_batch = root + 'GetKeyPhrasesBatch'
     get_language = root + 'GetLanguage'
-    get_language_batch = root + 'GetLanguageBatch'
\ No newline at end of file
+    get_language_batch = root + 'GetLanguageBatch'
+
+ANALYSES = {
+    'sentiment' : Analysis('sentiment', 'sentiment', Uris.get_sentiment_batch, 'SentimentBatch', 'Score', ()),
+    'key_phrases' : Analysis('key_phrases', 'key phrases', Uris.get_key_phrases_batch, 'KeyPhrasesBatch', 'KeyPhrases', ()),
+    # a batch detects one language per document
+    'language' : Analysis('language', 'language', Uris.get_language_batch, 'LanguageBatch', 'DetectedLanguages', (1,)),
+}
\ No newline at end of file
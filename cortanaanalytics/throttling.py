@@ -0,0 +1,151 @@
+﻿#-------------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation 
+# All rights reserved. 
+# 
+# Distributed under the terms of the MIT License
+#-------------------------------------------------------------------------
+'''
+Client side rate limiting and retries of throttled requests.  A TokenBucket sized to the
+subscription quota can be shared by every transport (and thread) using that subscription:
+
+    bucket = TokenBucket(rate=20, capacity=20)
+    transport = Transport(rate_limiter=bucket, retry_policy=RetryPolicy(max_retries=5))
+'''
+from .exceptions import THROTTLING_STATUSES, parse_retry_after
+from threading import Lock
+from time import monotonic, sleep
+import random
+
+class TokenBucket:
+    '''
+    A thread-safe token bucket.  Tokens accrue at rate per second up to capacity, and each request
+    takes one.  Requests reserve their token in turn, so waiting callers are served first come,
+    first served and together run at exactly the rate once the bucket is empty.
+    '''
+
+    def __init__(self, rate, capacity=None, clock=monotonic):
+        '''
+        rate (float): tokens added per second, e.g. the subscription's requests per second.
+        capacity (float, optional): the most tokens which can be saved up for a burst, by default rate.
+        clock (callable, optional): returns the current time in seconds.
+        '''
+        if rate <= 0:
+            raise ValueError('rate must be positive')
+        self.rate = float(rate)
+        self.capacity = float(capacity if capacity is not None else rate)
+        self._clock = clock
+        self._lock = Lock()
+        self._tokens = self.capacity
+        self._updated = clock()
+
+    def reserve(self, tokens=1):
+        '''
+        Takes tokens, going into debt if there are not enough.
+
+        Returns:
+            float: seconds the caller must wait before using them.
+        '''
+        with self._lock:
+            now = self._clock()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= tokens
+            return max(0.0, -self._tokens / self.rate)
+
+    def acquire(self, tokens=1):
+        '''
+        Blocks until tokens are available and takes them.
+        '''
+        delay = self.reserve(tokens)
+        if delay > 0:
+            sleep(delay)
+
+    def pause(self, seconds):
+        '''
+        Makes every caller wait at least seconds before its next token, e.g. when the service
+        answered 429 with a Retry-After.
+        '''
+        with self._lock:
+            now = self._clock()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens = min(self._tokens, -seconds * self.rate)
+
+    @property
+    def available(self):
+        '''
+        The tokens which could be taken now without waiting (negative while in debt).
+        '''
+        with self._lock:
+            return min(self.capacity, self._tokens + (self._clock() - self._updated) * self.rate)
+
+class RetryPolicy:
+    '''
+    When and after how long a request is sent again.  Throttled requests (429 and 503 by default)
+    are retried after the Retry-After the service sent, or else after an exponentially growing,
+    jittered delay.  Connection failures are retried for idempotent methods only.
+    '''
+
+    IDEMPOTENT_METHODS = frozenset(['GET', 'HEAD', 'PUT', 'DELETE', 'OPTIONS'])
+
+    def __init__(self, max_retries=3, backoff=0.5, max_backoff=30, jitter=0.5, statuses=THROTTLING_STATUSES, max_retry_after=120):
+        '''
+        max_retries (int, optional): retries after the first attempt, 0 never retries.
+        backoff (float, optional): seconds before the first retry, doubled for each retry after it.
+        max_backoff (float, optional): the longest delay without a Retry-After.
+        jitter (float, optional): the fraction of each backoff delay which is randomized.
+        statuses (sequence of int, optional): response statuses which are retried.
+        max_retry_after (float, optional): 
+            a Retry-After longer than this is not waited for; the response is returned instead.
+        '''
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.jitter = jitter
+        self.statuses = frozenset(statuses)
+        self.max_retry_after = max_retry_after
+
+    def retry_after_response(self, attempt, response):
+        '''
+        Returns:
+            float: seconds to wait before sending the request again, or None not to retry it.
+        '''
+        if attempt >= self.max_retries or response.status_code not in self.statuses:
+            return None
+        headers = getattr(response, 'headers', None) or {}
+        retry_after = parse_retry_after(headers.get('Retry-After'))
+        if retry_after is None:
+            return self.backoff_delay(attempt)
+        if retry_after > self.max_retry_after:
+            return None
+        return retry_after
+
+    def retry_after_error(self, attempt, method):
+        '''
+        Returns:
+            float: seconds to wait before sending the request again after it failed to connect, 
+                or None not to retry it.
+        '''
+        if attempt >= self.max_retries or method.upper() not in self.IDEMPOTENT_METHODS:
+            return None
+        return self.backoff_delay(attempt)
+
+    def backoff_delay(self, attempt):
+        delay = min(self.max_backoff, self.backoff * (2 ** attempt))
+        return delay * (1 - self.jitter) + random.uniform(0, delay * self.jitter)
+
+NO_RETRIES = RetryPolicy(max_retries=0)
+
+def rewind(data):
+    '''
+    Prepares a request body to be sent again.
+
+    Returns:
+        bool: False if the body is a stream which cannot be sent again.
+    '''
+    if data is None or isinstance(data, (bytes, str, dict, list, tuple)):
+        return True
+    if hasattr(data, 'rewind'):
+        data.rewind()
+        return True
+    return False
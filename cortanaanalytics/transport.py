@@ -0,0 +1,153 @@
+﻿#-------------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation 
+# All rights reserved. 
+# 
+# Distributed under the terms of the MIT License
+#-------------------------------------------------------------------------
+from .instrumentation import current_call, request_length
+from .throttling import RetryPolicy, rewind
+import requests
+from requests.adapters import HTTPAdapter
+from threading import Lock
+from time import perf_counter, sleep
+
+class Transport:
+    '''
+    A pooled, keep-alive HTTP transport.  A single Transport can be shared by any number of
+    Recommendations, TextAnalytics and AnomalyDetection clients, and across threads, so that
+    connections to the Data Market are reused instead of paying a TCP+TLS handshake per call.
+    '''
+
+    def __init__(self, pool_connections=10, pool_maxsize=10, pool_block=False, instrumentation=None, rate_limiter=None, retry_policy=None):
+        '''
+        pool_connections (int, optional): number of per-host connection pools to keep.
+        pool_maxsize (int, optional): number of keep-alive connections to keep for each host.
+        pool_block (bool, optional): 
+            If True, never open more than pool_maxsize connections to one host; callers wait
+            for a free connection instead.
+        instrumentation (Instrumentation, optional): reports each client call made through this transport.
+        rate_limiter (TokenBucket, optional): 
+            every request takes a token first. Share one bucket between all transports using a subscription.
+        retry_policy (RetryPolicy, optional): 
+            when throttled or failed requests are retried, by default RetryPolicy(). Use NO_RETRIES not to retry.
+        '''
+        self.pool_connections = pool_connections
+        self.pool_maxsize = pool_maxsize
+        self.pool_block = pool_block
+        self.instrumentation = instrumentation
+        self.rate_limiter = rate_limiter
+        self.retry_policy = retry_policy if retry_policy is not None else RetryPolicy()
+        self._lock = Lock()
+        self._session = None
+
+    @property
+    def session(self):
+        '''
+        The underlying requests.Session, created on first use.
+        '''
+        if self._session is None:
+            with self._lock:
+                if self._session is None:
+                    adapter = HTTPAdapter(
+                        pool_connections=self.pool_connections, 
+                        pool_maxsize=self.pool_maxsize, 
+                        pool_block=self.pool_block)
+                    session = requests.Session()
+                    session.mount('https://', adapter)
+                    session.mount('http://', adapter)
+                    self._session = session
+        return self._session
+
+    def request(self, method, url, **kwargs):
+        '''
+        Sends a request on a pooled connection. Takes the same arguments as requests.request.
+        Throttled requests are retried as the retry policy allows; the last response is returned.
+        '''
+        call = current_call() if self.instrumentation is not None else None
+        attempt = 0
+        while True:
+            if self.rate_limiter is not None:
+                self.rate_limiter.acquire()
+            try:
+                if call is None:
+                    response = self.session.request(method, url, **kwargs)
+                else:
+                    response = self._measured_request(call, method, url, kwargs)
+            except (requests.ConnectionError, requests.Timeout):
+                delay = self.retry_policy.retry_after_error(attempt, method)
+                if delay is None or not rewind(kwargs.get('data')):
+                    raise
+            else:
+                delay = self.retry_policy.retry_after_response(attempt, response)
+                if delay is None or not rewind(kwargs.get('data')):
+                    return response
+                response.close()
+                if self.rate_limiter is not None and response.status_code == 429:
+                    # hold back every user of the bucket, not just this request
+                    self.rate_limiter.pause(delay)
+                    delay = 0
+            if call is not None:
+                call.add_retry()
+            sleep(delay)
+            attempt += 1
+
+    def _measured_request(self, call, method, url, kwargs):
+        # stream so that the headers (time to first byte) and the body are timed separately
+        stream = kwargs.get('stream', False)
+        kwargs = dict(kwargs, stream=True)
+        start = perf_counter()
+        response = self.session.request(method, url, **kwargs)
+        first_byte = perf_counter()
+        # urllib3 hands out pooled connections; mark each one the first time it is used
+        connection = getattr(response.raw, 'connection', None)
+        reused = None
+        if connection is not None:
+            reused = getattr(connection, '_cortanaanalytics_used', False)
+            connection._cortanaanalytics_used = True
+        response_bytes = 0 if stream else len(response.content)
+        retries = getattr(response.raw, 'retries', None)
+        call.add_request(
+            url, 
+            response.status_code, 
+            request_length(response.request.body, response.request.headers), 
+            response_bytes, 
+            first_byte - start, 
+            perf_counter() - first_byte, 
+            reused, 
+            len(retries.history) if retries is not None else 0)
+        return response
+
+    def get(self, url, **kwargs):
+        return self.request('GET', url, **kwargs)
+
+    def post(self, url, data=None, **kwargs):
+        return self.request('POST', url, data=data, **kwargs)
+
+    def put(self, url, data=None, **kwargs):
+        return self.request('PUT', url, data=data, **kwargs)
+
+    def warm_up(self, *urls):
+        '''
+        Opens a connection to the host of each url so the first real call does not pay for 
+        the handshake. Failures are ignored; the call that needs the connection will report them.
+        '''
+        for url in urls:
+            try:
+                self.session.request('HEAD', url).close()
+            except requests.RequestException:
+                pass
+
+    def close(self):
+        '''
+        Closes all pooled connections.
+        '''
+        with self._lock:
+            if self._session is not None:
+                self._session.close()
+                self._session = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
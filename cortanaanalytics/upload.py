@@ -0,0 +1,163 @@
+﻿#-------------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation 
+# All rights reserved. 
+# 
+# Distributed under the terms of the MIT License
+#-------------------------------------------------------------------------
+import os
+from uuid import uuid4
+
+CHUNK_SIZE = 64 * 1024
+
+class MultipartFileStream:
+    '''
+    A multipart/form-data body holding one file.  The file is read in binary chunks while the 
+    body is sent, so memory use does not depend on the size of the file.
+
+    Pass it as the data of a request together with its headers:
+        with MultipartFileStream(path) as body:
+            transport.post(url, body, headers=body.headers)
+    '''
+
+    def __init__(self, file_path, file_name=None, offset=0, length=None, chunk_size=CHUNK_SIZE, progress_callback=None):
+        '''
+        file_path (str): the file to send.
+        file_name (str, optional): the form field and file name. Defaults to the base name of file_path.
+        offset (int, optional): where in the file to start reading.
+        length (int, optional): how many bytes of the file to send. Defaults to the rest of the file.
+        chunk_size (int, optional): how many bytes to read from the file at a time.
+        progress_callback (callable, optional): 
+            called as progress_callback(bytes_sent, total_bytes) after each chunk of the body is read.
+        '''
+        if file_name is None:
+            file_name = os.path.basename(file_path)
+        if length is None:
+            length = os.path.getsize(file_path) - offset
+
+        boundary = uuid4().hex
+        self.file_path = file_path
+        self.file_name = file_name
+        self.offset = offset
+        self.file_length = length
+        self.chunk_size = chunk_size
+        self.progress_callback = progress_callback
+        self.content_type = 'multipart/form-data; boundary={}'.format(boundary)
+        self._header = '--{0}\r\nContent-Disposition: form-data; name="{1}"; filename="{1}"\r\n\r\n'.format(boundary, file_name).encode('utf-8')
+        self._footer = '\r\n--{0}--\r\n'.format(boundary).encode('utf-8')
+        self._file = None
+        self.rewind()
+
+    @property
+    def headers(self):
+        return { 'Content-Type' : self.content_type, 'Content-Length' : str(len(self)) }
+
+    def __len__(self):
+        return len(self._header) + self.file_length + len(self._footer)
+
+    def rewind(self):
+        '''
+        Starts the body again from the beginning, e.g. to resend it.
+        '''
+        self.close()
+        self._chunks = self._generate()
+        self._buffer = b''
+        self.bytes_sent = 0
+
+    def _generate(self):
+        yield self._header
+        self._file = open(self.file_path, 'rb')
+        self._file.seek(self.offset)
+        remaining = self.file_length
+        while remaining > 0:
+            chunk = self._file.read(min(self.chunk_size, remaining))
+            if not chunk:
+                raise IOError('{} is shorter than expected'.format(self.file_path))
+            remaining -= len(chunk)
+            yield chunk
+        self._file.close()
+        yield self._footer
+
+    def read(self, size=-1):
+        '''
+        Returns up to size bytes of the body, or the rest of the body if size is negative.
+        '''
+        parts = [self._buffer]
+        available = len(self._buffer)
+        while size < 0 or available < size:
+            chunk = next(self._chunks, None)
+            if chunk is None:
+                break
+            parts.append(chunk)
+            available += len(chunk)
+        data = b''.join(parts)
+        if size >= 0:
+            data, self._buffer = data[:size], data[size:]
+        else:
+            self._buffer = b''
+
+        if data:
+            self.bytes_sent += len(data)
+            if self.progress_callback is not None:
+                self.progress_callback(self.bytes_sent, len(self))
+        return data
+
+    def __iter__(self):
+        while True:
+            data = self.read(self.chunk_size)
+            if not data:
+                return
+            yield data
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+def plan_shards(file_path, max_shard_bytes):
+    '''
+    Splits a file on line boundaries into shards of at most max_shard_bytes bytes.
+    Only the bytes around each split point are read, so planning is cheap for any file size.
+
+    Returns:
+        list of (offset, length) tuples covering the whole file.
+    '''
+    size = os.path.getsize(file_path)
+    shards = []
+    offset = 0
+    with open(file_path, 'rb') as file:
+        while offset < size:
+            end = offset + max_shard_bytes
+            if end >= size:
+                shards.append((offset, size - offset))
+                break
+            split = _find_last_line_end(file, offset, end)
+            if split is None:
+                raise ValueError('{} has a line at offset {} longer than {} bytes'.format(file_path, offset, max_shard_bytes))
+            shards.append((offset, split - offset))
+            offset = split
+    return shards
+
+def _find_last_line_end(file, start, end):
+    # returns the position just after the last newline in file[start:end], or None
+    position = end
+    while position > start:
+        block_start = max(start, position - CHUNK_SIZE)
+        file.seek(block_start)
+        index = file.read(position - block_start).rfind(b'\n')
+        if index >= 0:
+            return block_start + index + 1
+        position = block_start
+    return None
+
+def shard_file_name(file_name, index):
+    '''
+    The name a shard is uploaded under, e.g. usage.txt -> usage.part3.txt
+    '''
+    root, ext = os.path.splitext(file_name)
+    return '{}.part{}{}'.format(root, index + 1, ext)
@@ -47,5 +47,10 @@ setup(
     install_requires=[
         'requests',
     ],
+    extras_require={
+        'async': ['aiohttp'],
+        'speedups': ['lxml', 'orjson'],
+        'local': ['numpy'],
+    },
     zip_safe = False,
 )
@@ -0,0 +1,90 @@
+﻿#-------------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation 
+# All rights reserved. 
+# 
+# Distributed under the terms of the MIT License
+#-------------------------------------------------------------------------
+'''
+A fake Text Analytics service shared by the tests.  httpretty is not thread safe, and the batch
+requests of these tests are sent from several threads, so the fake is a transport.
+'''
+import asyncio
+import json
+from threading import Lock
+from time import sleep
+from cortanaanalytics.textanalytics import Uris
+from cortanaanalytics.aio import Response
+
+def score(text):
+    return len(text) / 100.0
+
+class FakeTransport:
+    '''
+    Scores each text by its length, takes its words as key phrases and English as its language.
+    Batches are answered in reverse order, as the service does not keep the order of the documents.
+
+    status (int, optional): the status of every batch response.
+    fail (optional): texts whose batch is answered with 400 Bad Request.
+    skip (optional): texts the service has no result for.
+    delay (float, optional): seconds each batch takes.
+    '''
+    def __init__(self, status=200, fail=(), skip=(), delay=0):
+        self.lock = Lock()
+        self.status = status
+        self.fail = set(fail)
+        self.skip = set(skip)
+        self.delay = delay
+        # an Event each batch waits for, if set
+        self.release = None
+        # (url, data) of each batch, the documents of each batch and every text sent
+        self.requests = []
+        self.batches = []
+        self.sent = []
+
+    def get(self, url, params=None, **kwargs):
+        with self.lock:
+            self.sent.append(params['text'])
+        if url == Uris.get_language:
+            body = { 'DetectedLanguages' : [{ 'Name' : 'English' }] * params['NumberOfLanguagesToDetect'] }
+        elif url == Uris.get_key_phrases:
+            body = { 'KeyPhrases' : params['text'].split() }
+        else:
+            body = { 'Score' : score(params['text']) }
+        return Response(200, 'OK', json.dumps(body).encode('utf-8'))
+
+    def post(self, url, data=None, **kwargs):
+        if self.release is not None:
+            self.release.wait(5)
+        sleep(self.delay)
+        return self.answer(url, data)
+
+    def answer(self, url, data):
+        documents = json.loads(data.decode('utf-8'))['Inputs']
+        with self.lock:
+            self.requests.append((url, data))
+            self.batches.append(documents)
+            self.sent.extend(d['Text'] for d in documents)
+        if self.status != 200 or any(d['Text'] in self.fail for d in documents):
+            return Response(self.status if self.status != 200 else 400, 'Bad Request', b'{"message":"invalid"}')
+
+        documents = [d for d in reversed(documents) if d['Text'] not in self.skip]
+        if url == Uris.get_key_phrases_batch:
+            body = { 'KeyPhrasesBatch' : [{ 'KeyPhrases' : d['Text'].split(), 'Id' : d['Id'] } for d in documents] }
+        elif url == Uris.get_language_batch:
+            body = { 'LanguageBatch' : [{ 'DetectedLanguages' : [{ 'Name' : 'English' }], 'Id' : d['Id'] } for d in documents] }
+        else:
+            body = { 'SentimentBatch' : [{ 'Score' : score(d['Text']), 'Id' : d['Id'] } for d in documents] }
+        return Response(200, 'OK', json.dumps(dict(body, Errors=[])).encode('utf-8'))
+
+    def __call__(self, request, uri, headers):
+        # as an httpretty callback
+        response = self.answer(uri, request.body)
+        return response.status_code, headers, response.content.decode('utf-8')
+
+class AsyncFakeTransport(FakeTransport):
+    '''
+    FakeTransport for AsyncTextAnalytics.
+    '''
+    async def post(self, url, data=None, **kwargs):
+        await asyncio.sleep(self.delay)
+        return self.answer(url, data)
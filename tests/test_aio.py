@@ -0,0 +1,233 @@
+﻿#-------------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation 
+# All rights reserved. 
+# 
+# Distributed under the terms of the MIT License
+#-------------------------------------------------------------------------
+import unittest
+import asyncio
+from cortanaanalytics import aio
+from cortanaanalytics.aio import AsyncRecommendations, AsyncTextAnalytics, AsyncAnomalyDetection, AsyncTransport, Response
+from cortanaanalytics.cache import DiskCache, TTLCache
+from cortanaanalytics.textanalytics import Uris as TextAnalyticsUris
+from cortanaanalytics.upload import plan_shards
+from datetime import datetime
+import os
+import re
+import shutil
+import tempfile
+import threading
+from test_recommendations import TestData as RecommendationsTestData
+from test_anomalydetection import TestData as AnomalyDetectionTestData
+
+class FakeTransport:
+    '''
+    Serves canned bodies by url prefix instead of going to the network.
+    '''
+    def __init__(self, responses):
+        self.responses = responses
+        self.requests = []
+
+    async def request(self, method, url, **kwargs):
+        self.requests.append((method, url, kwargs))
+        await asyncio.sleep(0)
+        for prefix, body in self.responses.items():
+            if url.startswith(prefix):
+                return Response(200, 'OK', body.encode('utf-8'))
+        return Response(404, 'Not Found', b'')
+
+    async def get(self, url, **kwargs):
+        return await self.request('GET', url, **kwargs)
+
+    async def post(self, url, data=None, **kwargs):
+        return await self.request('POST', url, data=data, **kwargs)
+
+    async def put(self, url, data=None, **kwargs):
+        return await self.request('PUT', url, data=data, **kwargs)
+
+    async def close(self):
+        pass
+
+class AsyncClientTests(unittest.TestCase):
+    
+    def setUp(self):
+        self.email = 'email@outlook.com'
+        self.key = '1abCdEFGh/ijKlmN/opq234r56st/UvWXYZabCD7EF8='
+        self.loop = asyncio.new_event_loop()
+        return super().setUp()
+
+    def tearDown(self):
+        self.loop.close()
+        return super().tearDown()
+
+    def test_create_model(self):
+        transport = FakeTransport({ 'https://api.datamarket.azure.com/amla/recommendations/v2/CreateModel' : RecommendationsTestData.create_model_returns })
+        rs = AsyncRecommendations(self.email, self.key, transport)
+
+        model_id = self.loop.run_until_complete(rs.create_model('testtest1'))
+        self.assertEqual(model_id, 'd5c7273b-2228-4cf4-99b1-9966e28b143a')
+
+    def test_build_model(self):
+        transport = FakeTransport({ 'https://api.datamarket.azure.com/amla/recommendations/v2/BuildModel' : RecommendationsTestData.build_model_returns })
+        rs = AsyncRecommendations(self.email, self.key, transport)
+
+        build_id = self.loop.run_until_complete(rs.build_fbt_model('d5c7273b-2228-4cf4-99b1-9966e28b143a'))
+        self.assertEqual(build_id, '1514886')
+
+    def test_get_recommendation_cached(self):
+        transport = FakeTransport({ 'https://api.datamarket.azure.com/amla/recommendations/v2/ItemRecommend' : RecommendationsTestData.invoke_recommendations_single_1 })
+        rs = AsyncRecommendations(self.email, self.key, transport, cache=TTLCache())
+
+        # changing a result, whether it was fetched or cached, does not change the next one
+        for i in range(2):
+            columns = self.loop.run_until_complete(rs.get_recommendation('d5c7273b-2228-4cf4-99b1-9966e28b143a', ['a'], columnar=True))
+            self.assertEqual(columns.names, ['Restraint of Beasts'])
+            columns.names[0] = 'changed'
+        self.assertEqual(len(transport.requests), 1)
+
+    def test_disk_cache_off_loop(self):
+        class ThreadDiskCache(DiskCache):
+            # the threads each cache call is made from
+            threads = set()
+
+            def get(self, key, default=None):
+                self.threads.add(threading.get_ident())
+                return DiskCache.get(self, key, default)
+
+            def set(self, key, value):
+                self.threads.add(threading.get_ident())
+                DiskCache.set(self, key, value)
+
+            def evict(self, predicate):
+                self.threads.add(threading.get_ident())
+                DiskCache.evict(self, predicate)
+
+        directory = tempfile.mkdtemp()
+        try:
+            with ThreadDiskCache(os.path.join(directory, 'cache.sqlite')) as cache:
+                transport = FakeTransport({ 
+                    'https://api.datamarket.azure.com/amla/recommendations/v2/ItemRecommend' : RecommendationsTestData.invoke_recommendations_single_1,
+                    'https://api.datamarket.azure.com/amla/recommendations/v2/UpdateModel' : RecommendationsTestData.update_model_response,
+                    TextAnalyticsUris.get_sentiment : '{"Score":0.9}' })
+                rs = AsyncRecommendations(self.email, self.key, transport, cache=cache)
+                ta = AsyncTextAnalytics(self.key, transport, cache=cache)
+
+                async def run():
+                    for i in range(2):
+                        await rs.get_recommendation('d5c7273b-2228-4cf4-99b1-9966e28b143a', ['a'])
+                        await ta.get_sentiment('hello world')
+                    await rs.update_model('d5c7273b-2228-4cf4-99b1-9966e28b143a', None, '1514886')
+
+                self.loop.run_until_complete(run())
+                self.assertEqual(len(transport.requests), 3)
+                self.assertTrue(cache.threads)
+                self.assertNotIn(threading.get_ident(), cache.threads)
+        finally:
+            shutil.rmtree(directory)
+
+    def test_get_sentiment_many(self):
+        transport = FakeTransport({ TextAnalyticsUris.get_sentiment : '{"Score":0.9}' })
+        ta = AsyncTextAnalytics(self.key, transport)
+
+        async def run():
+            return await asyncio.gather(*[ta.get_sentiment('hello world') for i in range(100)])
+
+        scores = self.loop.run_until_complete(run())
+        self.assertEqual(scores, [0.9] * 100)
+
+    def test_score(self):
+        transport = FakeTransport({ 'https://api.datamarket.azure.com/data.ashx/aml_labs/anomalydetection/v1/Score' : AnomalyDetectionTestData.score_returns })
+        ad = AsyncAnomalyDetection(self.key, transport)
+
+        test_data = [
+                        (datetime(2014, 9, 21, 11, 5, 0), 3),
+                        (datetime(2014, 9, 21, 11, 10, 0), 9.09),
+                        (datetime(2014, 9, 21, 11, 15, 0), 0)
+                    ]
+        result = self.loop.run_until_complete(ad.score(test_data))
+        self.assertEqual(len(result), 3)
+        self.assertEqual(result[0].Time, datetime(2014,9,21,11,5))
+        self.assertEqual(result[1].Data, 9.09)
+
+    @unittest.skipIf(aio.aiohttp is None, 'aiohttp is not installed')
+    def test_max_concurrency(self):
+        in_flight = []
+        peak = []
+
+        class CountingTransport(AsyncTransport):
+            async def _send(self, method, url, kwargs):
+                in_flight.append(url)
+                peak.append(len(in_flight))
+                await asyncio.sleep(0.01)
+                in_flight.remove(url)
+                return Response(200, 'OK', b'{"Score":0.5}')
+
+        async def run():
+            ta = AsyncTextAnalytics(self.key, CountingTransport(max_concurrency=4))
+            return await asyncio.gather(*[ta.get_sentiment('text {}'.format(i)) for i in range(20)])
+
+        self.assertEqual(self.loop.run_until_complete(run()), [0.5] * 20)
+        self.assertEqual(max(peak), 4)
+
+    @unittest.skipIf(aio.aiohttp is None, 'aiohttp is not installed')
+    def test_cancel_releases_slot(self):
+        class SlowTransport(AsyncTransport):
+            async def _send(self, method, url, kwargs):
+                await asyncio.sleep(10)
+
+        async def run():
+            ta = AsyncTextAnalytics(self.key, SlowTransport(max_concurrency=1))
+            task = asyncio.ensure_future(ta.get_sentiment('text'))
+            await asyncio.sleep(0.01)
+            task.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await task
+            self.assertFalse(ta.transport._semaphore.locked())
+
+        self.loop.run_until_complete(run())
+
+    def test_get_recommendations_bulk(self):
+        class BulkTransport(FakeTransport):
+            async def request(self, method, url, **kwargs):
+                if 'itemIds=%27bad%27' in url:
+                    return Response(500, 'Internal Server Error', b'')
+                return await FakeTransport.request(self, method, url, **kwargs)
+
+        transport = BulkTransport({ 'https://api.datamarket.azure.com/amla/recommendations/v2/ItemRecommend' : RecommendationsTestData.invoke_recommendations_single_1 })
+        rs = AsyncRecommendations(self.email, self.key, transport)
+        item_lists = [['a'], ['bad'], ['b', 'c']]
+
+        async def run():
+            return [result async for result in rs.get_recommendations_bulk('d5c7273b-2228-4cf4-99b1-9966e28b143a', iter(item_lists), max_workers=2)]
+
+        results = self.loop.run_until_complete(run())
+        self.assertEqual([r.item_id_list for r in results], item_lists)
+        self.assertEqual([len(r.items) if r.items is not None else None for r in results], [1, None, 1])
+        self.assertIn('Error 500', str(results[1].error))
+        self.assertEqual(len(transport.requests), 2)
+
+    def test_import_usage_sharded(self):
+        usage_path = os.path.join(os.getcwd(), 'tests', 'resources', 'usage_small.txt')
+        attempts = {}
+
+        class ImportTransport(FakeTransport):
+            async def request(self, method, url, data=None, **kwargs):
+                # the body is an async iterable of chunks, read as aiohttp would
+                async for chunk in data:
+                    pass
+                file_name = re.search("filename=%27(.*?)%27", url).group(1)
+                attempts[file_name] = attempts.get(file_name, 0) + 1
+                if file_name == 'usage_small.part2.txt' and attempts[file_name] == 1:
+                    return Response(503, 'Service Unavailable', b'')
+                return Response(200, 'OK', RecommendationsTestData.import_file_usage_returns.encode('utf-8'))
+
+        rs = AsyncRecommendations(self.email, self.key, ImportTransport({}))
+        progress = []
+        report = self.loop.run_until_complete(rs.import_usage_sharded('d5c7273b-2228-4cf4-99b1-9966e28b143a', usage_path, 
+            max_shard_bytes=400, max_workers=3, progress_callback=lambda sent, total: progress.append(sent)))
+
+        shard_count = len(plan_shards(usage_path, 400))
+        self.assertEqual(sum(attempts.values()), shard_count + 1)
+        self.assertEqual(report.line_count, 38 * shard_count)
+        self.assertEqual(report.error_count, 5 * shard_count)
+        self.assertGreater(progress[-1], os.path.getsize(usage_path))
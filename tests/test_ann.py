@@ -0,0 +1,123 @@
+﻿#-------------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation 
+# All rights reserved. 
+# 
+# Distributed under the terms of the MIT License
+#-------------------------------------------------------------------------
+import unittest
+from cortanaanalytics.ann import IvfIndex
+from cortanaanalytics.factorization import FactorizationModel
+from cortanaanalytics.recommendations import BulkRecommendation, RecommendedItem
+import os
+import shutil
+import tempfile
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+@unittest.skipIf(np is None, 'numpy is not installed')
+class IvfIndexTests(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        # 400 items in 20 tight clusters
+        random = np.random.default_rng(1)
+        centers = random.normal(size=(20, 8))
+        self.vectors = centers[np.arange(400) % 20] + 0.05 * random.normal(size=(400, 8))
+        self.item_ids = ['item{}'.format(i) for i in range(400)]
+        self.index = IvfIndex(self.item_ids, self.vectors, number_of_lists=20, nprobe=2)
+        return super().setUp()
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+        return super().tearDown()
+
+    def exact(self, item_id_list, number_of_results):
+        normalized = self.vectors / np.linalg.norm(self.vectors, axis=1, keepdims=True)
+        seeds = [self.item_ids.index(item_id) for item_id in item_id_list]
+        scores = normalized @ normalized[seeds].mean(axis=0)
+        scores[seeds] = -np.inf
+        return [self.item_ids[i] for i in np.argsort(-scores)[:number_of_results]]
+
+    def test_related(self):
+        related = self.index.related('item0', 5)
+        self.assertEqual(len(related), 5)
+        # the same cluster: item20, item40, ...
+        self.assertTrue(all(int(item_id[4:]) % 20 == 0 for item_id, score in related))
+        self.assertTrue(all(a[1] >= b[1] for a, b in zip(related, related[1:])))
+        self.assertNotIn('item0', [item_id for item_id, score in related])
+        self.assertEqual(self.index.related('unknown'), [])
+
+    def test_all_lists_is_exact(self):
+        for seeds in (['item3'], ['item3', 'item7'], ['item11', 'item31', 'item395']):
+            items = self.index.get_recommendation(None, seeds, 10, nprobe=self.index.number_of_lists)
+            self.assertEqual([item.id for item in items], self.exact(seeds, 10))
+
+    def test_recall(self):
+        found = 0
+        for i in range(0, 400, 7):
+            seeds = [self.item_ids[i]]
+            items = self.index.get_recommendation(None, seeds, 10)
+            found += len(set(item.id for item in items) & set(self.exact(seeds, 10)))
+        self.assertGreater(found / (10 * len(range(0, 400, 7))), 0.9)
+
+    def test_get_recommendation(self):
+        items = self.index.get_recommendation('d5c7273b-2228-4cf4-99b1-9966e28b143a', ['item1', 'unknown'], 3)
+        self.assertEqual(len(items), 3)
+        self.assertIsInstance(items[0], RecommendedItem)
+        self.assertEqual(items[0].reasoning, 'Similar items')
+        self.assertNotIn('item1', [item.id for item in items])
+        self.assertEqual(self.index.get_recommendation(None, ['unknown']), [])
+
+    def test_get_recommendations_bulk(self):
+        lists = [['item1'], ['unknown'], ['item2', 'item22']]
+        results = list(self.index.get_recommendations_bulk(None, lists, 4))
+        self.assertEqual([result.index for result in results], [0, 1, 2])
+        self.assertIsInstance(results[0], BulkRecommendation)
+        self.assertEqual(results[1].items, [])
+        self.assertEqual(results[2].item_id_list, ['item2', 'item22'])
+        for result in results:
+            self.assertIsNone(result.error)
+            self.assertEqual([item.id for item in result.items], [item.id for item in self.index.get_recommendation(None, result.item_id_list, 4)])
+
+    def test_from_factorization(self):
+        usage_path = os.path.join(self.temp_dir, 'usage.txt')
+        with open(usage_path, 'w') as f:
+            for user in range(1, 5):
+                f.write('{0},a\n{0},b\n{0},c\n'.format(user))
+            for user in range(5, 9):
+                f.write('{0},x\n{0},y\n{0},z\n'.format(user))
+        model = FactorizationModel.train(usage_path, number_of_model_dimensions=4)
+        index = IvfIndex.from_factorization(model, number_of_lists=2)
+        self.assertEqual(len(index), 6)
+        for seeds in (['a'], ['x', 'y']):
+            items = index.get_recommendation(None, seeds, 5, nprobe=2)
+            expected = model.get_recommendation(None, seeds, 5)
+            self.assertEqual(len(items), len(expected))
+            self.assertEqual(items[0].reasoning, 'Similar usage')
+            # items used by the same users tie, so only compare the scores in order
+            for item, other in zip(items, expected):
+                self.assertAlmostEqual(item.rating, other.rating)
+
+    def test_save_load(self):
+        path = os.path.join(self.temp_dir, 'index.npz')
+        self.index.save(path)
+        loaded = IvfIndex.load(path)
+        self.assertEqual(loaded.item_ids, self.index.item_ids)
+        self.assertEqual(loaded.nprobe, 2)
+        self.assertEqual(loaded.number_of_lists, 20)
+        self.assertEqual(loaded.related('item5'), self.index.related('item5'))
+
+    def test_save_load_without_suffix(self):
+        path = os.path.join(self.temp_dir, 'index')
+        self.index.save(path)
+        self.assertEqual(os.listdir(self.temp_dir), ['index'])
+        self.assertEqual(IvfIndex.load(path).item_ids, self.index.item_ids)
+
+    def test_mismatched_vectors(self):
+        self.assertRaises(ValueError, IvfIndex, ['a', 'b'], np.ones((3, 2)))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,229 @@
+﻿#-------------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation 
+# All rights reserved. 
+# 
+# Distributed under the terms of the MIT License
+#-------------------------------------------------------------------------
+import unittest
+import asyncio
+import json
+import httpretty
+from itertools import islice
+from time import perf_counter
+from cortanaanalytics.batching import plan_batches, with_ids, in_input_order
+from cortanaanalytics.textanalytics import DocumentAnalysis, TextAnalytics, Uris
+from cortanaanalytics.dedup import ResultCache
+from cortanaanalytics.aio import AsyncTextAnalytics
+from cortanaanalytics.exceptions import CortanaAnalyticsError, ServiceError
+from fakes import AsyncFakeTransport, FakeTransport, score
+
+class PlanBatchesTests(unittest.TestCase):
+
+    def test_with_ids(self):
+        documents = list(with_ids(['a', { 'Text' : 'b' }, { 'Text' : 'c', 'Id' : 'x' }]))
+        self.assertEqual(documents, [{ 'Id' : '0', 'Text' : 'a' }, { 'Id' : '1', 'Text' : 'b' }, { 'Text' : 'c', 'Id' : 'x' }])
+
+    def test_with_ids_given(self):
+        documents = list(with_ids([{ 'Id' : '1', 'Text' : 'a' }, 'b', { 'Id' : 0, 'Text' : 'c' }, 'd', { 'Text' : 'e', 'Id' : '3-1' }]))
+        self.assertEqual([d['Id'] for d in documents], ['1', '1-1', 0, '3', '3-1'])
+        self.assertEqual(list(with_ids(['a', 'b'], start=5)), [{ 'Id' : '5', 'Text' : 'a' }, { 'Id' : '6', 'Text' : 'b' }])
+        self.assertEqual([d['Id'] for d in with_ids(['a', { 'Text' : 'b', 'Id' : '1' }, 'c', { 'Text' : 'd', 'Id' : '2-1' }, { 'Text' : 'e', 'Id' : '2' }])], ['0', '1', '2-2', '2-1', '2'])
+
+        self.assertRaises(ValueError, list, with_ids([{ 'Id' : '1', 'Text' : 'a' }, 'b', { 'Id' : 1, 'Text' : 'c' }]))
+
+    def test_document_limit(self):
+        documents = list(with_ids(['text'] * 25))
+        batches = list(plan_batches(documents, max_documents=10))
+        self.assertEqual([len(batch.documents) for batch in batches], [10, 10, 5])
+        self.assertEqual(json.loads(batches[2].payload.decode('utf-8')), { 'Inputs' : documents[20:] })
+
+    def test_byte_limit(self):
+        documents = list(with_ids(['x' * 90, 'y' * 90, 'z' * 90, 'é' * 10]))
+        batches = list(plan_batches(documents, max_bytes=250))
+        for batch in batches:
+            self.assertLessEqual(len(batch.payload), 250)
+            self.assertEqual(json.loads(batch.payload.decode('utf-8'))['Inputs'], batch.documents)
+        self.assertEqual([len(batch.documents) for batch in batches], [2, 2])
+
+        self.assertRaises(ValueError, list, plan_batches(list(with_ids(['x' * 300])), max_bytes=250))
+
+    def test_in_input_order(self):
+        documents = [{ 'Id' : 'b' }, { 'Id' : 1 }, { 'Id' : 'a' }]
+        results = [{ 'Id' : 'a' }, { 'Id' : 'b' }, { 'Id' : '1' }]
+        self.assertEqual(in_input_order(results, documents), [{ 'Id' : 'b' }, { 'Id' : '1' }, { 'Id' : 'a' }])
+
+class TextAnalyticsBatchTests(unittest.TestCase):
+
+    def setUp(self):
+        self.key = '1abCdEFGh/ijKlmN/opq234r56st/UvWXYZabCD7EF8='
+        self.texts = ['text {0}'.format('x' * (i % 50)) for i in range(2500)]
+        return super().setUp()
+
+    def test_large_input(self):
+        service = FakeTransport()
+        results = TextAnalytics(self.key, service).get_sentiment_batch(self.texts)
+
+        self.assertEqual(sorted(len(batch) for batch in service.batches), [500, 1000, 1000])
+        self.assertEqual([result['Id'] for result in results], [str(i) for i in range(2500)])
+        self.assertEqual([result['Score'] for result in results], [score(text) for text in self.texts])
+
+    @httpretty.activate
+    def test_small_input(self):
+        httpretty.register_uri(httpretty.POST, Uris.get_sentiment_batch, body=FakeTransport())
+
+        results = TextAnalytics(self.key).get_sentiment_batch(['hello', { 'Text' : 'hello world', 'Id' : 'x' }])
+        self.assertEqual(results, [{ 'Score' : 0.05, 'Id' : '0' }, { 'Score' : 0.11, 'Id' : 'x' }])
+        self.assertEqual(httpretty.last_request().headers['Content-Type'], 'application/json')
+
+    def test_given_ids(self):
+        results = TextAnalytics(self.key, FakeTransport()).get_sentiment_batch([{ 'Id' : '1', 'Text' : 'a' }, 'bbbbbbbbbb'])
+        self.assertEqual(results, [{ 'Score' : 0.01, 'Id' : '1' }, { 'Score' : 0.1, 'Id' : '1-1' }])
+        self.assertRaises(ValueError, TextAnalytics(self.key, FakeTransport()).get_sentiment_batch, [{ 'Id' : 'x', 'Text' : 'a' }, { 'Id' : 'x', 'Text' : 'b' }])
+
+    def test_async(self):
+        service = AsyncFakeTransport()
+        ta = AsyncTextAnalytics(self.key, service)
+        loop = asyncio.new_event_loop()
+        try:
+            results = loop.run_until_complete(ta.get_sentiment_batch(self.texts, max_workers=2))
+        finally:
+            loop.close()
+
+        self.assertEqual(len(service.batches), 3)
+        self.assertEqual([result['Score'] for result in results], [score(text) for text in self.texts])
+
+class IterTests(unittest.TestCase):
+
+    def setUp(self):
+        self.key = '1abCdEFGh/ijKlmN/opq234r56st/UvWXYZabCD7EF8='
+        self.service = FakeTransport(fail=['fail'], skip=['skip'])
+        self.ta = TextAnalytics(self.key, self.service)
+        return super().setUp()
+
+    def test_lazy(self):
+        read = []
+        def lines():
+            for i in range(100000):
+                read.append(i)
+                yield 'line {0}'.format(i)
+
+        results = self.ta.iter_sentiment(lines(), max_workers=2, max_in_flight=3, batch_size=10)
+        first = list(islice(results, 15))
+        self.assertEqual([result.index for result in first], list(range(15)))
+        self.assertEqual([result.result for result in first], [score('line {0}'.format(i)) for i in range(15)])
+        self.assertEqual(first[3].document, { 'Id' : '3', 'Text' : 'line 3' })
+        # three batches in flight, one more sent for each batch taken, and the document which ended the last
+        self.assertLessEqual(len(read), 10 * 5 + 1)
+        results.close()
+
+    def test_given_ids(self):
+        texts = [{ 'Id' : '1', 'Text' : 'a' }, 'bbbbbbbbbb', 'ccccc', { 'Id' : '2', 'Text' : 'dd' }]
+        results = list(self.ta.iter_sentiment(texts, batch_size=3))
+        self.assertEqual([result.document['Id'] for result in results], ['1', '1-1', '2', '2'])
+        self.assertEqual([result.result for result in results], [0.01, 0.1, 0.05, 0.02])
+
+    def test_unordered(self):
+        texts = ['text {0}'.format('x' * (i % 7)) for i in range(95)]
+        results = list(self.ta.iter_sentiment(texts, max_workers=4, ordered=False, batch_size=10))
+        self.assertEqual(sorted(result.index for result in results), list(range(95)))
+        for result in results:
+            self.assertEqual(result.result, score(texts[result.index]))
+            self.assertIsNone(result.error)
+
+    def test_errors(self):
+        texts = ['a', 'b', 'fail', 'c', { 'Text' : 'skip', 'Id' : 'x' }, 'e']
+        results = list(self.ta.iter_sentiment(texts, batch_size=2))
+        self.assertEqual([result.result for result in results], [0.01, 0.01, None, None, None, 0.01])
+        self.assertIsInstance(results[2].error, ServiceError)
+        self.assertIs(results[3].error, results[2].error)
+        self.assertIsInstance(results[4].error, CortanaAnalyticsError)
+        self.assertEqual(len(self.service.batches), 3)
+
+    def test_async(self):
+        ta = AsyncTextAnalytics(self.key, AsyncFakeTransport(fail=['fail']))
+        read = []
+        def lines():
+            for i in range(100000):
+                read.append(i)
+                yield 'fail' if i == 12 else 'line {0}'.format(i)
+
+        async def take(results, count):
+            taken = []
+            async for result in results:
+                taken.append(result)
+                if len(taken) == count:
+                    break
+            await results.aclose()
+            return taken
+
+        loop = asyncio.new_event_loop()
+        try:
+            first = loop.run_until_complete(take(ta.iter_sentiment(lines(), max_workers=2, max_in_flight=3, batch_size=10), 25))
+            unordered = loop.run_until_complete(take(ta.iter_sentiment(['a', 'bb', 'ccc'] * 10, ordered=False, batch_size=4), 30))
+        finally:
+            loop.close()
+
+        self.assertEqual([result.index for result in first], list(range(25)))
+        self.assertEqual(first[3].result, score('line 3'))
+        self.assertEqual([result.error is not None for result in first[10:20]], [True] * 10)
+        self.assertIsInstance(first[12].error, ServiceError)
+        self.assertLessEqual(len(read), 10 * 6 + 1)
+        self.assertEqual(sorted(result.index for result in unordered), list(range(30)))
+        self.assertEqual([result.result for result in sorted(unordered)][:3], [0.01, 0.02, 0.03])
+
+class AnalyzeTests(unittest.TestCase):
+
+    def setUp(self):
+        self.key = '1abCdEFGh/ijKlmN/opq234r56st/UvWXYZabCD7EF8='
+        return super().setUp()
+
+    def test_analyze(self):
+        service = FakeTransport(delay=0.2)
+        ta = TextAnalytics(self.key, service)
+        start = perf_counter()
+        records = ta.analyze(['hello world', { 'Text' : 'good day', 'Id' : 'x' }])
+        # the three endpoints are called at once
+        self.assertLess(perf_counter() - start, 0.5)
+
+        english = [{ 'Name' : 'English' }]
+        self.assertEqual(records, [DocumentAnalysis('0', 0.11, ['hello', 'world'], english), DocumentAnalysis('x', 0.08, ['good', 'day'], english)])
+        self.assertEqual(sorted(url for url, data in service.requests), sorted([Uris.get_sentiment_batch, Uris.get_key_phrases_batch, Uris.get_language_batch]))
+        # one payload, encoded once, for all of them
+        self.assertEqual(len(set(id(data) for url, data in service.requests)), 1)
+
+    def test_given_ids(self):
+        ta = TextAnalytics(self.key, FakeTransport())
+        records = ta.analyze([{ 'Id' : '1', 'Text' : 'a' }, 'bbbbbbbbbb'], language=False)
+        self.assertEqual(records, [DocumentAnalysis('1', 0.01, ['a'], None), DocumentAnalysis('1-1', 0.1, ['bbbbbbbbbb'], None)])
+        self.assertRaises(ValueError, ta.analyze, [{ 'Id' : 'x', 'Text' : 'a' }, { 'Id' : 'x', 'Text' : 'b' }])
+
+    def test_some_analyses(self):
+        service = FakeTransport()
+        ta = TextAnalytics(self.key, service)
+        records = ta.analyze(['hello world'], key_phrases=False, language=False)
+        self.assertEqual(records, [DocumentAnalysis('0', 0.11, None, None)])
+        self.assertEqual([url for url, data in service.requests], [Uris.get_sentiment_batch])
+        self.assertRaises(ValueError, ta.analyze, ['hello world'], False, False, False)
+
+    def test_dedup(self):
+        service = FakeTransport()
+        ta = TextAnalytics(self.key, service, dedup=ResultCache())
+        ta.get_sentiment_batch(['hello world'])
+        records = ta.analyze(['hello world', 'hello  world'], language=False)
+        self.assertEqual([record.key_phrases for record in records], [['hello', 'world']] * 2)
+        self.assertEqual([record.sentiment for record in records], [0.11, 0.11])
+        self.assertEqual([url for url, data in service.requests], [Uris.get_sentiment_batch, Uris.get_key_phrases_batch])
+
+    def test_async(self):
+        ta = AsyncTextAnalytics(self.key, AsyncFakeTransport(delay=0.2))
+        loop = asyncio.new_event_loop()
+        try:
+            start = perf_counter()
+            records = loop.run_until_complete(ta.analyze(['hello world'], language=False))
+        finally:
+            loop.close()
+        self.assertLess(perf_counter() - start, 0.35)
+        self.assertEqual(records, [DocumentAnalysis('0', 0.11, ['hello', 'world'], None)])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,121 @@
+﻿#-------------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation 
+# All rights reserved. 
+# 
+# Distributed under the terms of the MIT License
+#-------------------------------------------------------------------------
+import unittest
+from cortanaanalytics.buildmonitor import BuildMonitor
+from cortanaanalytics.recommendations import BuildStatus, Recommendations
+from cortanaanalytics.exceptions import ResponseFormatError
+from threading import Lock
+
+class FakeRecommendations:
+    '''
+    Returns scripted build statuses, one dict per call for each model.
+    '''
+    def __init__(self, scripts):
+        self.scripts = scripts
+        self.calls = []
+        self.lock = Lock()
+
+    def get_build_statuses(self, model_id):
+        with self.lock:
+            self.calls.append(model_id)
+            script = self.scripts[model_id]
+            result = script.pop(0) if len(script) > 1 else script[0]
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+class BuildMonitorTests(unittest.TestCase):
+
+    def test_many_builds_one_call_per_model(self):
+        rs = FakeRecommendations({
+            'm1' : [ { '1' : BuildStatus.queued, '2' : BuildStatus.building }, 
+                     { '1' : BuildStatus.building, '2' : BuildStatus.success }, 
+                     { '1' : BuildStatus.success, '2' : BuildStatus.success } ],
+            'm2' : [ { '3' : BuildStatus.building }, { '3' : BuildStatus.error } ],
+        })
+        monitor = BuildMonitor(rs, initial_interval=0.01)
+        completed = []
+        futures = [monitor.watch('m1', '1'), monitor.watch('m1', '2'), monitor.watch('m2', 3, callback=completed.append)]
+
+        monitor.run(timeout=5)
+
+        self.assertEqual([f.result() for f in futures], [BuildStatus.success, BuildStatus.success, BuildStatus.error])
+        self.assertEqual(completed, [futures[2]])
+        self.assertEqual(rs.calls.count('m1'), 3)
+        self.assertEqual(rs.calls.count('m2'), 2)
+        self.assertEqual(len(monitor), 0)
+
+    def test_backoff(self):
+        rs = FakeRecommendations({ 'm1' : [ { '1' : BuildStatus.building } ] })
+        monitor = BuildMonitor(rs, initial_interval=0.01, max_interval=0.04, backoff=2, jitter=0)
+        monitor.watch('m1', '1')
+
+        monitor.poll()
+        intervals = []
+        for i in range(4):
+            intervals.append(monitor._models['m1'].interval)
+            monitor._models['m1'].next_poll = 0
+            monitor.poll()
+        self.assertEqual(intervals, [0.02, 0.04, 0.04, 0.04])
+
+    def test_timeout(self):
+        rs = FakeRecommendations({ 'm1' : [ { '1' : BuildStatus.building } ] })
+        monitor = BuildMonitor(rs, initial_interval=0.01)
+        future = monitor.watch('m1', '1', timeout=0.05)
+
+        monitor.run(timeout=5)
+
+        with self.assertRaises(TimeoutError):
+            future.result()
+
+    def test_errors(self):
+        rs = FakeRecommendations({ 'm1' : [ ValueError('unavailable') ] })
+        monitor = BuildMonitor(rs, initial_interval=0.01, max_errors=2)
+        future = monitor.watch('m1', '1')
+
+        monitor.run(timeout=5)
+
+        self.assertEqual(len(rs.calls), 2)
+        with self.assertRaises(ValueError):
+            future.result()
+
+    def test_missing_build(self):
+        rs = FakeRecommendations({ 'm1' : [ { '1' : BuildStatus.building }, { '1' : BuildStatus.success, '2' : BuildStatus.error } ] })
+        monitor = BuildMonitor(rs, initial_interval=0.01, max_errors=2)
+        # '2' appears on the second check, '3' never does
+        futures = [monitor.watch('m1', '1'), monitor.watch('m1', '2'), monitor.watch('m1', '3')]
+
+        monitor.run(timeout=5)
+
+        self.assertEqual([futures[0].result(0), futures[1].result(0)], [BuildStatus.success, BuildStatus.error])
+        with self.assertRaises(ResponseFormatError):
+            futures[2].result(0)
+        self.assertEqual(len(rs.calls), 2)
+
+    def test_wait_for_deleted_build(self):
+        class FakeClient(Recommendations):
+            def __init__(self):
+                self.calls = 0
+
+            def get_build_statuses(self, model_id):
+                self.calls += 1
+                return {}
+
+        rs = FakeClient()
+        with self.assertRaises(ResponseFormatError):
+            rs.wait_for_build('m1', '1')
+        self.assertEqual(rs.calls, 3)
+
+    def test_background(self):
+        rs = FakeRecommendations({ 'm1' : [ { '1' : BuildStatus.building }, { '1' : BuildStatus.cancelled } ] })
+        monitor = BuildMonitor(rs, initial_interval=0.01)
+        monitor.start()
+        try:
+            future = monitor.watch('m1', '1')
+            self.assertEqual(future.result(timeout=5), BuildStatus.cancelled)
+        finally:
+            monitor.stop()
@@ -0,0 +1,291 @@
+﻿#-------------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation 
+# All rights reserved. 
+# 
+# Distributed under the terms of the MIT License
+#-------------------------------------------------------------------------
+import unittest
+from cortanaanalytics.aio import Response
+from cortanaanalytics.cache import TTLCache, DiskCache
+from cortanaanalytics.recommendations import Recommendations
+from cortanaanalytics.textanalytics import TextAnalytics, Uris as TextAnalyticsUris
+from multiprocessing import get_context
+import httpretty
+import os
+import shutil
+import sqlite3
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from threading import Event, Thread
+from test_recommendations import TestData
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+class TTLCacheTests(unittest.TestCase):
+
+    def test_get_set(self):
+        cache = TTLCache()
+        self.assertIsNone(cache.get('a'))
+        cache.set('a', 1)
+        self.assertEqual(cache.get('a'), 1)
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+
+    def test_lru_eviction(self):
+        cache = TTLCache(max_size=2)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        cache.get('a')
+        cache.set('c', 3)
+        self.assertEqual(len(cache), 2)
+        self.assertEqual(cache.get('a'), 1)
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(cache.get('c'), 3)
+
+    def test_ttl(self):
+        clock = FakeClock()
+        cache = TTLCache(ttl=10, clock=clock)
+        cache.set('a', 1)
+        clock.now = 9.9
+        self.assertEqual(cache.get('a'), 1)
+        clock.now = 10
+        self.assertIsNone(cache.get('a'))
+        self.assertEqual(len(cache), 0)
+
+    def test_evict(self):
+        cache = TTLCache()
+        cache.set(('m1', 1), 1)
+        cache.set(('m2', 1), 2)
+        cache.evict(lambda key: key[0] == 'm1')
+        self.assertIsNone(cache.get(('m1', 1)))
+        self.assertEqual(cache.get(('m2', 1)), 2)
+
+class RecommendationCacheTests(unittest.TestCase):
+
+    def setUp(self):
+        self.email = 'email@outlook.com'
+        self.key = '1abCdEFGh/ijKlmN/opq234r56st/UvWXYZabCD7EF8='
+        self.model_id = 'd5c7273b-2228-4cf4-99b1-9966e28b143a'
+        return super().setUp()
+
+    @httpretty.activate
+    def test_get_recommendation_cached(self):
+        uri = 'https://api.datamarket.azure.com/amla/recommendations/v2/ItemRecommend?.*'
+        httpretty.register_uri(httpretty.GET, uri, body=TestData.invoke_recommendations_list)
+
+        cache = TTLCache()
+        rs = Recommendations(self.email, self.key, cache=cache)
+
+        rs.get_recommendation(self.model_id, ['b', 'a'], 10)
+        rs.get_recommendation(self.model_id, ['a', 'b ', 'a'], 10)
+        self.assertEqual(len(httpretty.latest_requests()), 1)
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+
+        rs.get_recommendation(self.model_id, ['a', 'b'], 5)
+        rs.get_recommendation(self.model_id, ['a', 'b'], 10, include_metadata=True)
+        self.assertEqual(len(httpretty.latest_requests()), 3)
+
+    @httpretty.activate
+    def test_update_model_invalidates(self):
+        httpretty.register_uri(httpretty.GET, 'https://api.datamarket.azure.com/amla/recommendations/v2/ItemRecommend?.*', body=TestData.invoke_recommendations_list)
+        httpretty.register_uri(httpretty.PUT, 'https://api.datamarket.azure.com/amla/recommendations/v2/UpdateModel?.*', body=TestData.update_model_response)
+
+        cache = TTLCache()
+        rs = Recommendations(self.email, self.key, cache=cache)
+        rs.get_recommendation(self.model_id, ['a'])
+        rs.get_recommendation('other model', ['a'])
+
+        rs.update_model(self.model_id, 'new description', None)
+        self.assertEqual(len(cache), 2)
+
+        rs.update_model(self.model_id, None, '1514886')
+        self.assertEqual(len(cache), 1)
+        self.assertIsNone(cache.get((self.model_id, ('a',), 10, False)))
+
+    def test_update_model_while_fetching(self):
+        started, release = Event(), Event()
+
+        class FakeTransport:
+            # the first request, for the old build, waits for release
+            def __init__(self):
+                self.gets = 0
+
+            def get(self, url, **kwargs):
+                self.gets += 1
+                if self.gets == 1:
+                    started.set()
+                    release.wait(5)
+                    return Response(200, 'OK', TestData.invoke_recommendations_single_1.encode('utf-8'))
+                return Response(200, 'OK', TestData.invoke_recommendations_list.encode('utf-8'))
+
+            def put(self, url, data=None, **kwargs):
+                return Response(200, 'OK', TestData.update_model_response.encode('utf-8'))
+
+        cache = TTLCache()
+        transport = FakeTransport()
+        rs = Recommendations(self.email, self.key, transport, cache=cache)
+        with ThreadPoolExecutor(2) as executor:
+            old = executor.submit(rs.get_recommendation, self.model_id, ['a'])
+            self.assertTrue(started.wait(5))
+            rs.update_model(self.model_id, None, '1514886')
+            # a call made after the update does not share the old build's request
+            self.assertEqual(executor.submit(rs.get_recommendation, self.model_id, ['a']).result(5), [])
+            release.set()
+            self.assertEqual(len(old.result(5)), 1)
+
+        # the old build's result, which finished last, was not cached
+        self.assertEqual(rs.get_recommendation(self.model_id, ['a']), [])
+        self.assertEqual(transport.gets, 2)
+
+def fill(path, start):
+    cache = DiskCache(path)
+    for i in range(start, start + 50):
+        cache.set(('item', i), [i])
+
+class DiskCacheTests(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'cache.sqlite')
+        return super().setUp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+        return super().tearDown()
+
+    def test_get_set(self):
+        cache = DiskCache(self.path)
+        self.assertIsNone(cache.get(('a', 1)))
+        cache.set(('a', 1), {'Score': 0.5, 'Items': ['x', 'y']})
+        cache.set(('a', 1), {'Score': 0.9, 'Items': ['x', 'y']})
+        self.assertEqual(cache.get(('a', 1)), {'Score': 0.9, 'Items': ['x', 'y']})
+        self.assertEqual((cache.hits, cache.misses, len(cache)), (1, 1, 1))
+        cache.close()
+
+        # a new process finds what the last one stored
+        self.assertEqual(DiskCache(self.path).get(('a', 1)), {'Score': 0.9, 'Items': ['x', 'y']})
+
+    def test_close(self):
+        with DiskCache(self.path) as cache:
+            cache.set(('a', 1), 1)
+            connections = []
+            def use():
+                self.assertEqual(cache.get(('a', 1)), 1)
+                connections.append(cache._connection())
+            threads = [Thread(target=use) for i in range(3)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            connections.append(cache._connection())
+
+        # the connections of every thread are closed, and a later call opens a new one
+        for connection in connections:
+            self.assertRaises(sqlite3.ProgrammingError, connection.execute, 'SELECT 1')
+        self.assertEqual(cache.get(('a', 1)), 1)
+        cache.close()
+
+    def test_ttl(self):
+        clock = FakeClock()
+        cache = DiskCache(self.path, ttl=10, clock=clock)
+        cache.set('a', 1)
+        clock.now = 9
+        self.assertEqual(cache.get('a'), 1)
+        clock.now = 10
+        self.assertIsNone(cache.get('a'))
+        self.assertEqual(len(cache), 0)
+
+    def test_lru_eviction(self):
+        clock = FakeClock()
+        cache = DiskCache(self.path, max_size=10, clock=clock)
+        for i in range(10):
+            clock.now = i * 2
+            cache.set(i, i)
+        clock.now = 30
+        self.assertEqual(cache.get(0), 0)
+        cache.set(10, 10)
+        # the least recently used tenth made room
+        self.assertEqual(len(cache), 10)
+        self.assertEqual(cache.get(0), 0)
+        self.assertIsNone(cache.get(1))
+        self.assertEqual(cache.get(10), 10)
+
+    def test_max_bytes(self):
+        cache = DiskCache(self.path, max_bytes=1000)
+        for i in range(20):
+            cache.set(i, 'x' * 98)
+        self.assertLessEqual(len(cache), 10)
+        self.assertEqual(cache.get(19), 'x' * 98)
+
+    def test_evict(self):
+        cache = DiskCache(self.path)
+        cache.set(('m1', ('a', 'b'), 10, False), [['a', '', 1.0, '']])
+        cache.set(('m2', ('a', 'b'), 10, False), [['a', '', 1.0, '']])
+        cache.evict(lambda key: key[0] == 'm1' and key[1] == ('a', 'b'))
+        self.assertIsNone(cache.get(('m1', ('a', 'b'), 10, False)))
+        self.assertEqual(len(cache), 1)
+        cache.clear()
+        self.assertEqual(len(cache), 0)
+
+    def test_processes(self):
+        DiskCache(self.path)
+        context = get_context('spawn')
+        processes = [context.Process(target=fill, args=(self.path, start)) for start in (0, 50, 100)]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join(60)
+            self.assertEqual(process.exitcode, 0)
+
+        cache = DiskCache(self.path)
+        self.assertEqual(len(cache), 150)
+        self.assertEqual(cache.get(('item', 120)), [120])
+
+    @httpretty.activate
+    def test_text_analytics(self):
+        httpretty.register_uri(httpretty.GET, TextAnalyticsUris.get_key_phrases, body='{"KeyPhrases":["wonderful hotel"]}')
+        httpretty.register_uri(httpretty.GET, TextAnalyticsUris.get_sentiment, body='{"Score":0.9}')
+
+        ta = TextAnalytics('1abCdEFGh/ijKlmN/opq234r56st/UvWXYZabCD7EF8=', cache=DiskCache(self.path))
+        self.assertEqual(ta.get_key_phrases('a wonderful hotel'), ['wonderful hotel'])
+        self.assertEqual(ta.get_sentiment('a wonderful hotel'), 0.9)
+        requests = len(httpretty.latest_requests())
+
+        # a restarted worker answers from the cache
+        ta = TextAnalytics('1abCdEFGh/ijKlmN/opq234r56st/UvWXYZabCD7EF8=', cache=DiskCache(self.path))
+        self.assertEqual(ta.get_key_phrases('a wonderful hotel'), ['wonderful hotel'])
+        self.assertEqual(ta.get_sentiment('a wonderful hotel'), 0.9)
+        self.assertEqual(len(httpretty.latest_requests()), requests)
+
+    @httpretty.activate
+    def test_get_recommendation(self):
+        httpretty.register_uri(httpretty.GET, 'https://api.datamarket.azure.com/amla/recommendations/v2/ItemRecommend?.*', body=TestData.invoke_recommendations_single_1)
+
+        rs = Recommendations('email@outlook.com', '1abCdEFGh/ijKlmN/opq234r56st/UvWXYZabCD7EF8=', cache=DiskCache(self.path))
+        items = rs.get_recommendation('d5c7273b-2228-4cf4-99b1-9966e28b143a', ['a'])
+        requests = len(httpretty.latest_requests())
+
+        rs = Recommendations('email@outlook.com', '1abCdEFGh/ijKlmN/opq234r56st/UvWXYZabCD7EF8=', cache=DiskCache(self.path))
+        cached = rs.get_recommendation('d5c7273b-2228-4cf4-99b1-9966e28b143a', ['a'])
+        self.assertEqual(len(httpretty.latest_requests()), requests)
+        self.assertEqual([str(item) for item in cached], [str(item) for item in items])
+        self.assertEqual(len(rs.get_recommendation('d5c7273b-2228-4cf4-99b1-9966e28b143a', ['a'], columnar=True)), 1)
+
+    @httpretty.activate
+    def test_columnar_results_are_copies(self):
+        httpretty.register_uri(httpretty.GET, 'https://api.datamarket.azure.com/amla/recommendations/v2/ItemRecommend?.*', body=TestData.invoke_recommendations_single_1)
+
+        for cache in [TTLCache(), DiskCache(self.path)]:
+            rs = Recommendations('email@outlook.com', '1abCdEFGh/ijKlmN/opq234r56st/UvWXYZabCD7EF8=', cache=cache)
+            # changing a result, whether it was fetched or cached, does not change the next one
+            for i in range(2):
+                columns = rs.get_recommendation('d5c7273b-2228-4cf4-99b1-9966e28b143a', ['a'], columnar=True)
+                self.assertEqual(columns.names, ['Restraint of Beasts'])
+                columns.names[0] = 'changed'
+                columns.append('b', 'added', 1.0, '')
+            items = rs.get_recommendation('d5c7273b-2228-4cf4-99b1-9966e28b143a', ['a'])
+            self.assertEqual([item.name for item in items], ['Restraint of Beasts'])
@@ -0,0 +1,83 @@
+﻿#-------------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation 
+# All rights reserved. 
+# 
+# Distributed under the terms of the MIT License
+#-------------------------------------------------------------------------
+import unittest
+import json
+from cortanaanalytics.codec import DEFAULT_CODEC, JsonCodec, OrjsonCodec, orjson
+from cortanaanalytics.anomalydetection import AnomalyDetection
+from cortanaanalytics.exceptions import ResponseFormatError
+from cortanaanalytics.textanalytics import TextAnalytics
+from cortanaanalytics.aio import Response
+
+DOCUMENTS = [
+    { 'Id' : '0', 'Text' : 'hello world' },
+    { 'Id' : 1, 'Text' : 'café 日本 \U0001f600 "quoted" back\\slash \t\n\x01  ' },
+]
+
+class CountingCodec(JsonCodec):
+    def __init__(self):
+        self.decoded = 0
+
+    def loads(self, content):
+        self.decoded += 1
+        return super().loads(content)
+
+class OnceResponse(Response):
+    def json(self):
+        raise AssertionError('the client should decode the body with its codec')
+
+class FakeTransport:
+    def __init__(self, body):
+        self.body = body
+        self.sent = []
+
+    def get(self, url, **kwargs):
+        return OnceResponse(200, 'OK', self.body)
+
+    def post(self, url, data=None, **kwargs):
+        self.sent.append(data)
+        return OnceResponse(200, 'OK', self.body)
+
+class CodecTests(unittest.TestCase):
+
+    def setUp(self):
+        self.key = '1abCdEFGh/ijKlmN/opq234r56st/UvWXYZabCD7EF8='
+        return super().setUp()
+
+    def test_json_codec(self):
+        codec = JsonCodec()
+        for document in DOCUMENTS:
+            self.assertEqual(codec.loads(codec.dumps(document)), document)
+        self.assertEqual(codec.dumps(DOCUMENTS[0]), b'{"Id":"0","Text":"hello world"}')
+
+    @unittest.skipIf(orjson is None, 'orjson is not installed')
+    def test_orjson_codec(self):
+        # batches are sized by their encoded length, which must not depend on the codec
+        for document in DOCUMENTS:
+            self.assertEqual(OrjsonCodec().dumps(document), JsonCodec().dumps(document))
+            self.assertEqual(OrjsonCodec().loads(JsonCodec().dumps(document)), document)
+        self.assertIsInstance(DEFAULT_CODEC, OrjsonCodec)
+
+    def test_decoded_once(self):
+        codec = CountingCodec()
+        transport = FakeTransport(json.dumps({ 'SentimentBatch' : [{ 'Score' : 0.5, 'Id' : '0' }], 'Errors' : [] }).encode('utf-8'))
+        ta = TextAnalytics(self.key, transport, codec=codec)
+        self.assertEqual(ta.get_sentiment_batch(['hello world']), [{ 'Score' : 0.5, 'Id' : '0' }])
+        self.assertEqual(codec.decoded, 1)
+        self.assertEqual(transport.sent, [b'{"Inputs":[{"Id":"0","Text":"hello world"}]}'])
+
+        transport.body = b'{"table":"\\"Time,Data;\\""}'
+        codec = CountingCodec()
+        ad = AnomalyDetection(self.key, transport, coalesce=False, codec=codec)
+        self.assertEqual(ad.score_raw('9/21/2014 11:05:00 AM=3;', 'SpikeDetector.TukeyThresh=3'), 'Time,Data;')
+        self.assertEqual(codec.decoded, 1)
+
+    def test_invalid_json(self):
+        ta = TextAnalytics(self.key, FakeTransport(b'<html>Service Unavailable</html>'))
+        self.assertRaises(ResponseFormatError, ta.get_sentiment, 'hello world')
+
+if __name__ == '__main__':
+    unittest.main()
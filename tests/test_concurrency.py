@@ -0,0 +1,143 @@
+﻿#-------------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation 
+# All rights reserved. 
+# 
+# Distributed under the terms of the MIT License
+#-------------------------------------------------------------------------
+import unittest
+from cortanaanalytics.concurrency import bounded_map, bounded_map_async
+from cortanaanalytics.recommendations import Recommendations
+import httpretty
+import asyncio
+import random
+import time
+from test_recommendations import TestData
+
+class BoundedMapTests(unittest.TestCase):
+
+    def test_ordered(self):
+        def work(i):
+            time.sleep(random.random() / 100)
+            return i * 2
+        outcomes = list(bounded_map(work, range(50), max_workers=8))
+        self.assertEqual([o.index for o in outcomes], list(range(50)))
+        self.assertEqual([o.result for o in outcomes], [i * 2 for i in range(50)])
+
+    def test_unordered(self):
+        def work(i):
+            time.sleep((10 - i) / 200)
+            return i
+        outcomes = list(bounded_map(work, range(10), max_workers=10, ordered=False))
+        self.assertEqual(sorted(o.result for o in outcomes), list(range(10)))
+        self.assertNotEqual([o.index for o in outcomes], list(range(10)))
+
+    def test_errors_do_not_stop_batch(self):
+        def work(i):
+            if i % 3 == 0:
+                raise ValueError(i)
+            return i
+        outcomes = list(bounded_map(work, range(9), max_workers=3))
+        self.assertEqual([o.result for o in outcomes if o.error is None], [1, 2, 4, 5, 7, 8])
+        self.assertTrue(all(isinstance(o.error, ValueError) for o in outcomes if o.result is None))
+
+    def test_lazy_and_bounded(self):
+        pulled = []
+        def items():
+            for i in range(1000):
+                pulled.append(i)
+                yield i
+
+        outcomes = bounded_map(lambda i: i, items(), max_workers=2, max_in_flight=4)
+        next(outcomes)
+        self.assertLessEqual(len(pulled), 5)
+        outcomes.close()
+
+class BoundedMapAsyncTests(unittest.TestCase):
+
+    def run_async(self, coroutine):
+        loop = asyncio.new_event_loop()
+        try:
+            return loop.run_until_complete(coroutine)
+        finally:
+            loop.close()
+
+    def test_ordered_and_bounded(self):
+        running = []
+        peak = []
+        async def work(i):
+            running.append(i)
+            peak.append(len(running))
+            await asyncio.sleep(random.random() / 100)
+            running.remove(i)
+            if i == 3:
+                raise ValueError(i)
+            return i * 2
+
+        async def run():
+            return [outcome async for outcome in bounded_map_async(work, range(30), max_workers=4)]
+
+        outcomes = self.run_async(run())
+        self.assertEqual([o.index for o in outcomes], list(range(30)))
+        self.assertEqual([o.result for o in outcomes if o.error is None], [i * 2 for i in range(30) if i != 3])
+        self.assertIsInstance(outcomes[3].error, ValueError)
+        self.assertLessEqual(max(peak), 4)
+
+    def test_lazy_and_cancelled(self):
+        pulled = []
+        started = []
+        def items():
+            for i in range(1000):
+                pulled.append(i)
+                yield i
+
+        async def work(i):
+            started.append(i)
+            await asyncio.sleep(0.01 if i else 0)
+            return i
+
+        async def run():
+            outcomes = bounded_map_async(work, items(), max_workers=2, max_in_flight=4, ordered=False)
+            first = await outcomes.__anext__()
+            await outcomes.aclose()
+            await asyncio.sleep(0.05)
+            return first
+
+        self.assertEqual(self.run_async(run()).result, 0)
+        self.assertLessEqual(len(pulled), 5)
+        self.assertLessEqual(len(started), 3)
+
+class BulkRecommendationTests(unittest.TestCase):
+
+    def setUp(self):
+        self.email = 'email@outlook.com'
+        self.key = '1abCdEFGh/ijKlmN/opq234r56st/UvWXYZabCD7EF8='
+        self.model_id = 'd5c7273b-2228-4cf4-99b1-9966e28b143a'
+        return super().setUp()
+
+    @httpretty.activate
+    def test_get_recommendations_bulk(self):
+        def recommend(request, uri, headers):
+            if 'itemIds=%27bad%27' in uri:
+                return (500, headers, '')
+            return (200, headers, TestData.invoke_recommendations_list)
+
+        httpretty.register_uri(httpretty.GET, 'https://api.datamarket.azure.com/amla/recommendations/v2/ItemRecommend?.*', body=recommend)
+
+        rs = Recommendations(self.email, self.key)
+        item_lists = [['a'], ['b', 'c'], ['bad'], ['d']]
+        results = list(rs.get_recommendations_bulk(self.model_id, iter(item_lists), max_workers=2))
+
+        self.assertEqual([r.item_id_list for r in results], item_lists)
+        self.assertEqual([r.items for r in results], [[], [], None, []])
+        self.assertIsNone(results[0].error)
+        self.assertIn('Error 500', str(results[2].error))
+
+    @httpretty.activate
+    def test_get_recommendations_bulk_columnar(self):
+        httpretty.register_uri(httpretty.GET, 'https://api.datamarket.azure.com/amla/recommendations/v2/ItemRecommend?.*', body=TestData.invoke_recommendations_single_1)
+
+        rs = Recommendations(self.email, self.key)
+        results = list(rs.get_recommendations_bulk(self.model_id, [['a'], ['b']], columnar=True))
+
+        self.assertEqual([r.items.ids for r in results], [['552A1940-21E4-4399-82BB-594B46D7ED54']] * 2)
+        self.assertEqual([list(r.items.ratings) for r in results], [[0.500787351855212]] * 2)
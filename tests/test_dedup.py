@@ -0,0 +1,83 @@
+﻿#-------------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation 
+# All rights reserved. 
+# 
+# Distributed under the terms of the MIT License
+#-------------------------------------------------------------------------
+import unittest
+import asyncio
+from cortanaanalytics.dedup import ResultCache, content_hash, normalize
+from cortanaanalytics.textanalytics import TextAnalytics
+from cortanaanalytics.aio import AsyncTextAnalytics
+from fakes import AsyncFakeTransport, FakeTransport
+
+class DedupTests(unittest.TestCase):
+
+    def setUp(self):
+        self.key = '1abCdEFGh/ijKlmN/opq234r56st/UvWXYZabCD7EF8='
+        self.transport = FakeTransport()
+        self.dedup = ResultCache(max_size=100)
+        self.ta = TextAnalytics(self.key, self.transport, coalesce=False, dedup=self.dedup)
+        return super().setUp()
+
+    def test_normalize(self):
+        self.assertEqual(normalize(' hello \t world\n'), 'hello world')
+        self.assertEqual(content_hash('hello  world'), content_hash('hello world '))
+        self.assertEqual(content_hash('caf\u00e9'), content_hash('cafe\u0301'))
+        self.assertNotEqual(content_hash('Hello world'), content_hash('hello world'))
+
+    def test_batch(self):
+        texts = ['good movie', 'bad', 'good  movie', { 'Text' : 'bad', 'Id' : 'x' }, 'good movie']
+        results = self.ta.get_sentiment_batch(texts)
+
+        self.assertEqual(self.transport.sent, ['good movie', 'bad'])
+        self.assertEqual(results, [{ 'Score' : 0.1, 'Id' : '0' }, { 'Score' : 0.03, 'Id' : '1' }, { 'Score' : 0.1, 'Id' : '2' },
+                                   { 'Score' : 0.03, 'Id' : 'x' }, { 'Score' : 0.1, 'Id' : '4' }])
+        self.assertEqual(self.dedup.duplicates, 3)
+
+        # known results are not sent again, by a batch or a single call
+        results = self.ta.get_sentiment_batch(['bad', 'really good movie'])
+        self.assertEqual(results, [{ 'Score' : 0.03, 'Id' : '0' }, { 'Score' : 0.17, 'Id' : '1' }])
+        self.assertEqual(self.ta.get_sentiment(' really good movie'), 0.17)
+        self.assertEqual(self.transport.sent, ['good movie', 'bad', 'really good movie'])
+
+    def test_unanswered(self):
+        self.transport.skip.add('bad')
+        results = self.ta.get_sentiment_batch(['bad', 'good', 'bad'])
+        self.assertEqual(results, [{ 'Score' : 0.04, 'Id' : '1' }])
+        # texts without a result are sent again
+        self.ta.get_sentiment_batch(['bad'])
+        self.assertEqual(self.transport.sent, ['bad', 'good', 'bad'])
+
+    def test_single(self):
+        self.assertEqual(self.ta.get_sentiment('hello world'), 0.11)
+        self.assertEqual(self.ta.get_sentiment('hello\nworld'), 0.11)
+        self.assertEqual(len(self.ta.get_language('hello world')), 1)
+        self.assertEqual(len(self.ta.get_language('hello world', number_of_languages_to_detect=2)), 2)
+        self.assertEqual(len(self.ta.get_language(' hello world', 2)), 2)
+        self.assertEqual(self.transport.sent, ['hello world', 'hello world', 'hello world'])
+
+    def test_bounded(self):
+        dedup = ResultCache(max_size=2)
+        ta = TextAnalytics(self.key, self.transport, dedup=dedup)
+        ta.get_sentiment_batch(['a', 'b', 'c'])
+        self.assertEqual(len(dedup.cache('sentiment')), 2)
+        self.assertEqual(len(dedup.cache('key_phrases')), 0)
+
+    def test_without_dedup(self):
+        TextAnalytics(self.key, self.transport).get_sentiment_batch(['a', 'a'])
+        self.assertEqual(self.transport.sent, ['a', 'a'])
+
+    def test_async(self):
+        transport = AsyncFakeTransport()
+        ta = AsyncTextAnalytics(self.key, transport, dedup=self.dedup)
+        loop = asyncio.new_event_loop()
+        try:
+            results = loop.run_until_complete(ta.get_sentiment_batch(['a b', 'a  b', 'c']))
+        finally:
+            loop.close()
+        self.assertEqual(transport.sent, ['a b', 'c'])
+        self.assertEqual([result['Score'] for result in results], [0.03, 0.03, 0.01])
+
+if __name__ == '__main__':
+    unittest.main()
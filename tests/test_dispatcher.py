@@ -0,0 +1,97 @@
+﻿#-------------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation 
+# All rights reserved. 
+# 
+# Distributed under the terms of the MIT License
+#-------------------------------------------------------------------------
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from threading import Event
+from cortanaanalytics.cache import TTLCache
+from cortanaanalytics.dispatcher import MicroBatcher
+from cortanaanalytics.exceptions import CortanaAnalyticsError, ServiceError
+from cortanaanalytics.textanalytics import TextAnalytics, Uris
+from cortanaanalytics.aio import AsyncTextAnalytics
+from fakes import FakeTransport, score
+
+class MicroBatcherTests(unittest.TestCase):
+
+    def setUp(self):
+        self.key = '1abCdEFGh/ijKlmN/opq234r56st/UvWXYZabCD7EF8='
+        self.transport = FakeTransport()
+        self.ta = TextAnalytics(self.key, self.transport)
+        return super().setUp()
+
+    def test_concurrent_calls(self):
+        texts = ['text {0}'.format('x' * i) for i in range(40)]
+        with MicroBatcher(self.ta, max_delay=0.05) as batcher, ThreadPoolExecutor(40) as executor:
+            scores = list(executor.map(batcher.get_sentiment, texts))
+            phrases = batcher.get_key_phrases('hello big world')
+
+        self.assertEqual(scores, [score(text) for text in texts])
+        self.assertEqual(phrases, ['hello', 'big', 'world'])
+        sentiment_batches = [documents for (url, data), documents in zip(self.transport.requests, self.transport.batches) if url == Uris.get_sentiment_batch]
+        self.assertLess(len(sentiment_batches), 10)
+        self.assertEqual(sum(len(documents) for documents in sentiment_batches), 40)
+
+    def test_max_batch_size(self):
+        with MicroBatcher(self.ta, max_delay=60, max_batch_size=5) as batcher:
+            # distinct texts, so the client does not coalesce equal batches
+            futures = [batcher.submit('sentiment', '{0:04}'.format(i)) for i in range(12)]
+            self.assertEqual([future.result(5) for future in futures[:10]], [0.04] * 10)
+        # the last two are sent on close rather than after max_delay
+        self.assertEqual([len(documents) for documents in self.transport.batches], [5, 5, 2])
+        self.assertEqual(batcher.batches, 3)
+
+    def test_errors(self):
+        self.transport.status = 400
+        with MicroBatcher(self.ta) as batcher:
+            futures = [batcher.submit('sentiment', text) for text in ['a', 'b']]
+            for future in futures:
+                self.assertIsInstance(future.exception(5), ServiceError)
+        self.assertEqual(len(self.transport.batches), 1)
+
+    def test_cancelled(self):
+        self.transport.release = Event()
+        with MicroBatcher(self.ta, max_delay=0, max_workers=1) as batcher:
+            first = batcher.submit('sentiment', 'first')
+            while not first.running():
+                pass
+            # queued behind the first batch, which is still waiting for the service
+            cancelled = batcher.submit('sentiment', 'cancelled')
+            kept = batcher.submit('key_phrases', 'kept')
+            self.assertTrue(cancelled.cancel())
+            self.transport.release.set()
+            self.assertEqual(kept.result(5), ['kept'])
+        texts = [d['Text'] for documents in self.transport.batches for d in documents]
+        self.assertEqual(sorted(texts), ['first', 'kept'])
+
+    def test_missing_result(self):
+        self.transport.skip.add('secret text')
+        with MicroBatcher(self.ta, max_delay=0.05) as batcher:
+            found = batcher.submit('sentiment', 'found')
+            missing = batcher.submit('sentiment', 'secret text')
+            self.assertEqual(found.result(5), 0.05)
+            error = missing.exception(5)
+        self.assertIsInstance(error, CortanaAnalyticsError)
+        self.assertEqual(str(error), 'The service returned no sentiment for document 1')
+
+    def test_cached(self):
+        self.ta.cache = TTLCache()
+        with MicroBatcher(self.ta, max_delay=0) as batcher:
+            self.assertEqual(batcher.get_sentiment('text'), 0.04)
+            self.assertEqual(batcher.get_sentiment('text'), 0.04)
+        # the second batch, with the same single document, is answered from the client's cache
+        self.assertEqual(len(self.transport.batches), 1)
+        self.assertEqual(batcher.batches, 2)
+
+    def test_async_client(self):
+        self.assertRaises(TypeError, MicroBatcher, AsyncTextAnalytics(self.key))
+
+    def test_closed(self):
+        batcher = MicroBatcher(self.ta)
+        batcher.close()
+        self.assertRaises(RuntimeError, batcher.submit, 'sentiment', 'text')
+
+if __name__ == '__main__':
+    unittest.main()
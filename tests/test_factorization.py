@@ -0,0 +1,120 @@
+﻿#-------------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation 
+# All rights reserved. 
+# 
+# Distributed under the terms of the MIT License
+#-------------------------------------------------------------------------
+import unittest
+from cortanaanalytics import factorization
+from cortanaanalytics.factorization import FactorizationModel, load_usage
+from cortanaanalytics.recommendations import RecommendedItem
+import os
+import shutil
+import tempfile
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+@unittest.skipIf(np is None, 'numpy is not installed')
+class FactorizationModelTests(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        # users 1-4 use a, b and c; users 5-8 use x, y and z; user 9 only uses a.
+        # w is used once, by user 8.
+        self.usage_path = os.path.join(self.temp_dir, 'usage.txt')
+        with open(self.usage_path, 'w') as f:
+            for user in range(1, 5):
+                f.write('{0},a\n{0},b\n{0},c\n'.format(user))
+            for user in range(5, 9):
+                f.write('{0},x\n{0},y\n{0},z,2015/05/18T10:00:00\n'.format(user))
+            f.write('9,a\n9,a\n8,w\n')
+        self.catalog_path = os.path.join(self.temp_dir, 'catalog.txt')
+        with open(self.catalog_path, 'w') as f:
+            f.write('a,Apple,Fruit\nb,Banana,Fruit\nx,Xylophone,Music\n')
+        return super().setUp()
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+        return super().tearDown()
+
+    def test_load_usage(self):
+        usage = load_usage(self.usage_path)
+        self.assertEqual(usage.user_ids, ['1', '2', '3', '4', '5', '6', '7', '8', '9'])
+        self.assertEqual(usage.item_ids, ['a', 'b', 'c', 'x', 'y', 'z', 'w'])
+        self.assertEqual(len(usage.counts), 26)
+        # user 9 used a twice
+        pairs = dict(((usage.user_ids[u], usage.item_ids[i]), c) for u, i, c in zip(usage.users, usage.items, usage.counts))
+        self.assertEqual(pairs[('9', 'a')], 2)
+        self.assertEqual(pairs[('1', 'a')], 1)
+
+    def test_train(self):
+        model = FactorizationModel.train(self.usage_path, self.catalog_path, number_of_model_dimensions=4)
+        self.assertEqual(model.user_factors.shape, (9, 4))
+        self.assertEqual(model.item_factors.shape, (7, 4))
+        self.assertEqual(model.parameters['number_of_model_iterations'], 10)
+        self.assertEqual(model.item_names[:2], ['Apple', 'Banana'])
+
+        self.assertEqual(set(item_id for item_id, score in model.related('a', 2)), set(['b', 'c']))
+        self.assertEqual(set(item_id for item_id, score in model.related('y', 2)), set(['x', 'z']))
+        self.assertEqual(set(item_id for item_id, score in model.rank('9', 3)), set(['a', 'b', 'c']))
+        self.assertEqual(model.related('unknown'), [])
+        self.assertEqual(model.rank('unknown'), [])
+
+    def test_cut_off_bounds(self):
+        model = FactorizationModel.train(self.usage_path, number_of_model_dimensions=4, item_cut_off_lower_bound=2, user_cut_off_upper_bound=2)
+        # w is used once; users 1-8 use three items
+        self.assertEqual(model.item_ids, ['a'])
+        self.assertEqual(model.user_ids, ['9'])
+
+    def test_threads_match(self):
+        usage = load_usage(self.usage_path)
+        one = FactorizationModel.train(usage, number_of_model_dimensions=4, max_workers=1)
+        original = factorization.BLOCK_SIZE
+        factorization.BLOCK_SIZE = 2
+        try:
+            # many small blocks, spread over threads
+            many = FactorizationModel.train(usage, number_of_model_dimensions=4, max_workers=4)
+        finally:
+            factorization.BLOCK_SIZE = original
+        self.assertTrue(np.allclose(one.item_factors, many.item_factors))
+        self.assertTrue(np.allclose(one.user_factors, many.user_factors))
+
+    def test_blocks(self):
+        offsets = np.array([0, 3, 3, 4, 9, 11])
+        blocks = factorization._blocks(offsets, block_size=4)
+        # empty rows are skipped, short rows are grouped, long rows are alone
+        self.assertEqual([list(block) for block in blocks], [[2, 4], [0], [3]])
+
+    def test_save_load(self):
+        model = FactorizationModel.train(self.usage_path, self.catalog_path, number_of_model_dimensions=4)
+        model_dir = os.path.join(self.temp_dir, 'model')
+        model.save(model_dir)
+        self.assertTrue(os.path.isfile(os.path.join(model_dir, 'item_factors.npy')))
+        self.assertTrue(os.path.isfile(os.path.join(model_dir, 'user_factors.npy')))
+
+        loaded = FactorizationModel.load(model_dir)
+        self.assertEqual(loaded.item_ids, model.item_ids)
+        self.assertEqual(loaded.user_ids, model.user_ids)
+        self.assertEqual(loaded.item_names, model.item_names)
+        self.assertEqual(loaded.parameters, model.parameters)
+        self.assertTrue(np.array_equal(loaded.item_factors, model.item_factors))
+        self.assertEqual(loaded.related('a'), model.related('a'))
+
+    def test_get_recommendation(self):
+        model = FactorizationModel.train(self.usage_path, self.catalog_path, number_of_model_dimensions=4)
+        items = model.get_recommendation('d5c7273b-2228-4cf4-99b1-9966e28b143a', ['x', 'y'], 1)
+        self.assertEqual(len(items), 1)
+        self.assertIsInstance(items[0], RecommendedItem)
+        self.assertEqual(items[0].id, 'z')
+        self.assertEqual(items[0].reasoning, 'Similar usage')
+
+        items = model.get_recommendation('d5c7273b-2228-4cf4-99b1-9966e28b143a', ['a'], 10)
+        self.assertEqual(len(items), 6)
+        self.assertEqual(set(item.id for item in items[:2]), set(['b', 'c']))
+        self.assertEqual(model.get_recommendation('d5c7273b-2228-4cf4-99b1-9966e28b143a', ['unknown']), [])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,90 @@
+﻿#-------------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation 
+# All rights reserved. 
+# 
+# Distributed under the terms of the MIT License
+#-------------------------------------------------------------------------
+import unittest
+from cortanaanalytics.fbt import FbtModel
+from cortanaanalytics.recommendations import RecommendedItem
+import os
+import shutil
+import tempfile
+
+class FbtModelTests(unittest.TestCase):
+
+    def setUp(self):
+        self.resources_dir = os.path.join(os.getcwd(), 'tests', 'resources')
+        self.temp_dir = tempfile.mkdtemp()
+        # a and b are bought together 3 times, a and c twice, b and c once.
+        # user 4 buys a and b at different times, which are separate transactions.
+        self.usage_path = os.path.join(self.temp_dir, 'usage.txt')
+        with open(self.usage_path, 'w') as f:
+            f.write('1,a\n1,b\n1,c\n2,a\n2,b\n3,a\n3,b\n5,a\n5,c\n6,d\n'
+                    '4,a,2015/05/18T10:00:00\n4,b,2015/05/18T11:00:00\n')
+        return super().setUp()
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+        return super().tearDown()
+
+    def test_build_cooccurrence(self):
+        model = FbtModel.build(self.usage_path, support_threshold=1, similarity='cooccurrence')
+        self.assertEqual(model.related('a'), [('b', 3.0), ('c', 2.0)])
+        self.assertEqual(model.related('c'), [('a', 2.0), ('b', 1.0)])
+        self.assertEqual(model.related('d'), [])
+        self.assertEqual(model.related('unknown'), [])
+
+    def test_build_jaccard(self):
+        # a is in 5 transactions, b in 4
+        model = FbtModel.build(self.usage_path, support_threshold=1)
+        self.assertEqual(model.related('a', 1), [('b', 3 / (5 + 4 - 3))])
+
+    def test_build_lift(self):
+        # 7 transactions; a in 5, c in 2
+        model = FbtModel.build(self.usage_path, support_threshold=1, similarity='lift')
+        self.assertEqual(dict(model.related('c'))['a'], 2 * 7 / (5 * 2))
+
+    def test_support_and_minimal_score(self):
+        model = FbtModel.build(self.usage_path, support_threshold=2, similarity='cooccurrence')
+        self.assertEqual(model.related('c'), [('a', 2.0)])
+
+        model = FbtModel.build(self.usage_path, support_threshold=1, minimal_score=2.5, similarity='cooccurrence')
+        self.assertEqual(model.related('a'), [('b', 3.0)])
+
+    def test_item_set_size(self):
+        with self.assertRaises(ValueError):
+            FbtModel.build(self.usage_path, max_item_set_size=3)
+
+    def test_get_recommendation(self):
+        model = FbtModel.build(self.usage_path, support_threshold=1, similarity='cooccurrence')
+
+        items = model.get_recommendation('model', ['a'], 1)
+        self.assertEqual(len(items), 1)
+        self.assertIsInstance(items[0], RecommendedItem)
+        self.assertEqual((items[0].id, items[0].rating), ('b', 3.0))
+
+        items = model.get_recommendation('model', ['b', 'c'])
+        self.assertEqual([(i.id, i.rating) for i in items], [('a', 5.0)])
+
+    def test_save_load(self):
+        model = FbtModel.build(os.path.join(self.resources_dir, 'usage_small.txt'), os.path.join(self.resources_dir, 'catalog_small.txt'), support_threshold=1)
+        path = os.path.join(self.temp_dir, 'model.fbt')
+        model.save(path)
+
+        with FbtModel.load(path) as loaded:
+            self.assertEqual(loaded.item_ids, model.item_ids)
+            self.assertEqual(loaded.item_names, model.item_names)
+            self.assertIn('Restraint of Beasts', loaded.item_names)
+            for item_id in model.item_ids:
+                self.assertEqual(loaded.related(item_id), model.related(item_id))
+            self.assertEqual(
+                [str(i) for i in loaded.get_recommendation(None, ['3bb5cb44-d143-4bdd-a55c-443964bf4b23'])], 
+                [str(i) for i in model.get_recommendation(None, ['3bb5cb44-d143-4bdd-a55c-443964bf4b23'])])
+
+    def test_load_invalid(self):
+        path = os.path.join(self.temp_dir, 'model.fbt')
+        with open(path, 'wb') as f:
+            f.write(b'\0' * 128)
+        with self.assertRaises(ValueError):
+            FbtModel.load(path)
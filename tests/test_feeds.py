@@ -0,0 +1,92 @@
+﻿#-------------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation 
+# All rights reserved. 
+# 
+# Distributed under the terms of the MIT License
+#-------------------------------------------------------------------------
+import unittest
+import warnings
+from cortanaanalytics.exceptions import ResponseFormatError
+from cortanaanalytics.feeds import iter_properties, first_properties
+from cortanaanalytics.recommendations import Recommendations
+from test_recommendations import TestData
+
+class FeedTests(unittest.TestCase):
+
+    def setUp(self):
+        self.rs = Recommendations('email@outlook.com', '1abCdEFGh/ijKlmN/opq234r56st/UvWXYZabCD7EF8=')
+        return super().setUp()
+
+    def test_iter_properties(self):
+        entries = list(iter_properties(TestData.build_model_monitor_building_2_response.encode('utf-8')))
+        self.assertEqual([e['BuildId'] for e in entries], ['1514886', '1514885', '1514884', '1514882'])
+        self.assertEqual([e['Status'] for e in entries], ['Building', 'Success', 'Success', 'Success'])
+        self.assertIsNone(entries[0]['StatusMessage'])
+
+    def test_first_properties(self):
+        properties = first_properties(TestData.create_model_returns.encode('utf-8'))
+        self.assertEqual(properties['Id'], 'd5c7273b-2228-4cf4-99b1-9966e28b143a')
+        self.assertEqual(properties['Name'], 'testtest1')
+        self.assertIsNone(first_properties(TestData.invoke_recommendations_list.encode('utf-8')))
+
+    def test_parse_build_status(self):
+        content = TestData.build_model_monitor_building_2_response.encode('utf-8')
+        self.assertEqual(self.rs._parse_build_status(content, '1514886'), 'Building')
+        self.assertEqual(self.rs._parse_build_status(content, 1514884), 'Success')
+        with self.assertRaises(Exception):
+            self.rs._parse_build_status(content, '42')
+
+    def test_parse_build_statuses_repeated(self):
+        def entry(name, build_id, status):
+            return '<entry><content><m:properties><d:{0}>{1}</d:{0}><d:Status>{2}</d:Status></m:properties></content></entry>'.format(name, build_id, status)
+        content = ('<feed xmlns="http://www.w3.org/2005/Atom" xmlns:d="http://schemas.microsoft.com/ado/2007/08/dataservices" xmlns:m="http://schemas.microsoft.com/ado/2007/08/dataservices/metadata">' +
+            entry('Id', '1', 'Queued') + entry('BuildId', '1', 'Building') + entry('BuildId', '1', 'Success') + entry('Id', '2', 'Queued') + entry('Id', '2', 'Cancelled') +
+            '</feed>').encode('utf-8')
+        # as the XPath find of earlier versions: the first entry with the BuildId, else the first with the Id
+        self.assertEqual(self.rs._parse_build_statuses(content), { '1' : 'Building', '2' : 'Queued' })
+
+    def test_parse_build_status_queued(self):
+        # queued builds only have an Id
+        content = TestData.build_model_monitor_building_1_response.encode('utf-8')
+        self.assertEqual(self.rs._parse_build_status(content, '1514886'), 'Queued')
+
+    def test_parse_recommendations(self):
+        items = self.rs._parse_recommendations(TestData.invoke_recommendations_single_1.encode('utf-8'))
+        self.assertEqual(len(items), 1)
+        self.assertEqual(items[0].id, '552A1940-21E4-4399-82BB-594B46D7ED54')
+        self.assertEqual(items[0].name, 'Restraint of Beasts')
+        self.assertEqual(items[0].rating, 0.500787351855212)
+        self.assertEqual(items[0].reasoning, 'Most popular item (default system recommendation)')
+
+    def test_parse_recommendations_unexpected_value(self):
+        content = TestData.invoke_recommendations_single_1.replace('<d:Rating ', '<d:Popularity>3</d:Popularity><d:Rating ').encode('utf-8')
+        with warnings.catch_warnings(record=True) as caught:
+            warnings.simplefilter('always')
+            items = self.rs._parse_recommendations(content)
+        self.assertEqual(items[0].name, 'Restraint of Beasts')
+        self.assertEqual([str(warning.message) for warning in caught], ['Found an unexpected value "Popularity"'])
+
+    def test_parse_model_id(self):
+        self.assertEqual(self.rs._parse_model_id(TestData.create_model_returns.encode('utf-8')), 'd5c7273b-2228-4cf4-99b1-9966e28b143a')
+        # an empty feed
+        self.assertRaises(ResponseFormatError, self.rs._parse_model_id, TestData.invoke_recommendations_list.encode('utf-8'))
+
+    def test_parse_import_report(self):
+        report = self.rs._parse_import_report(TestData.import_file_catalog_returns.encode('utf-8'), 'catalog_small.txt')
+        self.assertEqual(report.info, 'catalog_small.txt')
+        self.assertEqual(report.line_count, 8)
+        self.assertEqual(report.error_count, 4)
+
+    def test_parse_recommendation_columns(self):
+        columns = self.rs._parse_recommendation_columns(TestData.invoke_recommendations_single_1.encode('utf-8'))
+        self.assertEqual(len(columns), 1)
+        self.assertEqual(columns.ids, ['552A1940-21E4-4399-82BB-594B46D7ED54'])
+        self.assertEqual(columns.names, ['Restraint of Beasts'])
+        self.assertEqual(list(columns.ratings), [0.500787351855212])
+        self.assertEqual(columns.ratings.typecode, 'd')
+
+    def test_result_objects_are_slotted(self):
+        item = self.rs._parse_recommendations(TestData.invoke_recommendations_single_1.encode('utf-8'))[0]
+        report = self.rs._parse_import_report(TestData.import_file_catalog_returns.encode('utf-8'), 'catalog_small.txt')
+        self.assertFalse(hasattr(item, '__dict__'))
+        self.assertFalse(hasattr(report, '__dict__'))
@@ -0,0 +1,146 @@
+﻿#-------------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation 
+# All rights reserved. 
+# 
+# Distributed under the terms of the MIT License
+#-------------------------------------------------------------------------
+import unittest
+from cortanaanalytics.instrumentation import CallRecord, Histogram, HistogramSink, Instrumentation, PrometheusSink, current_call, instrumented
+from cortanaanalytics.transport import Transport
+from cortanaanalytics.textanalytics import TextAnalytics, Uris as TextAnalyticsUris
+from cortanaanalytics.anomalydetection import AnomalyDetection, Uris as AnomalyDetectionUris
+from cortanaanalytics.recommendations import Recommendations, Uris
+from cortanaanalytics.aio import Response
+from test_anomalydetection import TestData as AnomalyTestData
+from test_recommendations import TestData
+from datetime import datetime
+import asyncio
+import httpretty
+
+class InstrumentationTests(unittest.TestCase):
+
+    def setUp(self):
+        self.email = 'email@outlook.com'
+        self.key = '1abCdEFGh/ijKlmN/opq234r56st/UvWXYZabCD7EF8='
+        self.records = []
+        self.histogram = PrometheusSink()
+        self.transport = Transport(instrumentation=Instrumentation(self.records.append, self.histogram))
+        return super().setUp()
+
+    @httpretty.activate
+    def test_call_record(self):
+        body = '{"SentimentBatch":[{"Score":0.9,"Id":"1"}],"ErrorRecords":[]}'
+        httpretty.register_uri(httpretty.POST, TextAnalyticsUris.get_sentiment_batch, body=body)
+        ta = TextAnalytics(self.key, self.transport)
+        ta.get_sentiment_batch([{'Text': 'hello world', 'Id': '1'}])
+
+        self.assertEqual(len(self.records), 1)
+        record = self.records[0]
+        self.assertEqual(record.client, 'TextAnalytics')
+        self.assertEqual(record.method, 'get_sentiment_batch')
+        self.assertEqual(record.endpoint, 'GetSentimentBatch')
+        self.assertEqual(record.status, 200)
+        self.assertEqual(record.requests, 1)
+        self.assertEqual(record.request_bytes, len(httpretty.last_request().body))
+        self.assertEqual(record.response_bytes, len(body))
+        self.assertEqual(record.retries, 0)
+        self.assertIsNone(record.error)
+        for phase in ('ttfb', 'transfer', 'parse'):
+            self.assertGreaterEqual(getattr(record, phase), 0)
+        self.assertGreaterEqual(record.total, record.ttfb + record.transfer + record.parse)
+
+    @httpretty.activate
+    def test_nested_calls_are_one_call(self):
+        httpretty.register_uri(httpretty.GET, AnomalyDetectionUris.score, body=AnomalyTestData.score_returns)
+        ad = AnomalyDetection(self.key, self.transport)
+        ad.score([(datetime(2014, 9, 21, 11, 5, 0), 3)])
+        self.assertEqual([(record.method, record.endpoint) for record in self.records], [('score', 'Score')])
+
+    @httpretty.activate
+    def test_error(self):
+        uri = Uris.root_uri + Uris.build_statuses.format('d5c7273b-2228-4cf4-99b1-9966e28b143a', False)
+        httpretty.register_uri(httpretty.GET, uri, status=500, body='failed')
+        rs = Recommendations(self.email, self.key, self.transport)
+        with self.assertRaises(Exception):
+            rs.get_build_statuses('d5c7273b-2228-4cf4-99b1-9966e28b143a')
+        self.assertEqual(self.records[0].method, 'get_build_statuses')
+        self.assertEqual(self.records[0].status, 500)
+        self.assertEqual(self.records[0].error, 'ServiceError')
+        self.assertEqual(self.histogram.counter('errors', 'GetModelBuildsStatus', 'ServiceError'), 1)
+
+    @httpretty.activate
+    def test_disabled(self):
+        httpretty.register_uri(httpretty.GET, TextAnalyticsUris.get_sentiment, body='{"Score":0.9}')
+        ta = TextAnalytics(self.key)
+        self.assertIsNone(ta.transport.instrumentation)
+        self.assertEqual(ta.get_sentiment('hello world'), 0.9)
+        self.assertIsNone(current_call())
+        self.assertEqual(self.records, [])
+
+    @httpretty.activate
+    def test_histogram_sink(self):
+        httpretty.register_uri(httpretty.GET, TextAnalyticsUris.get_sentiment, body='{"Score":0.9}')
+        ta = TextAnalytics(self.key, self.transport)
+        for i in range(3):
+            ta.get_sentiment('hello world')
+
+        histogram = self.histogram.histogram('GetSentiment')
+        self.assertEqual(histogram.count, 3)
+        self.assertEqual(self.histogram.histogram('GetSentiment', 'parse').count, 3)
+        self.assertEqual(self.histogram.counter('calls', 'GetSentiment', 200), 3)
+        self.assertEqual(self.histogram.counter('response_bytes', 'GetSentiment'), 39)
+        self.assertIsNone(self.histogram.histogram('GetKeyPhrases'))
+
+    def test_histogram_percentile(self):
+        histogram = Histogram((0.1, 1.0))
+        self.assertIsNone(histogram.percentile(0.5))
+        for value in (0.05, 0.05, 0.5, 5.0):
+            histogram.observe(value)
+        self.assertEqual(histogram.counts, [2, 1, 1])
+        self.assertEqual(histogram.percentile(0.5), 0.1)
+        self.assertEqual(histogram.percentile(0.75), 1.0)
+        self.assertEqual(histogram.percentile(0.99), float('inf'))
+
+    def test_prometheus_render(self):
+        sink = PrometheusSink(buckets=(0.1, 1.0))
+        record = CallRecord('Recommendations', 'get_recommendation')
+        record.add_request('https://api.datamarket.azure.com/data.ashx/amla/recommendations/v3/ItemRecommend?modelId=1', 200, 0, 1200, 0.05, 0.01, True)
+        record.total = 0.5
+        sink(record)
+        text = sink.render()
+        self.assertIn('# TYPE cortanaanalytics_call_seconds histogram', text)
+        self.assertIn('cortanaanalytics_call_seconds_bucket{endpoint="ItemRecommend",phase="total",le="0.1"} 0', text)
+        self.assertIn('cortanaanalytics_call_seconds_bucket{endpoint="ItemRecommend",phase="total",le="1.0"} 1', text)
+        self.assertIn('cortanaanalytics_call_seconds_bucket{endpoint="ItemRecommend",phase="total",le="+Inf"} 1', text)
+        self.assertIn('cortanaanalytics_call_seconds_count{endpoint="ItemRecommend",phase="ttfb"} 1', text)
+        self.assertIn('cortanaanalytics_calls_total{endpoint="ItemRecommend",status="200"} 1', text)
+        self.assertIn('cortanaanalytics_response_bytes_total{endpoint="ItemRecommend"} 1200', text)
+        self.assertIn('cortanaanalytics_reused_connections_total{endpoint="ItemRecommend"} 1', text)
+        self.assertTrue(text.endswith('\n'))
+
+    def test_async(self):
+        class ReportingTransport:
+            def __init__(self, instrumentation):
+                self.instrumentation = instrumentation
+
+            async def get(self, url, **kwargs):
+                await asyncio.sleep(0)
+                current_call().add_request(url, 200, 0, 4, 0.01, 0.0, False)
+                return Response(200, 'OK', b'{"Score":0.5}')
+
+        class Client:
+            def __init__(self, transport):
+                self.transport = transport
+
+            @instrumented
+            async def get_score(self):
+                return (await self.transport.get(TextAnalyticsUris.get_sentiment)).json()['Score']
+
+        client = Client(ReportingTransport(Instrumentation(self.records.append)))
+        async def run():
+            return await asyncio.gather(client.get_score(), client.get_score())
+        self.assertEqual(asyncio.run(run()), [0.5, 0.5])
+        self.assertEqual([(record.method, record.endpoint, record.reused) for record in self.records], [('get_score', 'GetSentiment', False)] * 2)
+
+if __name__ == '__main__':
+    unittest.main()
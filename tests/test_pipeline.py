@@ -0,0 +1,148 @@
+﻿#-------------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation 
+# All rights reserved. 
+# 
+# Distributed under the terms of the MIT License
+#-------------------------------------------------------------------------
+import unittest
+import json
+import os
+import shutil
+import tempfile
+from threading import Barrier, Lock
+from cortanaanalytics.buildmonitor import BuildMonitor
+from cortanaanalytics.exceptions import CortanaAnalyticsError
+from cortanaanalytics.pipeline import ModelPipeline, PipelineBuild
+from cortanaanalytics.recommendations import BuildStatus, ImportReport, Uris
+
+class FakeRecommendations:
+    '''
+    Records the calls of a pipeline.  Builds end with the status given for their type.
+    '''
+    def __init__(self, outcomes, fail_update=False):
+        self.outcomes = outcomes
+        self.fail_update = fail_update
+        self.calls = []
+        self.builds = {}
+        self.lock = Lock()
+        # catalog and usage must be uploaded at the same time to get past the barrier
+        self.imports = Barrier(2, timeout=5)
+
+    def _call(self, *call):
+        with self.lock:
+            self.calls.append(call)
+
+    def create_model(self, model_name):
+        self._call('create_model', model_name)
+        return 'm1'
+
+    def import_file(self, model_id, file_path, import_uri, progress_callback=None):
+        self._call('import_file', os.path.basename(file_path), import_uri)
+        self.imports.wait()
+        return ImportReport(os.path.basename(file_path), 10, 1)
+
+    def _build(self, build_type):
+        self._call('build', build_type)
+        build_id = str(len(self.builds) + 100)
+        with self.lock:
+            self.builds[build_id] = build_type
+        return build_id
+
+    def build_rank_model(self, model_id, build_description=None):
+        return self._build('Ranking')
+
+    def build_recommendation_model(self, model_id, build_description=None):
+        return self._build('Recommendation')
+
+    def build_fbt_model(self, model_id, build_description=None):
+        return self._build('Fbt')
+
+    def get_build_statuses(self, model_id):
+        self._call('get_build_statuses', model_id)
+        with self.lock:
+            return dict((build_id, self.outcomes[build_type]) for build_id, build_type in self.builds.items())
+
+    def update_model(self, model_id, description, active_build_id):
+        self._call('update_model', model_id, active_build_id)
+        if self.fail_update:
+            self.fail_update = False
+            raise CortanaAnalyticsError('connection lost')
+
+class ModelPipelineTests(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.catalog_path = os.path.join(self.directory, 'catalog.csv')
+        self.usage_path = os.path.join(self.directory, 'usage.csv')
+        with open(self.catalog_path, 'w') as f:
+            f.write('1,One,Books\n')
+        with open(self.usage_path, 'w') as f:
+            f.write('u1,1\n')
+        self.checkpoint_path = os.path.join(self.directory, 'books.json')
+        return super().setUp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+        return super().tearDown()
+
+    def pipeline(self, rs, **kwargs):
+        kwargs.setdefault('build_types', ('Recommendation', 'Fbt', 'Ranking'))
+        return ModelPipeline(rs, 'books', self.catalog_path, self.usage_path, checkpoint_path=self.checkpoint_path, 
+            monitor=BuildMonitor(rs, initial_interval=0.01), **kwargs)
+
+    def test_run(self):
+        rs = FakeRecommendations({ 'Recommendation' : BuildStatus.error, 'Fbt' : BuildStatus.success, 'Ranking' : BuildStatus.success })
+        result = self.pipeline(rs).run()
+
+        self.assertEqual(result.model_id, 'm1')
+        self.assertEqual(sorted(result.imports), ['catalog', 'usage'])
+        self.assertEqual(result.imports['usage'].line_count, 10)
+        self.assertEqual(result.builds['Recommendation'].status, BuildStatus.error)
+        # the preferred build failed, so the next successful one is promoted
+        self.assertEqual(result.active_build_id, result.builds['Fbt'].build_id)
+        self.assertIn(('update_model', 'm1', result.builds['Fbt'].build_id), rs.calls)
+        self.assertEqual(sorted(call[1] for call in rs.calls if call[0] == 'build'), ['Fbt', 'Ranking', 'Recommendation'])
+        # the builds are checked together
+        self.assertEqual(len([call for call in rs.calls if call[0] == 'get_build_statuses']), 1)
+
+        with open(self.checkpoint_path) as f:
+            self.assertEqual(json.load(f)['active_build_id'], result.active_build_id)
+
+    def test_resume(self):
+        rs = FakeRecommendations({ 'Recommendation' : BuildStatus.success, 'Fbt' : BuildStatus.success, 'Ranking' : BuildStatus.success }, fail_update=True)
+        with self.assertRaises(CortanaAnalyticsError):
+            self.pipeline(rs).run()
+
+        rs.calls = []
+        result = self.pipeline(rs).run()
+        # nothing is uploaded or built again
+        self.assertEqual(rs.calls, [('update_model', 'm1', result.builds['Recommendation'].build_id)])
+        self.assertEqual(result.imports['catalog'].line_count, 10)
+
+        rs.calls = []
+        again = self.pipeline(rs).run()
+        self.assertEqual((again.builds, again.active_build_id), (result.builds, result.active_build_id))
+        self.assertEqual(rs.calls, [])
+
+    def test_choose(self):
+        rs = FakeRecommendations({ 'Recommendation' : BuildStatus.success, 'Fbt' : BuildStatus.success, 'Ranking' : BuildStatus.success })
+        result = self.pipeline(rs, choose=lambda builds: [build for build in builds if build.build_type == 'Ranking'][0]).run()
+        self.assertEqual(result.active_build_id, result.builds['Ranking'].build_id)
+        self.assertIsInstance(result.builds['Ranking'], PipelineBuild)
+
+    def test_no_successful_build(self):
+        rs = FakeRecommendations({ 'Recommendation' : BuildStatus.error, 'Fbt' : BuildStatus.cancelled, 'Ranking' : BuildStatus.error })
+        with self.assertRaises(CortanaAnalyticsError):
+            self.pipeline(rs).run()
+        self.assertNotIn('update_model', [call[0] for call in rs.calls])
+
+    def test_other_inputs(self):
+        rs = FakeRecommendations({ 'Recommendation' : BuildStatus.success, 'Fbt' : BuildStatus.success, 'Ranking' : BuildStatus.success })
+        self.pipeline(rs).run()
+        with open(self.usage_path, 'a') as f:
+            f.write('u2,1\n')
+        self.assertRaises(ValueError, self.pipeline, rs)
+        self.assertRaises(ValueError, ModelPipeline, rs, 'books', self.catalog_path, self.usage_path, build_types=('Popular',))
+
+if __name__ == '__main__':
+    unittest.main()
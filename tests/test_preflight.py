@@ -0,0 +1,107 @@
+﻿#-------------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation 
+# All rights reserved. 
+# 
+# Distributed under the terms of the MIT License
+#-------------------------------------------------------------------------
+import unittest
+from cortanaanalytics.preflight import check_catalog, check_usage
+import os
+import shutil
+import tempfile
+
+class PreflightTests(unittest.TestCase):
+
+    def setUp(self):
+        self.resources_dir = os.path.join(os.getcwd(), 'tests', 'resources')
+        self.temp_dir = tempfile.mkdtemp()
+        return super().setUp()
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+        return super().tearDown()
+
+    def write(self, name, content):
+        path = os.path.join(self.temp_dir, name)
+        with open(path, 'wb') as f:
+            f.write(content)
+        return path
+
+    def read(self, path):
+        with open(path, 'rb') as f:
+            return f.read()
+
+    def test_catalog_small(self):
+        output_path = os.path.join(self.temp_dir, 'catalog.txt')
+        report = check_catalog(os.path.join(self.resources_dir, 'catalog_small.txt'), output_path)
+
+        self.assertEqual((report.line_count, report.output_count, report.error_count), (4, 4, 0))
+        lines = self.read(output_path).splitlines()
+        self.assertEqual(lines[2], b'3bb5cb44-d143-4bdd-a55c-443964bf4b23,Spadework,Book,book description,author=Timothy Findley,publisher=HarperFlamingo Canada,year=2001')
+
+    def test_catalog_errors(self):
+        path = self.write('catalog.txt', 
+            b'a,Item A,Book\r\n' +
+            b'b,Item B,Book,,x = 1, x=1 ,,y=2\n' +
+            b'a,Item A again,Book\n' +
+            b'c,Item C\n' +
+            b'd,Item D,Book,desc,feature without value\n' +
+            b'\n' +
+            b'e' * 51 + b',Item E,Book\n')
+        output_path = os.path.join(self.temp_dir, 'out.txt')
+        report = check_catalog(path, output_path)
+
+        self.assertEqual(report.line_count, 7)
+        self.assertEqual(report.output_count, 2)
+        self.assertEqual(report.duplicate_count, 1)
+        self.assertEqual(report.error_count, 3)
+        self.assertEqual([line for line, reason in report.errors], [4, 5, 7])
+        self.assertEqual(self.read(output_path), b'a,Item A,Book\nb,Item B,Book,,x=1,y=2\n')
+
+    def test_usage_small(self):
+        report = check_usage(os.path.join(self.resources_dir, 'usage_small.txt'), catalog_path=os.path.join(self.resources_dir, 'catalog_small.txt'))
+        self.assertEqual((report.line_count, report.output_count, report.error_count, report.duplicate_count), (33, 33, 0, 0))
+
+    def test_usage_errors(self):
+        catalog_path = self.write('catalog.txt', b'a,Item A,Book\nb,Item B,Book\n')
+        path = self.write('usage.txt', 
+            b'1,a\n' +
+            b'1, a\r\n' +
+            b'2,b,2015/05/18T10:00:00,Purchase\n' +
+            b'3,z\n' +
+            b'4\n' +
+            b',a\n' +
+            b'5,a,t,e,extra\n' +
+            b'6,b')
+        output_path = os.path.join(self.temp_dir, 'out.txt')
+        report = check_usage(path, output_path, catalog_path, max_reported_errors=2)
+
+        self.assertEqual(report.line_count, 8)
+        self.assertEqual(report.output_count, 3)
+        self.assertEqual(report.duplicate_count, 1)
+        self.assertEqual(report.error_count, 4)
+        self.assertEqual(report.errors, [(4, 'item "z" is not in the catalog'), (5, 'expected user id, item id and optionally time and event')])
+        self.assertEqual(self.read(output_path), b'1,a\n2,b,2015/05/18T10:00:00,Purchase\n6,b\n')
+
+    def test_usage_duplicates(self):
+        lines = [b'user' + str(i % 1000).encode() + b',item' + str(i % 1000 % 7).encode() for i in range(3000)]
+        path = self.write('usage.txt', b'\n'.join(lines) + b'\n')
+        output_path = os.path.join(self.temp_dir, 'out.txt')
+        report = check_usage(path, output_path)
+
+        self.assertEqual(report.line_count, 3000)
+        self.assertEqual(report.output_count, 1000)
+        self.assertEqual(report.duplicate_count, 2000)
+        self.assertEqual(self.read(output_path).splitlines(), lines[:1000])
+
+    def test_limits_in_characters(self):
+        # 50 CJK characters are 150 bytes of UTF-8
+        path = self.write('catalog.txt', 
+            ('\u4e2d' * 50 + ',Item,Book\n').encode('utf-8') +
+            ('\u4e2d' * 51 + ',Item,Book\n').encode('utf-8'))
+        report = check_catalog(path)
+        self.assertEqual((report.output_count, report.error_count), (1, 1))
+        self.assertEqual(report.errors, [(2, 'item id must be 1 to 50 characters')])
+
+        path = self.write('usage.txt', ('\u00e9' * 255 + ',' + '\u4e2d' * 20 + '\n').encode('utf-8'))
+        self.assertEqual(check_usage(path).output_count, 1)
@@ -41,8 +41,8 @@ class RecommendationServiceTests(unittest.TestCase):
         resources_dir = os.path.join(os.getcwd(), 'tests', 'resources')
         report = rs.import_file(model_id, os.path.join(resources_dir, 'catalog_small.txt'), Uris.import_catalog)
 
-        self.assertEqual('8', report.line_count)
-        self.assertEqual('4', report.error_count)
+        self.assertEqual(8, report.line_count)
+        self.assertEqual(4, report.error_count)
 
     @httpretty.activate
     def test_import_file_usage(self):
@@ -55,8 +55,8 @@ class RecommendationServiceTests(unittest.TestCase):
         resources_dir = os.path.join(os.getcwd(), 'tests', 'resources')
         report = rs.import_file(model_id, os.path.join(resources_dir, 'usage_small.txt'), Uris.import_usage)
 
-        self.assertEqual('38', report.line_count)
-        self.assertEqual('5', report.error_count)
+        self.assertEqual(38, report.line_count)
+        self.assertEqual(5, report.error_count)
     
     @httpretty.activate
     def test_build_recommendation_model(self):
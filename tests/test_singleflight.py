@@ -0,0 +1,158 @@
+﻿#-------------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation 
+# All rights reserved. 
+# 
+# Distributed under the terms of the MIT License
+#-------------------------------------------------------------------------
+import unittest
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from threading import Event
+from time import sleep
+from cortanaanalytics.singleflight import SingleFlight
+from cortanaanalytics.recommendations import Recommendations
+from cortanaanalytics.textanalytics import TextAnalytics, Uris as TextAnalyticsUris
+from cortanaanalytics.aio import AsyncTextAnalytics, Response
+from test_recommendations import TestData
+
+def wait_for(condition, timeout=5):
+    for i in range(int(timeout / 0.001)):
+        if condition():
+            return
+        sleep(0.001)
+    raise AssertionError('timed out')
+
+class HeldTransport:
+    '''
+    Answers every request with body once release is set, counting the requests.
+    '''
+    def __init__(self, body):
+        self.body = body
+        self.release = Event()
+        self.requests = []
+
+    def get(self, url, **kwargs):
+        self.requests.append(url)
+        self.release.wait(5)
+        return Response(200, 'OK', self.body.encode('utf-8'))
+
+    def post(self, url, data=None, **kwargs):
+        return self.get(url, **kwargs)
+
+class SingleFlightTests(unittest.TestCase):
+
+    def test_shares_result(self):
+        flights = SingleFlight()
+        release = Event()
+        calls = []
+
+        def fetch(value):
+            calls.append(value)
+            release.wait(5)
+            return [value]
+
+        with ThreadPoolExecutor(8) as executor:
+            futures = [executor.submit(flights.call, 'key', fetch, 1) for i in range(8)]
+            wait_for(lambda: flights.shared == 7)
+            release.set()
+            results = [future.result() for future in futures]
+
+        self.assertEqual(calls, [1])
+        self.assertEqual(results, [[1]] * 8)
+        self.assertEqual(len(flights), 0)
+        # the flight has landed, the next call is sent again
+        self.assertEqual(flights.call('key', fetch, 2), [2])
+        self.assertEqual(calls, [1, 2])
+
+    def test_shares_error(self):
+        flights = SingleFlight()
+        release = Event()
+
+        def fail():
+            release.wait(5)
+            raise KeyError('missing')
+
+        with ThreadPoolExecutor(4) as executor:
+            futures = [executor.submit(flights.call, 'key', fail) for i in range(4)]
+            wait_for(lambda: flights.shared == 3)
+            release.set()
+            for future in futures:
+                self.assertIsInstance(future.exception(), KeyError)
+        self.assertEqual(len(flights), 0)
+
+class CoalescingClientTests(unittest.TestCase):
+
+    def setUp(self):
+        self.email = 'email@outlook.com'
+        self.key = '1abCdEFGh/ijKlmN/opq234r56st/UvWXYZabCD7EF8='
+        self.model_id = 'd5c7273b-2228-4cf4-99b1-9966e28b143a'
+        return super().setUp()
+
+    def test_get_recommendation(self):
+        transport = HeldTransport(TestData.invoke_recommendations_single_1)
+        rs = Recommendations(self.email, self.key, transport)
+
+        with ThreadPoolExecutor(10) as executor:
+            futures = [executor.submit(rs.get_recommendation, self.model_id, ['a', 'b'], 10) for i in range(9)]
+            futures.append(executor.submit(rs.get_recommendation, self.model_id, ['a', 'b']))
+            wait_for(lambda: rs.flights.shared == 9)
+            transport.release.set()
+            results = [future.result() for future in futures]
+
+        self.assertEqual(len(transport.requests), 1)
+        self.assertEqual([len(items) for items in results], [1] * 10)
+        # every caller gets its own items
+        self.assertIsNot(results[0], results[1])
+        self.assertIsNot(results[0][0], results[1][0])
+
+    def test_different_calls_not_shared(self):
+        transport = HeldTransport('{"Score":0.9}')
+        transport.release.set()
+        ta = TextAnalytics(self.key, transport)
+
+        with ThreadPoolExecutor(4) as executor:
+            scores = list(executor.map(ta.get_sentiment, ['one', 'two', 'three', 'four']))
+
+        self.assertEqual(scores, [0.9] * 4)
+        self.assertEqual(len(transport.requests), 4)
+
+    def test_coalesce_off(self):
+        transport = HeldTransport('{"Score":0.9}')
+        ta = TextAnalytics(self.key, transport, coalesce=False)
+
+        with ThreadPoolExecutor(4) as executor:
+            futures = [executor.submit(ta.get_sentiment, 'same') for i in range(4)]
+            wait_for(lambda: len(transport.requests) == 4)
+            transport.release.set()
+            self.assertEqual([future.result() for future in futures], [0.9] * 4)
+
+    def test_async(self):
+        requests = []
+
+        class FakeTransport:
+            async def get(self, url, **kwargs):
+                requests.append(kwargs['params']['text'])
+                await asyncio.sleep(0.01)
+                return Response(200, 'OK', b'{"Score":0.9}')
+
+        ta = AsyncTextAnalytics(self.key, FakeTransport())
+
+        async def run():
+            first = asyncio.ensure_future(ta.get_sentiment('same'))
+            others = [asyncio.ensure_future(ta.get_sentiment('same')) for i in range(9)]
+            await asyncio.sleep(0)
+            # a cancelled caller does not cancel the request for the others
+            first.cancel()
+            return await asyncio.gather(*others, ta.get_sentiment('other'))
+
+        loop = asyncio.new_event_loop()
+        try:
+            scores = loop.run_until_complete(run())
+        finally:
+            loop.close()
+        self.assertEqual(scores, [0.9] * 10)
+        self.assertEqual(requests, ['same', 'other'])
+        self.assertEqual(len(ta.flights), 0)
+
+if __name__ == '__main__':
+    unittest.main()
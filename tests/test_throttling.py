@@ -0,0 +1,176 @@
+﻿#-------------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation 
+# All rights reserved. 
+# 
+# Distributed under the terms of the MIT License
+#-------------------------------------------------------------------------
+import unittest
+from cortanaanalytics.exceptions import CortanaAnalyticsError, ServiceError, ThrottlingError, error_for, parse_retry_after
+from cortanaanalytics.throttling import NO_RETRIES, RetryPolicy, TokenBucket
+from cortanaanalytics.transport import Transport
+from cortanaanalytics.textanalytics import TextAnalytics, Uris as TextAnalyticsUris
+from cortanaanalytics.recommendations import Recommendations, Uris
+from cortanaanalytics.aio import Response
+from test_recommendations import TestData
+import httpretty
+import os
+
+class FakeClock:
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+class TokenBucketTests(unittest.TestCase):
+
+    def test_reserve(self):
+        clock = FakeClock()
+        bucket = TokenBucket(rate=10, capacity=2, clock=clock)
+        # the burst is free, then callers queue up a tenth of a second apart
+        self.assertEqual(bucket.reserve(), 0)
+        self.assertEqual(bucket.reserve(), 0)
+        self.assertAlmostEqual(bucket.reserve(), 0.1)
+        self.assertAlmostEqual(bucket.reserve(), 0.2)
+        clock.now += 0.2
+        self.assertAlmostEqual(bucket.reserve(), 0.1)
+        clock.now += 10
+        self.assertAlmostEqual(bucket.available, 2)
+
+    def test_pause(self):
+        clock = FakeClock()
+        bucket = TokenBucket(rate=10, clock=clock)
+        bucket.pause(2)
+        self.assertAlmostEqual(bucket.reserve(), 2.1)
+        # a pause shorter than the queue already waiting changes nothing
+        bucket.pause(1)
+        self.assertAlmostEqual(bucket.reserve(), 2.2)
+        clock.now += 3
+        self.assertAlmostEqual(bucket.available, 8)
+
+    def test_invalid_rate(self):
+        self.assertRaises(ValueError, TokenBucket, 0)
+
+class RetryPolicyTests(unittest.TestCase):
+
+    def test_retry_after_response(self):
+        policy = RetryPolicy(max_retries=2, backoff=1, jitter=0)
+        self.assertEqual(policy.retry_after_response(0, Response(429, 'Too Many Requests', b'', {'Retry-After': '7'})), 7)
+        self.assertEqual(policy.retry_after_response(0, Response(503, 'Service Unavailable', b'')), 1)
+        self.assertEqual(policy.retry_after_response(1, Response(503, 'Service Unavailable', b'')), 2)
+        self.assertIsNone(policy.retry_after_response(2, Response(503, 'Service Unavailable', b'')))
+        self.assertIsNone(policy.retry_after_response(0, Response(500, 'Internal Server Error', b'')))
+        self.assertIsNone(policy.retry_after_response(0, Response(200, 'OK', b'')))
+        self.assertIsNone(policy.retry_after_response(0, Response(429, 'Too Many Requests', b'', {'Retry-After': '3600'})))
+
+    def test_backoff(self):
+        policy = RetryPolicy(max_retries=10, backoff=0.5, max_backoff=4, jitter=0.5)
+        for attempt, expected in enumerate([0.5, 1, 2, 4, 4]):
+            delay = policy.backoff_delay(attempt)
+            self.assertGreaterEqual(delay, expected / 2)
+            self.assertLessEqual(delay, expected)
+
+    def test_retry_after_error(self):
+        policy = RetryPolicy(backoff=1, jitter=0)
+        self.assertEqual(policy.retry_after_error(0, 'GET'), 1)
+        self.assertIsNone(policy.retry_after_error(0, 'POST'))
+        self.assertIsNone(NO_RETRIES.retry_after_error(0, 'GET'))
+
+    def test_parse_retry_after(self):
+        self.assertEqual(parse_retry_after('5'), 5)
+        self.assertEqual(parse_retry_after('Wed, 21 Oct 2015 07:28:00 GMT'), 0)
+        self.assertIsNone(parse_retry_after(None))
+        self.assertIsNone(parse_retry_after('soon'))
+
+    def test_error_for(self):
+        error = error_for(Response(429, 'Too Many Requests', b'slow down', {'Retry-After': '2'}), 'throttled')
+        self.assertIsInstance(error, ThrottlingError)
+        self.assertEqual(error.retry_after, 2)
+        self.assertEqual(error.content, b'slow down')
+        error = error_for(Response(404, 'Not Found', b''), 'missing')
+        self.assertIsInstance(error, ServiceError)
+        self.assertNotIsInstance(error, ThrottlingError)
+        self.assertEqual(error.status_code, 404)
+        self.assertEqual(str(error), 'missing')
+        self.assertIsInstance(error, CortanaAnalyticsError)
+
+class Responder:
+    '''
+    Answers httpretty requests with each of responses in turn and keeps the request bodies.
+    '''
+
+    def __init__(self, *responses):
+        self.responses = list(responses)
+        self.bodies = []
+
+    def __call__(self, request, uri, headers):
+        self.bodies.append(request.body)
+        status, body, extra = self.responses[min(len(self.bodies), len(self.responses)) - 1]
+        headers.update(extra)
+        return status, headers, body
+
+class TransportRetryTests(unittest.TestCase):
+
+    def setUp(self):
+        self.email = 'email@outlook.com'
+        self.key = '1abCdEFGh/ijKlmN/opq234r56st/UvWXYZabCD7EF8='
+        self.transport = Transport(retry_policy=RetryPolicy(max_retries=2, backoff=0.01))
+        return super().setUp()
+
+    @httpretty.activate
+    def test_retries_throttled_requests(self):
+        responder = Responder((429, '', {'Retry-After': '0'}), (503, '', {}), (200, '{"Score":0.9}', {}))
+        httpretty.register_uri(httpretty.GET, TextAnalyticsUris.get_sentiment, body=responder)
+        ta = TextAnalytics(self.key, self.transport)
+        self.assertEqual(ta.get_sentiment('hello world'), 0.9)
+        self.assertEqual(len(responder.bodies), 3)
+
+    @httpretty.activate
+    def test_gives_up(self):
+        responder = Responder((429, '', {'Retry-After': '0'}))
+        httpretty.register_uri(httpretty.GET, TextAnalyticsUris.get_sentiment, body=responder)
+        ta = TextAnalytics(self.key, self.transport)
+        with self.assertRaises(ThrottlingError) as context:
+            ta.get_sentiment('hello world')
+        self.assertEqual(context.exception.status_code, 429)
+        self.assertEqual(context.exception.retry_after, 0)
+        self.assertEqual(len(responder.bodies), 3)
+
+    @httpretty.activate
+    def test_errors_are_typed(self):
+        responder = Responder((400, '{"message":"bad input"}', {}))
+        httpretty.register_uri(httpretty.POST, TextAnalyticsUris.get_key_phrases_batch, body=responder)
+        ta = TextAnalytics(self.key, self.transport)
+        with self.assertRaises(ServiceError) as context:
+            ta.get_key_phrases_batch([{'Text': 'hello world', 'Id': '1'}])
+        self.assertNotIsInstance(context.exception, ThrottlingError)
+        self.assertIn('bad input', str(context.exception))
+        self.assertEqual(len(responder.bodies), 1)
+
+    @httpretty.activate
+    def test_resends_file_body(self):
+        uri = Uris.root_uri + Uris.import_usage.format('d5c7273b-2228-4cf4-99b1-9966e28b143a', 'usage_small.txt')
+        responder = Responder((503, '', {}), (200, TestData.import_file_usage_returns, {}))
+        httpretty.register_uri(httpretty.POST, uri, body=responder)
+        usage_path = os.path.join(os.getcwd(), 'tests', 'resources', 'usage_small.txt')
+        rs = Recommendations(self.email, self.key, self.transport)
+        report = rs.import_file('d5c7273b-2228-4cf4-99b1-9966e28b143a', usage_path, Uris.import_usage)
+        self.assertEqual(report.line_count, 38)
+        first, second = responder.bodies
+        self.assertEqual(first, second)
+        with open(usage_path, 'rb') as f:
+            self.assertIn(f.read(), second)
+
+    @httpretty.activate
+    def test_rate_limiter_paused_by_throttling(self):
+        clock = FakeClock()
+        bucket = TokenBucket(rate=1000, clock=clock)
+        responder = Responder((429, '', {'Retry-After': '0'}), (200, '{"Score":0.9}', {}))
+        httpretty.register_uri(httpretty.GET, TextAnalyticsUris.get_sentiment, body=responder)
+        ta = TextAnalytics(self.key, Transport(rate_limiter=bucket))
+        self.assertEqual(ta.get_sentiment('hello world'), 0.9)
+        # the 429 empties the bucket, so the retry waits for its token
+        self.assertAlmostEqual(bucket.available, -1)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,61 @@
+﻿#-------------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation 
+# All rights reserved. 
+# 
+# Distributed under the terms of the MIT License
+#-------------------------------------------------------------------------
+import unittest
+from cortanaanalytics.transport import Transport
+from cortanaanalytics.textanalytics import TextAnalytics, Uris as TextAnalyticsUris
+from cortanaanalytics.anomalydetection import AnomalyDetection
+from cortanaanalytics.recommendations import Recommendations
+import httpretty
+from concurrent.futures import ThreadPoolExecutor
+
+class TransportTests(unittest.TestCase):
+    
+    def setUp(self):
+        self.email = 'email@outlook.com'
+        self.key = '1abCdEFGh/ijKlmN/opq234r56st/UvWXYZabCD7EF8='
+        return super().setUp()
+
+    def test_pool_configuration(self):
+        transport = Transport(pool_connections=2, pool_maxsize=32, pool_block=True)
+        adapter = transport.session.get_adapter('https://api.datamarket.azure.com/')
+        self.assertEqual(adapter._pool_connections, 2)
+        self.assertEqual(adapter._pool_maxsize, 32)
+        self.assertTrue(adapter._pool_block)
+
+    def test_clients_share_transport(self):
+        transport = Transport()
+        ta = TextAnalytics(self.key, transport)
+        ad = AnomalyDetection(self.key, transport)
+        rs = Recommendations(self.email, self.key, transport)
+        self.assertIs(ta.transport, transport)
+        self.assertIs(ad.transport, transport)
+        self.assertIs(rs.transport, transport)
+        self.assertIsNot(TextAnalytics(self.key).transport, transport)
+
+    @httpretty.activate
+    def test_shared_across_threads(self):
+        httpretty.register_uri(httpretty.GET, TextAnalyticsUris.get_sentiment, body='{"Score":0.9}')
+        transport = Transport(pool_maxsize=4, pool_block=True)
+        ta = TextAnalytics(self.key, transport)
+
+        with ThreadPoolExecutor(8) as pool:
+            scores = list(pool.map(ta.get_sentiment, ['hello world'] * 32))
+
+        self.assertEqual(scores, [0.9] * 32)
+
+    @httpretty.activate
+    def test_warm_up(self):
+        httpretty.register_uri(httpretty.HEAD, TextAnalyticsUris.root)
+        transport = Transport()
+        TextAnalytics(self.key, transport, warm_up=True)
+        self.assertEqual(httpretty.last_request().method, 'HEAD')
+
+    def test_close(self):
+        transport = Transport()
+        session = transport.session
+        transport.close()
+        self.assertIsNot(transport.session, session)
@@ -0,0 +1,137 @@
+﻿#-------------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation 
+# All rights reserved. 
+# 
+# Distributed under the terms of the MIT License
+#-------------------------------------------------------------------------
+import unittest
+from cortanaanalytics.upload import MultipartFileStream, plan_shards, shard_file_name
+from cortanaanalytics.recommendations import Recommendations, Uris
+import httpretty
+import os
+import re
+from threading import Lock
+from test_recommendations import TestData
+
+class UploadTests(unittest.TestCase):
+    
+    def setUp(self):
+        self.email = 'email@outlook.com'
+        self.key = '1abCdEFGh/ijKlmN/opq234r56st/UvWXYZabCD7EF8='
+        self.usage_path = os.path.join(os.getcwd(), 'tests', 'resources', 'usage_small.txt')
+        with open(self.usage_path, 'rb') as f:
+            self.usage = f.read()
+        return super().setUp()
+
+    def test_stream_body(self):
+        with MultipartFileStream(self.usage_path, chunk_size=100) as body:
+            data = b''.join(body)
+
+        boundary = body.content_type.split('boundary=')[1].encode('ascii')
+        self.assertEqual(len(data), len(body))
+        self.assertTrue(data.startswith(b'--' + boundary + b'\r\nContent-Disposition: form-data; name="usage_small.txt"; filename="usage_small.txt"\r\n\r\n'))
+        self.assertTrue(data.endswith(b'\r\n--' + boundary + b'--\r\n'))
+        self.assertIn(self.usage, data)
+
+    def test_stream_range(self):
+        with MultipartFileStream(self.usage_path, 'part.txt', offset=10, length=50) as body:
+            data = body.read()
+        self.assertEqual(len(data), len(body))
+        self.assertIn(b'\r\n\r\n' + self.usage[10:60] + b'\r\n--', data)
+
+    def test_stream_read_sizes(self):
+        with MultipartFileStream(self.usage_path, chunk_size=7) as body:
+            first = body.read()
+            body.rewind()
+            parts = []
+            while True:
+                part = body.read(333)
+                if not part:
+                    break
+                self.assertLessEqual(len(part), 333)
+                parts.append(part)
+        self.assertEqual(b''.join(parts), first)
+
+    def test_progress_callback(self):
+        progress = []
+        with MultipartFileStream(self.usage_path, chunk_size=256, progress_callback=lambda sent, total: progress.append((sent, total))) as body:
+            for chunk in body:
+                pass
+        self.assertGreater(len(progress), 1)
+        self.assertEqual(progress[-1], (len(body), len(body)))
+        self.assertEqual([sent for sent, total in progress], sorted(sent for sent, total in progress))
+
+    @httpretty.activate
+    def test_import_file_streams(self):
+        uri = 'https://api.datamarket.azure.com/amla/recommendations/v2/ImportUsageFile?modelId=%27d5c7273b-2228-4cf4-99b1-9966e28b143a%27&filename=%27usage_small.txt%27&apiVersion=%271.0%27'
+        httpretty.register_uri(httpretty.POST, uri, body=TestData.import_file_usage_returns)
+
+        rs = Recommendations(self.email, self.key)
+        progress = []
+        report = rs.import_file('d5c7273b-2228-4cf4-99b1-9966e28b143a', self.usage_path, Uris.import_usage, lambda sent, total: progress.append(sent))
+
+        request = httpretty.last_request()
+        self.assertTrue(request.headers['Content-Type'].startswith('multipart/form-data; boundary='))
+        self.assertEqual(int(request.headers['Content-Length']), len(request.body))
+        self.assertIn(self.usage, request.body)
+        self.assertEqual(progress[-1], len(request.body))
+        self.assertEqual(38, report.line_count)
+
+    def test_plan_shards(self):
+        shards = plan_shards(self.usage_path, 200)
+
+        self.assertGreater(len(shards), 1)
+        self.assertEqual(shards[0][0], 0)
+        self.assertEqual(sum(length for offset, length in shards), len(self.usage))
+        for offset, length in shards:
+            self.assertLessEqual(length, 200)
+            self.assertTrue(self.usage[offset:offset + length].endswith(b'\n') or offset + length == len(self.usage))
+        for (offset, length), (next_offset, next_length) in zip(shards, shards[1:]):
+            self.assertEqual(offset + length, next_offset)
+
+    def test_plan_shards_single(self):
+        self.assertEqual(plan_shards(self.usage_path, 1 << 20), [(0, len(self.usage))])
+
+    def test_plan_shards_long_line(self):
+        with self.assertRaises(ValueError):
+            plan_shards(self.usage_path, 20)
+
+    def test_shard_file_name(self):
+        self.assertEqual(shard_file_name('usage_small.txt', 0), 'usage_small.part1.txt')
+
+    @httpretty.activate
+    def test_import_usage_sharded(self):
+        attempts = {}
+        lock = Lock()
+
+        def import_usage(request, uri, headers):
+            file_name = re.search("filename=%27(.*?)%27", uri).group(1)
+            with lock:
+                attempts[file_name] = attempts.get(file_name, 0) + 1
+                if file_name == 'usage_small.part2.txt' and attempts[file_name] == 1:
+                    return (503, headers, 'Service Unavailable')
+            return (200, headers, TestData.import_file_usage_returns)
+
+        httpretty.register_uri(httpretty.POST, re.compile('https://api.datamarket.azure.com/amla/recommendations/v2/ImportUsageFile.*'), body=import_usage)
+
+        rs = Recommendations(self.email, self.key)
+        progress = []
+        report = rs.import_usage_sharded('d5c7273b-2228-4cf4-99b1-9966e28b143a', self.usage_path, max_shard_bytes=400, max_workers=3, progress_callback=lambda sent, total: progress.append(sent))
+
+        shard_count = len(plan_shards(self.usage_path, 400))
+        self.assertEqual(len(attempts), shard_count)
+        self.assertEqual(attempts['usage_small.part2.txt'], 2)
+        self.assertEqual(sum(attempts.values()), shard_count + 1)
+        self.assertEqual(report.info, 'usage_small.txt')
+        self.assertEqual(report.line_count, 38 * shard_count)
+        self.assertEqual(report.error_count, 5 * shard_count)
+        self.assertGreater(progress[-1], len(self.usage))
+
+    @httpretty.activate
+    def test_import_usage_sharded_failure(self):
+        httpretty.register_uri(httpretty.POST, re.compile('https://api.datamarket.azure.com/amla/recommendations/v2/ImportUsageFile.*'), status=500, body='')
+
+        rs = Recommendations(self.email, self.key)
+        with self.assertRaises(Exception) as context:
+            rs.import_usage_sharded('d5c7273b-2228-4cf4-99b1-9966e28b143a', self.usage_path, max_shard_bytes=800, max_retries=1)
+        self.assertIn('usage_small.part1.txt', str(context.exception))